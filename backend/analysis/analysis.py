@@ -3,51 +3,147 @@ Optimized analysis module for feedback data processing.
 Contains functions for sentiment analysis and keyword extraction with caching.
 """
 
+import asyncio
 import logging
+import multiprocessing
+import os
 import re
-from typing import List, Dict, Any, Tuple
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Tuple, AsyncIterator, Optional, Callable, Awaitable
 from collections import Counter
-from functools import lru_cache
 
 import nltk
 from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
 from textblob import TextBlob
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from dotenv import load_dotenv
 import subprocess
 import sys
 
+import annotation_snapshot
+import metrics
+from cache import BoundedCache, content_hash
+from keyword_index import RANKING_FREQUENCY, keyword_index
+from sentiment_backends import SENTIMENT_BACKEND, get_backend
+from shared_cache import CachedScores, shared_cache
+
+# Load environment variables
+load_dotenv()
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+# Version of the scoring pipeline stored alongside persisted annotations.
+# Bump it whenever sentiment or keyword logic changes so documents get re-scored.
+# Switching SENTIMENT_BACKEND changes it too.
+SCORER_VERSION = f"{SENTIMENT_BACKEND}-3"
+
+# Number of keywords persisted per feedback document
+ANNOTATION_KEYWORDS = 10
+
+# Number of documents fetched per cursor batch (and written per bulk_write call)
+# by the streaming analysis path. Memory use is bounded by this, not by collection size.
+ANALYSIS_BATCH_SIZE = int(os.getenv("ANALYSIS_BATCH_SIZE", 1000))
+
+# Documents younger than this are not rolled up or indexed yet. Writers set createdAt and _id before
+# their insert commits, so inserts still in flight cannot land behind a (createdAt, _id) high-water mark.
+ROLLUP_LAG_SECONDS = int(os.getenv("ROLLUP_LAG_SECONDS", 5))
+
+# Fields needed to score a document
+MESSAGE_PROJECTION = {"_id": 1, "message": 1}
+
+# Number of top keywords reported per service
+TOP_KEYWORDS = 5
+
+# Batch scoring engine: number of scoring processes and messages sent to a process at a time
+SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", os.cpu_count() or 1))
+SCORING_CHUNK_SIZE = int(os.getenv("SCORING_CHUNK_SIZE", 500))
+
+# Seconds between two progress log lines of a batch scoring run
+SCORING_PROGRESS_INTERVAL = 5.0
+
+# One batch scoring run at a time across the workers: the run holds a lease in the state
+# collection, renewed before every chunk is written
+PRECOMPUTE_LEASE_SECONDS = int(os.getenv("PRECOMPUTE_LEASE_SECONDS", 300))
+PRECOMPUTE_STATE_ID = "precompute"
+
+# Seconds between two checks of a batch scoring run held by another worker
+PRECOMPUTE_POLL_SECONDS = 5.0
+
+# Seconds between two background scoring runs of the documents inserted since, so reads never score
+PRECOMPUTE_INTERVAL_SECONDS = float(os.getenv("PRECOMPUTE_INTERVAL_SECONDS", 30))
+
+# Memory budgets (bytes) and optional TTL (seconds, 0 = no expiry) of the scoring caches
+SENTIMENT_CACHE_BYTES = int(os.getenv("SENTIMENT_CACHE_BYTES", 16 * 1024 * 1024))
+KEYWORDS_CACHE_BYTES = int(os.getenv("KEYWORDS_CACHE_BYTES", 64 * 1024 * 1024))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", 0))
+
+# Scoring caches, keyed by the 64-bit content hash of the message.
+# The keywords cache holds the full ranked keyword list so any top_n is served from one entry.
+sentiment_cache = BoundedCache("sentiment", SENTIMENT_CACHE_BYTES, CACHE_TTL_SECONDS)
+keywords_cache = BoundedCache("keywords", KEYWORDS_CACHE_BYTES, CACHE_TTL_SECONDS)
+
+# Keyword tokenizer: punctuation is dropped (so "don't" becomes "dont"), then the text
+# is split on whitespace. Same tokens as NLTK word_tokenize on punctuation-free text,
+# except the few words Treebank splits (e.g. "cannot"), without the Punkt tokenizer.
+_PUNCTUATION_RE = re.compile(r"[^\w\s]+")
+
+# Keywords shorter than this are ignored
+MIN_KEYWORD_LENGTH = 3
+
 # Global cache variables
-_stopwords = None
-_sentiment_cache = {}
-_keywords_cache = {}
+_stopwords: Optional[frozenset] = None
+_stopwords_lock = threading.Lock()
+_nlp_loaded = False
+_nlp_load_seconds: Optional[float] = None
+_nlp_lock = threading.Lock()
+_keyword_index_lock = asyncio.Lock()
+_scoring_pool = None
+_scoring_pool_workers = 0
+
+# Identifies this worker as the precompute lease owner
+_precompute_owner = uuid.uuid4().hex
 
 
 # Initialize NLP resources
 def init_nlp_resources():
-    """Initialize and cache NLP resources for better performance."""
-    global _stopwords
+    """
+    Initialize and cache NLP resources for better performance.
+    Loaded once per process; later calls return at once. Raises if a resource cannot be loaded.
+    May download corpora, so call it from a worker thread when an event loop is running.
+    """
+    global _nlp_loaded, _nlp_load_seconds
+
+    if _nlp_loaded:
+        return
+
+    with _nlp_lock:
+        if _nlp_loaded:
+            return
+        start_time = time.perf_counter()
+        _load_nlp_resources()
+        _nlp_load_seconds = time.perf_counter() - start_time
+        _nlp_loaded = True
+        logger.info(f"Loaded NLP resources in {_nlp_load_seconds:.2f}s")
 
-    try:
-        # Check if NLTK resources are available
-        nltk.data.find('tokenizers/punkt')
-        nltk.data.find('corpora/stopwords')
-        logger.debug("NLTK resources already available")
-    except LookupError:
-        logger.info("Downloading NLTK resources")
-        try:
-            nltk.download('punkt', quiet=True)
-            nltk.download('stopwords', quiet=True)
-            logger.info("NLTK resources downloaded successfully")
-        except Exception as e:
-            logger.error(f"Failed to download NLTK resources: {e}")
-            raise
 
-    # Cache stopwords for reuse
-    _stopwords = set(stopwords.words('english'))
+def nlp_status() -> Dict[str, Any]:
+    """Returns whether the NLP resources of this process are loaded, and how long loading took."""
+    return {
+        "loaded": _nlp_loaded,
+        "load_seconds": round(_nlp_load_seconds, 3) if _nlp_load_seconds is not None else None
+    }
+
+
+def _load_nlp_resources():
+    """Downloads the corpora that are missing and caches the stopwords."""
+    load_stopwords()
 
     # Ensure TextBlob corpora
     try:
@@ -64,39 +160,70 @@ def init_nlp_resources():
             raise
 
 
-# Call initialization when module is imported
-init_nlp_resources()
+def load_stopwords() -> frozenset:
+    """
+    Returns the stopwords of the keyword extractor, loaded on first use (downloaded if missing).
+    Raises if they cannot be loaded: keywords extracted without them would be persisted wrong.
+    """
+    global _stopwords
+
+    if _stopwords is not None:
+        return _stopwords
+
+    with _stopwords_lock:
+        if _stopwords is not None:
+            return _stopwords
+        try:
+            # Check if NLTK resources are available
+            nltk.data.find('corpora/stopwords')
+            logger.debug("NLTK resources already available")
+        except LookupError:
+            logger.info("Downloading NLTK resources")
+            try:
+                nltk.download('stopwords', quiet=True)
+                logger.info("NLTK resources downloaded successfully")
+            except Exception as e:
+                logger.error(f"Failed to download NLTK resources: {e}")
+                raise
+
+        # Cache stopwords for reuse, frozen for fast membership tests; raises LookupError if the download failed
+        _stopwords = frozenset(stopwords.words('english'))
+        return _stopwords
 
 
-@lru_cache(maxsize=1000)
 def get_sentiment_score(message: str) -> float:
     """
     Returns a numerical sentiment score for a feedback message (between -1 and 1).
-    Uses TextBlob for sentiment analysis with caching for performance.
+    Uses the configured sentiment backend with caching for performance.
     """
     if not message or not isinstance(message, str):
         return 0.0
 
     # Check cache first
-    if message in _sentiment_cache:
-        return _sentiment_cache[message]
+    key = content_hash(message)
+    score = sentiment_cache.get(key)
+    if score is not None:
+        return score
+
+    entry = _from_snapshot(key)
+    if entry is not None:
+        return entry[0]
 
     try:
-        blob = TextBlob(message)
-        score = round(blob.sentiment.polarity, 2)
+        score = round(get_backend().score(message), 2)
         # Cache result
-        _sentiment_cache[message] = score
+        sentiment_cache.set(key, score)
         return score
     except Exception as e:
+        # No fallback score: it would be persisted as if the message were neutral
         logger.error(f"Error in get_sentiment_score: {e}")
-        return 0.0
+        raise
 
 
-@lru_cache(maxsize=1000)
 def classify_sentiment(message: str) -> str:
     """
     Classifies the sentiment of a feedback message as positive, negative, or neutral.
-    Uses TextBlob for sentiment analysis with caching for performance.
+    Uses the configured sentiment backend with caching for performance.
     """
     if not message or not isinstance(message, str):
         return "neutral"
@@ -112,99 +239,475 @@ def classify_sentiment(message: str) -> str:
         return "neutral"
 
 
-@lru_cache(maxsize=500)
 def extract_top_keywords(message: str, top_n: int = 5) -> List[Tuple[str, int]]:
     """
     Extracts the top N keywords from a feedback message using word frequency.
     Returns a list of (keyword, frequency) tuples with caching for performance.
     """
-    global _stopwords
-
     if not message or not isinstance(message, str):
         return []
 
-    # Check cache first
-    cache_key = f"{message}_{top_n}"
-    if cache_key in _keywords_cache:
-        return _keywords_cache[cache_key]
+    return extract_keywords_batch([message], top_n)[0][0]
 
-    try:
-        # Preprocess the message
-        message = re.sub(r'[^\w\s]', '', message.lower())
 
-        # Tokenize and remove stopwords
-        tokens = word_tokenize(message)
-        tokens = [word for word in tokens if word not in _stopwords and len(word) > 2]
+def extract_keywords_batch(messages: List[str], top_n: int = 5) -> Tuple[List[List[Tuple[str, int]]], Counter]:
+    """
+    Extracts the top N keywords of every message of a batch.
+    Returns the per-message (keyword, frequency) lists and an aggregate Counter of how many
+    messages have each keyword in their top N, built in the same pass.
+    """
+    per_message = []
+    aggregate = Counter()
+
+    for message in messages:
+        if not message or not isinstance(message, str):
+            per_message.append([])
+            continue
+
+        top = list(ranked_keywords(message)[:top_n])
+        per_message.append(top)
+        aggregate.update(word for word, _ in top)
 
-        # Count word frequencies
-        word_freq = Counter(tokens)
-        result = word_freq.most_common(top_n)
+    return per_message, aggregate
+
+
+def count_keywords(message: str) -> Counter:
+    """Counts the keywords of a message: one regex pass, a whitespace split and a stopword filter."""
+    stop = _stopwords if _stopwords is not None else load_stopwords()
+    return Counter(
+        word for word in _PUNCTUATION_RE.sub("", message.lower()).split()
+        if len(word) >= MIN_KEYWORD_LENGTH and word not in stop
+    )
+
+
+def ranked_keywords(message: str) -> Tuple[Tuple[str, int], ...]:
+    """
+    Returns every keyword of a message with its frequency, most frequent first.
+    This full ranking is what the keywords cache stores.
+    """
+    # Check cache first
+    key = content_hash(message)
+    ranked = keywords_cache.get(key)
+    if ranked is not None:
+        return ranked
+
+    entry = _from_snapshot(key)
+    if entry is not None:
+        return entry[1]
+
+    try:
+        # Tokenize, remove stopwords and count word frequencies
+        ranked = tuple(count_keywords(message).most_common())
 
         # Cache result
-        _keywords_cache[cache_key] = result
-        return result
+        keywords_cache.set(key, ranked)
+        return ranked
     except Exception as e:
+        # No fallback keywords: they would be persisted as if the message had none
         logger.error(f"Error in extract_top_keywords: {e}")
-        return []
+        raise
+
+
+def _from_snapshot(key: int) -> Optional[CachedScores]:
+    """Looks a content hash up in the mapped annotation snapshot and promotes a hit to the caches."""
+    entry = annotation_snapshot.lookup(key)
+    if entry is not None:
+        sentiment_cache.set(key, entry[0])
+        keywords_cache.set(key, entry[1])
+    return entry
+
+
+def save_annotation_snapshot() -> int:
+    """
+    Merges the entries of the scoring caches of this worker into the on-disk annotation snapshot.
+    Blocking file I/O: run it in a worker thread. Returns the number of entries added.
+    """
+    sentiments = dict(sentiment_cache.items())
+    entries = {
+        key: (sentiments[key], ranked)
+        for key, ranked in keywords_cache.items()
+        if key in sentiments
+    }
+    return annotation_snapshot.save_snapshot(SCORER_VERSION, entries)
+
+
+def annotate_message(message: str) -> Dict[str, Any]:
+    """
+    Computes the annotation persisted on a feedback document.
+    Empty messages get null sentiment so they are left out of sentiment aggregations.
+    """
+    if not message or not isinstance(message, str):
+        return {
+            "sentimentScore": None,
+            "sentiment": None,
+            "keywords": [],
+            "scorerVersion": SCORER_VERSION
+        }
+
+    return {
+        "sentimentScore": get_sentiment_score(message),
+        "sentiment": classify_sentiment(message),
+        "keywords": [
+            {"word": word, "frequency": freq}
+            for word, freq in extract_top_keywords(message, top_n=ANNOTATION_KEYWORDS)
+        ],
+        "scorerVersion": SCORER_VERSION
+    }
+
+
+def document_annotation(document: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns the annotation of a feedback document, scoring it only when the stored
+    annotation is missing or was produced by an older scorer version.
+    """
+    if document.get("scorerVersion") == SCORER_VERSION:
+        annotation = {
+            "sentimentScore": document.get("sentimentScore"),
+            "sentiment": document.get("sentiment"),
+            "keywords": document.get("keywords") or []
+        }
+    else:
+        annotation = annotate_message(document.get("message", ""))
+
+    # Unscored (empty) messages are reported as neutral, like classify_sentiment does
+    if annotation["sentiment"] is None:
+        annotation["sentimentScore"] = 0.0
+        annotation["sentiment"] = "neutral"
+
+    return annotation
+
+
+async def iter_batches(collection, query: Dict[str, Any] = None, projection: Dict[str, Any] = None,
+                       batch_size: Optional[int] = None,
+                       sort: Optional[List[Tuple[str, int]]] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Streams the documents matching the query as lists of at most batch_size documents.
+    The cursor fetches the same number of documents per round-trip, so only one batch
+    is held in memory at a time.
+    """
+    batch_size = batch_size or ANALYSIS_BATCH_SIZE
+    cursor = collection.find(query or {}, projection or MESSAGE_PROJECTION, batch_size=batch_size)
+    if sort:
+        cursor = cursor.sort(sort)
+
+    batch = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def score_sentiments(messages: List[str]) -> List[float]:
+    """
+    Batch version of get_sentiment_score: cache misses are scored with one
+    score_batch call of the sentiment backend and cached.
+    """
+    keys = [content_hash(message) if message and isinstance(message, str) else None for message in messages]
+    scores = [sentiment_cache.get(key) if key is not None else 0.0 for key in keys]
+
+    missing = [position for position, score in enumerate(scores) if score is None]
+    if missing:
+        found = annotation_snapshot.lookup_many({keys[position] for position in missing})
+        for position in missing:
+            if keys[position] in found:
+                scores[position] = found[keys[position]][0]
+                sentiment_cache.set(keys[position], scores[position])
+        missing = [position for position in missing if scores[position] is None]
+
+    if missing:
+        try:
+            batch_scores = get_backend().score_batch([messages[position] for position in missing])
+        except Exception as e:
+            logger.error(f"Error in score_sentiments: {e}")
+            raise
 
+        for position, score in zip(missing, batch_scores):
+            scores[position] = round(float(score), 2)
+            sentiment_cache.set(keys[position], scores[position])
 
-def analyze_feedback(collection):
+    return scores
+
+
+def _score_into_cache(messages: Dict[int, str]) -> Dict[int, CachedScores]:
+    """
+    Scores messages (keyed by content hash) into the in-process caches and returns the
+    entries to share with the other workers. CPU-bound: run it in a worker thread.
+    """
+    score_sentiments(list(messages.values()))
+    return {
+        key: (get_sentiment_score(message), ranked_keywords(message))
+        for key, message in messages.items()
+    }
+
+
+async def annotate_messages(messages: List[str]) -> List[Dict[str, Any]]:
+    """
+    Annotates a batch of messages through the cache tiers: the in-process caches first,
+    then the mapped annotation snapshot, then one pipelined Redis lookup for all their misses,
+    then scoring for what is left. Freshly scored messages are written back to Redis for the other workers.
+    """
+    missing = {}
+    for message in messages:
+        if message and isinstance(message, str):
+            key = content_hash(message)
+            if key not in sentiment_cache or key not in keywords_cache:
+                missing[key] = message
+
+    if missing:
+        for key, (score, ranked) in annotation_snapshot.lookup_many(missing).items():
+            sentiment_cache.set(key, score)
+            keywords_cache.set(key, ranked)
+            del missing[key]
+
+    if missing and shared_cache.enabled:
+        for key, (score, ranked) in (await shared_cache.get_many(SCORER_VERSION, missing)).items():
+            sentiment_cache.set(key, score)
+            keywords_cache.set(key, ranked)
+            del missing[key]
+
+    if missing:
+        # Score off the event loop so other requests keep being served
+        with metrics.stage(metrics.STAGE_NLP):
+            scored = await asyncio.to_thread(_score_into_cache, missing)
+        await shared_cache.set_many(SCORER_VERSION, scored)
+
+    return [annotate_message(message) for message in messages]
+
+
+async def document_annotations(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Batch version of document_annotation: stored annotations are used as they are and
+    the remaining documents are scored together through annotate_messages.
+    """
+    stale = [doc for doc in documents if doc.get("scorerVersion") != SCORER_VERSION]
+    if stale:
+        await annotate_messages([doc.get("message", "") for doc in stale])
+
+    # Every stale message is now in the in-process caches
+    return [document_annotation(doc) for doc in documents]
+
+
+async def persist_annotations(collection, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Annotates documents (with _id and message) and writes the annotations back, unless another
+    worker already persisted them for the current scorer version. Returns the annotations.
+    """
+    annotations = await annotate_messages([doc.get("message", "") for doc in documents])
+    operations = [
+        UpdateOne({"_id": doc["_id"], "scorerVersion": {"$ne": SCORER_VERSION}}, {"$set": annotation})
+        for doc, annotation in zip(documents, annotations)
+    ]
+    if operations:
+        with metrics.stage(metrics.STAGE_MONGO):
+            await collection.bulk_write(operations, ordered=False)
+    return annotations
+
+
+async def annotate_missing(collection, query: Dict[str, Any] = None, batch_size: Optional[int] = None,
+                           after_batch: Optional[Callable[[], Awaitable[None]]] = None) -> int:
+    """
+    Scores and persists annotations for the documents matching the query that are
+    not yet annotated by the current scorer version. after_batch, if given, is awaited after
+    every batch, e.g. to renew a lease; an exception it raises stops the run.
+    Returns the number of documents that were scored.
+    """
+    missing_query = dict(query or {})
+    missing_query["scorerVersion"] = {"$ne": SCORER_VERSION}
+
+    try:
+        scored = 0
+
+        async for batch in iter_batches(collection, missing_query, MESSAGE_PROJECTION, batch_size):
+            await persist_annotations(collection, batch)
+            scored += len(batch)
+            if after_batch is not None:
+                await after_batch()
+        metrics.add_scanned(scored)
+
+        if scored:
+            logger.info(f"Annotated {scored} documents with scorer {SCORER_VERSION}")
+        return scored
+    except Exception as e:
+        logger.error(f"Error in annotate_missing: {e}")
+        raise
+
+
+async def analyze_feedback(collection):
     """
     Analyzes feedback data from MongoDB collection.
-    Returns average rating, total feedback count, and feedback type counts.
-    Uses aggregation pipeline for better performance.
+    Returns average rating, total feedback count, feedback type counts and sentiment counts.
+    Uses aggregation pipeline for better performance. Queries only fall back to it until the
+    rollups are first synced; sentiment counts are those persisted by the background scoring.
     """
     try:
-        # Use MongoDB aggregation pipeline for better performance
+        # Group on the server by feedback type: one small document per type,
+        # whatever the size of the collection
         pipeline = [
             {
                 "$group": {
-                    "_id": None,
-                    "total_feedback": {"$sum": 1},
-                    "total_rating": {"$sum": "$rating"},
-                    "feedbackTypes": {"$push": "$feedbackType"}
+                    "_id": "$feedbackType",
+                    "count": {"$sum": 1},
+                    "total_rating": {"$sum": "$rating"}
                 }
             }
         ]
 
-        result = list(collection.aggregate(pipeline))
-
-        if not result:
-            return {
-                "average_rating": 0.0,
-                "total_feedback": 0,
-                "feedback_type_counts": {}
-            }
+        total_feedback = 0
+        total_rating = 0
+        feedback_type_counts = {}
 
-        data = result[0]
-        total_feedback = data.get("total_feedback", 0)
-        total_rating = data.get("total_rating", 0)
+        with metrics.stage(metrics.STAGE_MONGO):
+            async for row in collection.aggregate(pipeline):
+                total_feedback += row["count"]
+                total_rating += row["total_rating"]
+                if row["_id"] is not None:
+                    feedback_type_counts[row["_id"]] = row["count"]
 
         # Calculate average rating
         average_rating = round(total_rating / total_feedback, 2) if total_feedback > 0 else 0.0
 
-        # Calculate feedback type counts
-        feedback_types = data.get("feedbackTypes", [])
-        feedback_type_counts = Counter(feedback_types)
+        # Count persisted sentiment labels on the server
+        sentiment_pipeline = [
+            {"$match": {"sentiment": {"$ne": None}}},
+            {"$group": {"_id": "$sentiment", "count": {"$sum": 1}}}
+        ]
+
+        sentiment_counts = {"positive": 0, "neutral": 0, "negative": 0}
+        with metrics.stage(metrics.STAGE_MONGO):
+            async for row in collection.aggregate(sentiment_pipeline):
+                sentiment_counts[row["_id"]] = row["count"]
+
+        # Both pipelines go through the whole collection
+        metrics.add_scanned(2 * total_feedback)
 
         return {
             "average_rating": average_rating,
             "total_feedback": total_feedback,
-            "feedback_type_counts": dict(feedback_type_counts)
+            "feedback_type_counts": feedback_type_counts,
+            "sentiment_counts": sentiment_counts
         }
     except Exception as e:
         logger.error(f"Error in analyze_feedback: {e}")
         raise
 
 
-def analyze_service_feedback(collection, service: str):
+async def sync_keyword_index(collection, batch_size: Optional[int] = None) -> int:
+    """
+    Brings the in-memory keyword index up to date with the collection.
+    The first call builds it with one $unwind/$group aggregation of the persisted keywords;
+    later calls only read documents past the (createdAt, _id) high-water mark, in that order.
+    Documents younger than ROLLUP_LAG_SECONDS are left for a later sync, like the rollups do:
+    ids are generated by the writers, so they do not commit in _id order. Nothing is scored here:
+    the index stops at the first document the background scoring has not annotated yet.
+    Returns the number of documents indexed.
+    """
+    async with _keyword_index_lock:
+        try:
+            bound = datetime.utcnow() - timedelta(seconds=ROLLUP_LAG_SECONDS)
+
+            if not keyword_index.ready:
+                # Everything up to the high-water mark must be annotated: stop before the oldest document that is not
+                missing = await collection.find_one(
+                    {"createdAt": {"$lt": bound}, "scorerVersion": {"$ne": SCORER_VERSION}},
+                    {"createdAt": 1}, sort=[("createdAt", 1), ("_id", 1)])
+                if missing is not None:
+                    bound = missing["createdAt"]
+                latest = await collection.find_one({"createdAt": {"$lt": bound}}, {"_id": 1, "createdAt": 1},
+                                                   sort=[("createdAt", -1), ("_id", -1)])
+                if latest is None:
+                    return 0
+
+                upto = {"$or": [
+                    {"createdAt": {"$lt": latest["createdAt"]}},
+                    {"createdAt": latest["createdAt"], "_id": {"$lte": latest["_id"]}}
+                ]}
+                match = {"$match": {**upto, "scorerVersion": SCORER_VERSION}}
+                indexed = 0
+                async for row in collection.aggregate([match, {"$group": {"_id": "$service", "count": {"$sum": 1}}}]):
+                    keyword_index.add_document_count(row["_id"], row["count"])
+                    indexed += row["count"]
+
+                # One row per (service, term), streamed from the cursor
+                terms_pipeline = [
+                    match,
+                    {"$project": {"service": 1, "keywords": 1}},
+                    {"$unwind": "$keywords"},
+                    {"$group": {
+                        "_id": {"service": "$service", "word": "$keywords.word"},
+                        "documents": {"$sum": 1},
+                        "frequency": {"$sum": "$keywords.frequency"}
+                    }}
+                ]
+                async for row in collection.aggregate(terms_pipeline, allowDiskUse=True):
+                    keyword_index.add_counts(row["_id"]["service"], row["_id"]["word"],
+                                             row["documents"], row["frequency"])
+
+                keyword_index.mark = (latest["createdAt"], latest["_id"])
+                logger.info(f"Built keyword index from {indexed} documents")
+                return indexed
+
+            # Incremental update: index what arrived since the last sync in (createdAt, _id) order
+            created_at, last_id = keyword_index.mark
+            newer = {"$or": [
+                {"createdAt": {"$gt": created_at, "$lt": bound}},
+                {"createdAt": created_at, "_id": {"$gt": last_id}}
+            ]}
+
+            indexed = 0
+            projection = {"_id": 1, "createdAt": 1, "service": 1, "keywords": 1, "scorerVersion": 1}
+            cursor = collection.find(newer, projection, batch_size=batch_size or ANALYSIS_BATCH_SIZE).sort(
+                [("createdAt", 1), ("_id", 1)])
+            async for doc in cursor:
+                # Stop at a document not annotated yet; the next sync resumes there
+                if doc.get("scorerVersion") != SCORER_VERSION:
+                    break
+                keyword_index.add_document(doc.get("service"), doc.get("keywords") or [])
+                keyword_index.mark = (doc["createdAt"], doc["_id"])
+                indexed += 1
+            metrics.add_scanned(indexed)
+            return indexed
+        except Exception as e:
+            logger.error(f"Error in sync_keyword_index: {e}")
+            raise
+
+
+async def service_top_keywords(collection, service: str, keyword_ranking: str = RANKING_FREQUENCY) -> List[str]:
+    """Returns the top keywords of a service from the keyword index, synced with the collection first."""
+    await sync_keyword_index(collection)
+    return keyword_index.top_terms(service, TOP_KEYWORDS, keyword_ranking)
+
+
+async def services_top_keywords(collection, services: List[str],
+                                keyword_ranking: str = RANKING_FREQUENCY) -> Dict[str, List[str]]:
+    """Batch version of service_top_keywords: one keyword index sync for every service."""
+    await sync_keyword_index(collection)
+    return {service: keyword_index.top_terms(service, TOP_KEYWORDS, keyword_ranking) for service in services}
+
+
+def empty_service_analysis() -> Dict[str, Any]:
+    """Analysis of a service without feedback."""
+    return {
+        "total_feedback": 0,
+        "average_rating": 0.0,
+        "average_sentiment": 0.0,
+        "sentiment_breakdown": {"positive": 0, "neutral": 0, "negative": 0},
+        "top_keywords": []
+    }
+
+
+async def analyze_service_feedback(collection, service: str, keyword_ranking: str = RANKING_FREQUENCY):
     """
     Analyzes feedback for a specific service.
     Returns total feedbacks, average rating, average sentiment, sentiment breakdown, and top keywords.
-    Uses aggregation pipeline and caching for better performance.
+    Totals come from a MongoDB aggregation over persisted annotations, top keywords from the
+    keyword index, ranked by document frequency or by TF-IDF across services.
+    Like analyze_feedback, only used until the rollups are first synced, and scores nothing.
     """
     try:
-        # Use MongoDB aggregation pipeline for better performance
         pipeline = [
             {"$match": {"service": service}},
             {
@@ -212,54 +715,39 @@ def analyze_service_feedback(collection, service: str):
                     "_id": None,
                     "total_feedback": {"$sum": 1},
                     "total_rating": {"$sum": "$rating"},
-                    "messages": {"$push": "$message"}
+                    "average_sentiment": {"$avg": "$sentimentScore"},
+                    "positive": {"$sum": {"$cond": [{"$eq": ["$sentiment", "positive"]}, 1, 0]}},
+                    "neutral": {"$sum": {"$cond": [{"$eq": ["$sentiment", "neutral"]}, 1, 0]}},
+                    "negative": {"$sum": {"$cond": [{"$eq": ["$sentiment", "negative"]}, 1, 0]}}
                 }
             }
         ]
 
-        result = list(collection.aggregate(pipeline))
+        with metrics.stage(metrics.STAGE_MONGO):
+            totals = await collection.aggregate(pipeline).to_list(length=None)
 
-        if not result:
-            return {
-                "total_feedback": 0,
-                "average_rating": 0.0,
-                "average_sentiment": 0.0,
-                "sentiment_breakdown": {"positive": 0, "neutral": 0, "negative": 0},
-                "top_keywords": []
-            }
+        if not totals:
+            return empty_service_analysis()
 
-        data = result[0]
+        data = totals[0]
         total_feedback = data.get("total_feedback", 0)
+        metrics.add_scanned(total_feedback)
         total_rating = data.get("total_rating", 0)
-        messages = data.get("messages", [])
 
         # Calculate average rating
         average_rating = round(total_rating / total_feedback, 2) if total_feedback > 0 else 0.0
 
-        # Calculate sentiment data
-        sentiments = []
-        sentiment_breakdown = {"positive": 0, "neutral": 0, "negative": 0}
-        all_keywords = []
+        # $avg skips documents without a sentiment score (empty messages)
+        average_sentiment = data.get("average_sentiment")
+        average_sentiment = round(average_sentiment, 2) if average_sentiment is not None else 0.0
 
-        for message in messages:
-            if message and isinstance(message, str):
-                # Get sentiment (uses cache)
-                sentiment_score = get_sentiment_score(message)
-                sentiment = classify_sentiment(message)
-
-                sentiments.append(sentiment_score)
-                sentiment_breakdown[sentiment] += 1
-
-                # Get keywords (uses cache)
-                keywords = extract_top_keywords(message, top_n=10)
-                all_keywords.extend([word for word, _ in keywords])
-
-        # Calculate average sentiment
-        average_sentiment = round(sum(sentiments) / len(sentiments), 2) if sentiments else 0.0
+        sentiment_breakdown = {
+            "positive": data.get("positive", 0),
+            "neutral": data.get("neutral", 0),
+            "negative": data.get("negative", 0)
+        }
 
-        # Get top keywords
-        keyword_counts = Counter(all_keywords)
-        top_keywords = [word for word, _ in keyword_counts.most_common(5)]
+        top_keywords = await service_top_keywords(collection, service, keyword_ranking)
 
         return {
             "total_feedback": total_feedback,
@@ -273,26 +761,256 @@ def analyze_service_feedback(collection, service: str):
         raise
 
 
-def precompute_sentiment_data(collection) -> Dict[str, Any]:
+async def analyze_services_feedback(collection, services: Optional[List[str]] = None,
+                                    keyword_ranking: str = RANKING_FREQUENCY) -> Dict[str, Dict[str, Any]]:
     """
-    Precompute and cache sentiment and keywords for all documents.
-    This can be called periodically to warm up caches.
+    Batch version of analyze_service_feedback for several services, or every service if None.
+    Totals come from one aggregation grouped by service and top keywords from one keyword index sync.
+    Returns the analysis of each service, by service; requested services without feedback are included.
     """
     try:
-        all_docs = list(collection.find({}, {"_id": 1, "message": 1}))
+        match = {"service": {"$in": services}} if services is not None else {}
 
-        for doc in all_docs:
-            message = doc.get("message", "")
-            if message and isinstance(message, str):
-                # Precompute and cache sentiment
-                score = get_sentiment_score(message)
-                sentiment = classify_sentiment(message)
+        pipeline = [
+            {"$match": match},
+            {
+                "$group": {
+                    "_id": "$service",
+                    "total_feedback": {"$sum": 1},
+                    "total_rating": {"$sum": "$rating"},
+                    "average_sentiment": {"$avg": "$sentimentScore"},
+                    "positive": {"$sum": {"$cond": [{"$eq": ["$sentiment", "positive"]}, 1, 0]}},
+                    "neutral": {"$sum": {"$cond": [{"$eq": ["$sentiment", "neutral"]}, 1, 0]}},
+                    "negative": {"$sum": {"$cond": [{"$eq": ["$sentiment", "negative"]}, 1, 0]}}
+                }
+            }
+        ]
 
-                # Precompute and cache keywords
-                extract_top_keywords(message, top_n=10)
+        with metrics.stage(metrics.STAGE_MONGO):
+            rows = await collection.aggregate(pipeline).to_list(length=None)
+        metrics.add_scanned(sum(row["total_feedback"] for row in rows))
+
+        await sync_keyword_index(collection)
+
+        analyses = {service: empty_service_analysis() for service in services or []}
+        for row in rows:
+            if row["_id"] is None:
+                continue
+            total_feedback = row["total_feedback"]
+            # $avg skips documents without a sentiment score (empty messages)
+            average_sentiment = row.get("average_sentiment")
+            analyses[row["_id"]] = {
+                "total_feedback": total_feedback,
+                "average_rating": round(row["total_rating"] / total_feedback, 2) if total_feedback > 0 else 0.0,
+                "average_sentiment": round(average_sentiment, 2) if average_sentiment is not None else 0.0,
+                "sentiment_breakdown": {
+                    "positive": row.get("positive", 0),
+                    "neutral": row.get("neutral", 0),
+                    "negative": row.get("negative", 0)
+                },
+                "top_keywords": keyword_index.top_terms(row["_id"], TOP_KEYWORDS, keyword_ranking)
+            }
 
-        logger.info(f"Precomputed sentiment and keywords for {len(all_docs)} documents")
-        return {"status": "success", "processed_docs": len(all_docs)}
+        return analyses
+    except Exception as e:
+        logger.error(f"Error in analyze_services_feedback: {e}")
+        raise
+
+
+def _init_scoring_worker():
+    """Loads NLP resources once per scoring process, before its first chunk."""
+    init_nlp_resources()
+
+
+def score_messages(messages: List[str], with_entries: bool = False) -> Tuple[List[Dict[str, Any]],
+                                                                            Dict[int, CachedScores]]:
+    """
+    Annotates a chunk of messages. With with_entries, also returns their cache entries by content hash,
+    for the shared Redis tier. Runs inside the scoring processes, so arguments and results must be picklable.
+    """
+    # Score the whole chunk in one backend call, annotate_message then hits the cache
+    score_sentiments(messages)
+    annotations = [annotate_message(message) for message in messages]
+    entries = {}
+    if with_entries:
+        entries = {
+            content_hash(message): (get_sentiment_score(message), ranked_keywords(message))
+            for message in messages if message and isinstance(message, str)
+        }
+    return annotations, entries
+
+
+def get_scoring_pool(workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    Returns the process pool of the batch scoring engine, creating it on first use.
+    The pool is recreated if a different number of workers is requested.
+    """
+    global _scoring_pool, _scoring_pool_workers
+
+    workers = max(1, workers or SCORING_WORKERS)
+    if _scoring_pool is None or _scoring_pool_workers != workers:
+        shutdown_scoring_pool()
+        # Spawn instead of fork: the parent holds an event loop, a Motor client and threads
+        _scoring_pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_scoring_worker
+        )
+        _scoring_pool_workers = workers
+        logger.info(f"Started scoring pool with {workers} processes")
+    return _scoring_pool
+
+
+def shutdown_scoring_pool():
+    """Stops the scoring processes. Called from the application shutdown hook."""
+    global _scoring_pool, _scoring_pool_workers
+
+    if _scoring_pool is not None:
+        _scoring_pool.shutdown(wait=False, cancel_futures=True)
+        _scoring_pool = None
+        _scoring_pool_workers = 0
+
+
+async def _acquire_precompute_lease(state) -> bool:
+    """Takes the precompute lease unless a run holds an unexpired one, in this worker or another."""
+    now = datetime.utcnow()
+    try:
+        await state.find_one_and_update(
+            {"_id": PRECOMPUTE_STATE_ID, "$or": [{"leaseUntil": {"$exists": False}}, {"leaseUntil": {"$lt": now}}]},
+            {"$set": {"leaseUntil": now + timedelta(seconds=PRECOMPUTE_LEASE_SECONDS),
+                      "leaseOwner": _precompute_owner}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        # The state document exists and its lease is held
+        return False
+
+
+async def _renew_precompute_lease(state):
+    """Extends the lease in one atomic check-and-set; raises if another worker took it over."""
+    result = await state.update_one(
+        {"_id": PRECOMPUTE_STATE_ID, "leaseOwner": _precompute_owner},
+        {"$set": {"leaseUntil": datetime.utcnow() + timedelta(seconds=PRECOMPUTE_LEASE_SECONDS)}}
+    )
+    if result.matched_count == 0:
+        raise RuntimeError("Precompute lease lost during run")
+
+
+async def _release_precompute_lease(state):
+    await state.update_one({"_id": PRECOMPUTE_STATE_ID, "leaseOwner": _precompute_owner},
+                           {"$unset": {"leaseUntil": "", "leaseOwner": ""}})
+
+
+async def precompute_running(state) -> bool:
+    """Returns True while a batch scoring run holds the precompute lease."""
+    lease = await state.find_one({"_id": PRECOMPUTE_STATE_ID, "leaseUntil": {"$gte": datetime.utcnow()}})
+    return lease is not None
+
+
+async def wait_for_precompute(state):
+    """Waits until no batch scoring run holds the precompute lease, e.g. the one of another worker."""
+    while await precompute_running(state):
+        await asyncio.sleep(PRECOMPUTE_POLL_SECONDS)
+
+
+async def precompute_sentiment_data(collection, state, batch_size: Optional[int] = None,
+                                    workers: Optional[int] = None, rescore: bool = False,
+                                    progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+    """
+    Precompute and persist sentiment and keyword annotations for all documents.
+    Messages are streamed in chunks of batch_size to a pool of scoring processes and the
+    results are bulk-written back. Documents already annotated by the current scorer version
+    are skipped unless rescore is set. progress, if given, is called with (processed, total).
+    With the shared Redis tier enabled the scores are written there too, for the other workers.
+    One run at a time holds the precompute lease of the state collection: while another run
+    holds it, in this worker or another, returns at once with status "busy".
+    """
+    chunk_size = batch_size or SCORING_CHUNK_SIZE
+    workers = max(1, workers or SCORING_WORKERS)
+    query = {} if rescore else {"scorerVersion": {"$ne": SCORER_VERSION}}
+
+    if not await _acquire_precompute_lease(state):
+        logger.debug("Another batch scoring run holds the precompute lease, skipping")
+        return {"status": "busy", "error": "A batch scoring run is already in progress"}
+
+    in_flight = set()
+
+    try:
+        loop = asyncio.get_running_loop()
+        pool = get_scoring_pool(workers)
+        total = await collection.count_documents(query)
+
+        start_time = time.perf_counter()
+        last_report = start_time
+        processed_docs = 0
+
+        async def write_results(task):
+            ids, annotations, entries = await task
+            operations = [
+                UpdateOne({"_id": doc_id} if rescore else {"_id": doc_id, "scorerVersion": {"$ne": SCORER_VERSION}},
+                          {"$set": annotation})
+                for doc_id, annotation in zip(ids, annotations)
+            ]
+            # Only the lease holder writes: a run that lost it stops before writing again
+            await _renew_precompute_lease(state)
+            await collection.bulk_write(operations, ordered=False)
+            # Share the scores with the other workers, which look them up in Redis instead of scoring
+            await shared_cache.set_many(SCORER_VERSION, entries)
+            return len(operations)
+
+        async def score_chunk(batch):
+            ids = [doc["_id"] for doc in batch]
+            messages = [doc.get("message", "") for doc in batch]
+            annotations, entries = await loop.run_in_executor(pool, score_messages, messages, shared_cache.enabled)
+            return ids, annotations, entries
+
+        async for batch in iter_batches(collection, query, MESSAGE_PROJECTION, chunk_size):
+            in_flight.add(asyncio.ensure_future(write_results(score_chunk(batch))))
+
+            # Keep every process busy while bounding the number of chunks held in memory
+            if len(in_flight) >= workers * 2:
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                processed_docs += sum(task.result() for task in done)
+
+                now = time.perf_counter()
+                if progress:
+                    progress(processed_docs, total)
+                if now - last_report >= SCORING_PROGRESS_INTERVAL:
+                    rate = processed_docs / (now - start_time)
+                    logger.info(f"Scoring progress: {processed_docs}/{total} documents ({rate:.0f} docs/sec)")
+                    last_report = now
+
+        if in_flight:
+            done, _ = await asyncio.wait(in_flight)
+            processed_docs += sum(task.result() for task in done)
+
+        elapsed = time.perf_counter() - start_time
+        docs_per_sec = processed_docs / elapsed if elapsed > 0 else 0.0
+        if progress:
+            progress(processed_docs, total)
+
+        # The background rounds mostly find nothing to score
+        if processed_docs:
+            logger.info(f"Precomputed sentiment and keywords for {processed_docs} documents in {elapsed:.2f}s "
+                        f"({docs_per_sec:.0f} docs/sec, {workers} processes, chunks of {chunk_size})")
+        return {
+            "status": "success",
+            "processed_docs": processed_docs,
+            "scorer_version": SCORER_VERSION,
+            "docs_per_sec": round(docs_per_sec, 1),
+            "workers": workers,
+            "chunk_size": chunk_size
+        }
     except Exception as e:
         logger.error(f"Error in precompute_sentiment_data: {e}")
-        return {"status": "error", "error": str(e)}
\ No newline at end of file
+        return {"status": "error", "error": str(e)}
+    finally:
+        # Drop chunks still in flight if the run failed or was cancelled
+        for task in in_flight:
+            task.cancel()
+        try:
+            await _release_precompute_lease(state)
+        except Exception as e:
+            # The lease then expires on its own
+            logger.warning(f"Failed to release the precompute lease: {e}")
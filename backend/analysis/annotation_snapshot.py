@@ -0,0 +1,289 @@
+"""
+Annotation snapshot module for the feedback analysis API.
+On-disk copy of the scoring caches that workers memory-map at startup, so a restarted worker
+serves cached analyses at once and all the workers of a host share the same page-cache pages.
+
+File layout (little-endian):
+    header   64 bytes: magic, scorer version, entry count, keyword blob size
+    hashes   count x uint64, content hashes in ascending order
+    records  count x 12 bytes: float32 sentiment score, int8 label, padding, uint32 last write time (Unix seconds)
+    offsets  (count + 1) x uint64, start of the keywords of each entry in the blob
+    keywords blob of "word:frequency" tokens separated by spaces, UTF-8
+"""
+
+import logging
+import mmap
+import os
+import random
+import struct
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows: snapshots are then written without the writer lock
+    fcntl = None
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Snapshot file, shared by the workers of a host. Disabled unless set.
+ANNOTATION_SNAPSHOT_PATH = os.getenv("ANNOTATION_SNAPSHOT_PATH", "")
+
+# Seconds between two rewrites of the snapshot from the live caches
+ANNOTATION_SNAPSHOT_INTERVAL = int(os.getenv("ANNOTATION_SNAPSHOT_INTERVAL", 300))
+
+# Upper bound on the entries of the snapshot (0: no bound); the least recently written are evicted first
+ANNOTATION_SNAPSHOT_MAX_ENTRIES = int(os.getenv("ANNOTATION_SNAPSHOT_MAX_ENTRIES", 1_000_000))
+
+# Share of the snapshot that must be new before it is rewritten, so small changes do not cost a full rewrite
+ANNOTATION_SNAPSHOT_MIN_CHANGE = float(os.getenv("ANNOTATION_SNAPSHOT_MIN_CHANGE", 0.01))
+
+MAGIC = b"ANNSNAP2"
+HEADER = struct.Struct("<8s32sQQ")
+HEADER_SIZE = 64
+
+RECORD_DTYPE = np.dtype({"names": ["score", "label", "stamp"], "formats": ["<f4", "i1", "<u4"],
+                         "offsets": [0, 4, 8], "itemsize": 12})
+
+# Label codes of the records, with the classify_sentiment thresholds
+LABELS = ("positive", "neutral", "negative")
+
+# (sentiment score, ranked keywords) as held by the in-process caches
+CachedScores = Tuple[float, Tuple[Tuple[str, int], ...]]
+
+
+def encode_keywords(ranked: Iterable[Tuple[str, int]]) -> bytes:
+    """Keywords are \\w tokens, so they contain neither spaces nor colons."""
+    return " ".join(f"{word}:{freq}" for word, freq in ranked).encode("utf-8")
+
+
+def decode_keywords(raw: bytes) -> Tuple[Tuple[str, int], ...]:
+    if not raw:
+        return ()
+    return tuple(
+        (word, int(freq))
+        for word, freq in (token.rsplit(":", 1) for token in raw.decode("utf-8").split(" "))
+    )
+
+
+class AnnotationSnapshot:
+    """
+    Read-only view of a snapshot file. The arrays are NumPy views over the mapping, so
+    opening is O(1) and nothing is copied into the worker; lookups are binary searches.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            stat = os.fstat(f.fileno())
+
+        if len(self._mmap) < HEADER_SIZE:
+            raise ValueError(f"{path} is truncated")
+        magic, version, count, blob_size = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an annotation snapshot")
+
+        self.path = path
+        self.identity = (stat.st_ino, stat.st_mtime_ns)
+        self.scorer_version = version.rstrip(b"\0").decode("utf-8")
+        self.count = count
+
+        offset = HEADER_SIZE
+        self.hashes = np.frombuffer(self._mmap, dtype="<u8", count=count, offset=offset)
+        offset += 8 * count
+        self.records = np.frombuffer(self._mmap, dtype=RECORD_DTYPE, count=count, offset=offset)
+        offset += RECORD_DTYPE.itemsize * count
+        self.offsets = np.frombuffer(self._mmap, dtype="<u8", count=count + 1, offset=offset)
+        offset += 8 * (count + 1)
+        self._blob_start = offset
+        if offset + blob_size > len(self._mmap):
+            raise ValueError(f"{path} is truncated")
+
+    def raw_keywords(self, index: int) -> bytes:
+        return self._mmap[self._blob_start + int(self.offsets[index]):self._blob_start + int(self.offsets[index + 1])]
+
+    def entry(self, index: int) -> CachedScores:
+        return round(float(self.records["score"][index]), 2), decode_keywords(self.raw_keywords(index))
+
+    def positions(self, keys: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the index of every key in the snapshot and whether it was found, in one vectorized search."""
+        wanted = np.fromiter(keys, dtype=np.uint64, count=len(keys))
+        if self.count == 0:
+            return np.zeros(len(keys), dtype=np.int64), np.zeros(len(keys), dtype=bool)
+        positions = np.minimum(np.searchsorted(self.hashes, wanted), self.count - 1)
+        return positions, self.hashes[positions] == wanted
+
+    def get_many(self, keys: Iterable[int]) -> Dict[int, CachedScores]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        positions, found = self.positions(keys)
+        return {key: self.entry(int(position)) for key, position, hit in zip(keys, positions, found) if hit}
+
+
+def write_snapshot(path: str, scorer_version: str, entries: Dict[int, CachedScores],
+                   base: Optional[AnnotationSnapshot] = None,
+                   max_entries: int = ANNOTATION_SNAPSHOT_MAX_ENTRIES) -> int:
+    """
+    Writes the entries, stamped with the current time, merged with those of the base snapshot of the
+    same scorer version, to a temporary file renamed over the snapshot, so readers never see a partial file.
+    Beyond max_entries, the entries with the oldest stamps are dropped. Returns the number of entries written.
+    """
+    keys = np.fromiter(entries, dtype=np.uint64, count=len(entries))
+    scores = np.fromiter((score for score, _ in entries.values()), dtype=np.float32, count=len(entries))
+    stamps = np.full(len(entries), int(time.time()), dtype=np.uint32)
+    blobs = [encode_keywords(ranked) for _, ranked in entries.values()]
+
+    if base is not None and base.scorer_version == scorer_version and base.count:
+        kept = np.flatnonzero(~np.isin(base.hashes, keys))
+        keys = np.concatenate([base.hashes[kept], keys])
+        scores = np.concatenate([base.records["score"][kept], scores])
+        stamps = np.concatenate([base.records["stamp"][kept], stamps])
+        blobs = [base.raw_keywords(int(index)) for index in kept] + blobs
+
+    if 0 < max_entries < len(keys):
+        # Least recently written first out
+        survivors = np.argpartition(-stamps.astype(np.int64), max_entries - 1)[:max_entries]
+        keys, scores, stamps = keys[survivors], scores[survivors], stamps[survivors]
+        blobs = [blobs[index] for index in survivors]
+
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    records = np.zeros(len(keys), dtype=RECORD_DTYPE)
+    records["score"] = scores[order]
+    records["stamp"] = stamps[order]
+    rounded = np.round(records["score"].astype(np.float64), 2)
+    records["label"] = np.where(rounded > 0.1, 0, np.where(rounded < -0.1, 2, 1))
+    blobs = [blobs[index] for index in order]
+
+    offsets = np.zeros(len(keys) + 1, dtype="<u8")
+    offsets[1:] = np.cumsum([len(blob) for blob in blobs])
+
+    header = HEADER.pack(MAGIC, scorer_version.encode("utf-8")[:32], len(keys), int(offsets[-1]))
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(header.ljust(HEADER_SIZE, b"\0"))
+        f.write(keys.astype("<u8").tobytes())
+        f.write(records.tobytes())
+        f.write(offsets.tobytes())
+        f.write(b"".join(blobs))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    return len(keys)
+
+
+# Snapshot mapped by this worker, and lookup counters
+_snapshot: Optional[AnnotationSnapshot] = None
+_hits = 0
+_misses = 0
+
+
+def load_snapshot(scorer_version: str, path: str = ANNOTATION_SNAPSHOT_PATH) -> bool:
+    """Maps the snapshot file if it exists and matches the scorer version. Returns True if one is mapped."""
+    global _snapshot
+
+    if not path or not os.path.exists(path):
+        return False
+    try:
+        snapshot = AnnotationSnapshot(path)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring annotation snapshot {path}: {e}")
+        return False
+
+    if snapshot.scorer_version != scorer_version:
+        logger.info(f"Ignoring annotation snapshot of scorer {snapshot.scorer_version}")
+        return False
+
+    _snapshot = snapshot
+    logger.info(f"Mapped annotation snapshot with {snapshot.count} entries")
+    return True
+
+
+def refresh_snapshot(scorer_version: str, path: str = ANNOTATION_SNAPSHOT_PATH):
+    """Maps the snapshot again if another worker rewrote it. The previous mapping is released once unused."""
+    if not path or not os.path.exists(path):
+        return
+    stat = os.stat(path)
+    if _snapshot is None or _snapshot.identity != (stat.st_ino, stat.st_mtime_ns):
+        load_snapshot(scorer_version, path)
+
+
+def lookup_many(keys: Iterable[int]) -> Dict[int, CachedScores]:
+    """Looks content hashes up in the mapped snapshot. Returns only the entries found."""
+    global _hits, _misses
+
+    snapshot = _snapshot
+    keys = list(keys)
+    if snapshot is None or not keys:
+        return {}
+
+    found = snapshot.get_many(keys)
+    _hits += len(found)
+    _misses += len(keys) - len(found)
+    return found
+
+
+def lookup(key: int) -> Optional[CachedScores]:
+    return lookup_many([key]).get(key)
+
+
+def save_snapshot(scorer_version: str, entries: Dict[int, CachedScores], path: str = ANNOTATION_SNAPSHOT_PATH) -> int:
+    """
+    Merges the entries of the live caches into the snapshot on disk and maps the result, once the
+    entries missing from it reach ANNOTATION_SNAPSHOT_MIN_CHANGE of its size. Entries already in it are
+    stamped again, so the ones still in use are the last evicted. Writers of a host are serialized by a
+    lock file; if another worker is writing, this one skips its turn. Returns the number of entries added.
+    """
+    if not path:
+        return 0
+
+    with open(f"{path}.lock", "w") as lock:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return 0
+
+        # Merge into the latest file, which may have been written by another worker
+        refresh_snapshot(scorer_version, path)
+        base = _snapshot if _snapshot is not None and _snapshot.scorer_version == scorer_version else None
+        added = len(entries)
+        if base is not None and entries:
+            _, found = base.positions(list(entries))
+            added -= int(found.sum())
+        if added == 0 or added < ANNOTATION_SNAPSHOT_MIN_CHANGE * (base.count if base is not None else 0):
+            return 0
+
+        total = write_snapshot(path, scorer_version, entries, base)
+        load_snapshot(scorer_version, path)
+        logger.info(f"Wrote annotation snapshot: {added} new entries, {total} in total")
+        return added
+
+
+def next_save_delay() -> float:
+    """Seconds until the next rewrite, jittered so the workers of a host do not all contend for the lock."""
+    return ANNOTATION_SNAPSHOT_INTERVAL * random.uniform(0.8, 1.2)
+
+
+def snapshot_stats() -> Dict[str, Any]:
+    """Returns size and hit/miss counters of the mapped snapshot."""
+    lookups = _hits + _misses
+    return {
+        "name": "snapshot",
+        "enabled": bool(ANNOTATION_SNAPSHOT_PATH),
+        "entries": _snapshot.count if _snapshot is not None else 0,
+        "max_entries": ANNOTATION_SNAPSHOT_MAX_ENTRIES,
+        "bytes": len(_snapshot._mmap) if _snapshot is not None else 0,
+        "hits": _hits,
+        "misses": _misses,
+        "hit_ratio": round(_hits / lookups, 4) if lookups else 0.0
+    }
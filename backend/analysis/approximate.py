@@ -0,0 +1,220 @@
+"""
+Approximate analysis module for the feedback analysis API.
+Estimates the analytics from a random sample of the feedbacks ($sample), with confidence intervals,
+and takes top keywords from the keyword index, so the cost of a query is bounded by the sample
+size whatever the size of the collection.
+"""
+
+import logging
+import math
+import os
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+import metrics
+from analysis import SCORER_VERSION, TOP_KEYWORDS, document_annotations, sync_keyword_index
+from keyword_index import RANKING_FREQUENCY, KeywordIndex, keyword_index
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Documents drawn at random when a query does not set its sample size, and the largest size allowed
+APPROXIMATE_SAMPLE_SIZE = int(os.getenv("APPROXIMATE_SAMPLE_SIZE", 10000))
+APPROXIMATE_MAX_SAMPLE_SIZE = int(os.getenv("APPROXIMATE_MAX_SAMPLE_SIZE", 100000))
+
+# Confidence level of the reported intervals
+APPROXIMATE_CONFIDENCE = float(os.getenv("APPROXIMATE_CONFIDENCE", 0.95))
+
+# Range of a rating, bounding the interval of an average estimated from too few documents
+RATING_RANGE = (1.0, 5.0)
+
+SENTIMENTS = ("positive", "neutral", "negative")
+
+# Document fields needed to estimate the analytics; the message is scored if the annotation is outdated
+SAMPLE_PROJECTION = {
+    "_id": 1, "service": 1, "feedbackType": 1, "rating": 1, "message": 1,
+    "sentiment": 1, "sentimentScore": 1, "keywords": 1, "scorerVersion": 1
+}
+
+
+def interval(estimate: float, low: float, high: float) -> Dict[str, float]:
+    return {"estimate": round(estimate, 4), "low": round(low, 4), "high": round(high, 4)}
+
+
+def mean_interval(values: List[float], population: int, z: float,
+                  bounds: Tuple[float, float] = RATING_RANGE) -> Dict[str, float]:
+    """
+    Normal interval of the mean of a population from a sample drawn without replacement
+    (finite population correction). Exact once the sample is the whole population.
+    """
+    n = len(values)
+    if n == 0:
+        return interval(0.0, *bounds)
+
+    mean = float(np.mean(values))
+    if n >= population:
+        return interval(mean, mean, mean)
+    if n < 2:
+        return interval(mean, *bounds)
+
+    correction = math.sqrt((population - n) / (population - 1)) if population > 1 else 0.0
+    half_width = z * float(np.std(values, ddof=1)) / math.sqrt(n) * correction
+    return interval(mean, max(bounds[0], mean - half_width), min(bounds[1], mean + half_width))
+
+
+def proportion_interval(successes: int, n: int, population: int, z: float) -> Dict[str, float]:
+    """
+    Wilson score interval of a proportion, which stays within [0, 1] and behaves for proportions
+    near 0 or 1, narrowed by the finite population correction. Exact once n covers the population.
+    """
+    if n == 0:
+        return interval(0.0, 0.0, 1.0)
+
+    p = successes / n
+    if n >= population:
+        return interval(p, p, p)
+
+    z *= math.sqrt((population - n) / (population - 1)) if population > 1 else 0.0
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return interval(p, max(0.0, center - half_width), min(1.0, center + half_width))
+
+
+def is_scored(document: Dict[str, Any]) -> bool:
+    """Whether a document counts in the sentiment aggregates, which leave empty messages out."""
+    if document.get("scorerVersion") == SCORER_VERSION:
+        return document.get("sentiment") is not None
+    message = document.get("message")
+    return isinstance(message, str) and bool(message)
+
+
+async def draw_sample(collection, sample_size: Optional[int]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int]:
+    """
+    Draws up to sample_size documents at random and annotates the ones without a current annotation
+    (not persisted: the sample is not worth a write). Returns documents, annotations and the
+    estimated size of the collection.
+    """
+    size = max(1, min(sample_size or APPROXIMATE_SAMPLE_SIZE, APPROXIMATE_MAX_SAMPLE_SIZE))
+    with metrics.stage(metrics.STAGE_MONGO):
+        population = await collection.estimated_document_count()
+        if population == 0:
+            return [], [], 0
+        documents = await collection.aggregate(
+            [{"$sample": {"size": size}}, {"$project": SAMPLE_PROJECTION}]
+        ).to_list(length=None)
+    metrics.add_scanned(len(documents))
+
+    annotations = await document_annotations(documents)
+    # The collection may have grown since its size was estimated
+    return documents, annotations, max(population, len(documents))
+
+
+def estimate(documents: List[Dict[str, Any]], annotations: List[Dict[str, Any]], population: int) -> Dict[str, Any]:
+    """
+    Estimates the analytics of a population from a uniform sample of it: counts are scaled up from
+    the sample, average rating and sentiment proportions come with confidence intervals.
+    """
+    z = NormalDist().inv_cdf(0.5 + APPROXIMATE_CONFIDENCE / 2)
+    n = len(documents)
+    scale = population / n if n else 0.0
+
+    ratings = [float(doc["rating"]) for doc in documents if isinstance(doc.get("rating"), (int, float))]
+    feedback_types: Dict[str, int] = {}
+    for doc in documents:
+        if doc.get("feedbackType") is not None:
+            feedback_types[doc["feedbackType"]] = feedback_types.get(doc["feedbackType"], 0) + 1
+
+    scored = [annotation for doc, annotation in zip(documents, annotations) if is_scored(doc)]
+    sentiments = {label: sum(1 for annotation in scored if annotation["sentiment"] == label) for label in SENTIMENTS}
+    scores = [annotation["sentimentScore"] for annotation in scored if annotation["sentimentScore"] is not None]
+    # Population of the proportions: the scored documents, estimated from their share of the sample
+    scored_population = max(len(scored), round(population * len(scored) / n)) if n else 0
+
+    average_rating = mean_interval(ratings, population, z)
+    return {
+        "average_rating": round(average_rating["estimate"], 2),
+        "total_feedback": population,
+        "average_sentiment": round(float(np.mean(scores)), 2) if scores else 0.0,
+        "feedback_type_counts": {name: round(count * scale) for name, count in feedback_types.items()},
+        "sentiment_counts": {label: round(count * scale) for label, count in sentiments.items()},
+        "approximation": {
+            "sample_size": n,
+            "population": population,
+            "confidence_level": APPROXIMATE_CONFIDENCE,
+            "average_rating": average_rating,
+            "sentiment_proportions": {
+                label: proportion_interval(count, len(scored), scored_population, z)
+                for label, count in sentiments.items()
+            }
+        }
+    }
+
+
+async def approximate_feedback_analysis(collection, sample_size: Optional[int] = None) -> Dict[str, Any]:
+    """Approximate version of analyze_feedback, from a sample of sample_size documents."""
+    try:
+        documents, annotations, population = await draw_sample(collection, sample_size)
+        return estimate(documents, annotations, population)
+    except Exception as e:
+        logger.error(f"Error in approximate_feedback_analysis: {e}")
+        raise
+
+
+async def approximate_services_analysis(collection, services: Optional[List[str]] = None,
+                                        sample_size: Optional[int] = None,
+                                        keyword_ranking: str = RANKING_FREQUENCY) -> Dict[str, Dict[str, Any]]:
+    """
+    Approximate version of analyze_services_feedback. One sample of sample_size documents is drawn
+    from the whole collection, so a service is estimated from its share of the sample: the smaller
+    the service, the wider its intervals. Top keywords come from the keyword index once it is built,
+    from the keywords of the sample until then.
+    """
+    try:
+        documents, annotations, population = await draw_sample(collection, sample_size)
+
+        samples: Dict[str, Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]] = {}
+        for doc, annotation in zip(documents, annotations):
+            service_documents, service_annotations = samples.setdefault(doc.get("service"), ([], []))
+            service_documents.append(doc)
+            service_annotations.append(annotation)
+
+        # The keyword index sync is incremental once the index is built; building it takes an
+        # aggregation of the whole collection, so until then keyword tops are estimated from the sample
+        if keyword_index.ready:
+            await sync_keyword_index(collection)
+            keywords, indexed = keyword_index, keyword_index.document_counts()
+        else:
+            keywords, indexed = KeywordIndex(), {}
+            for doc, annotation in zip(documents, annotations):
+                keywords.add_document(doc.get("service"), annotation["keywords"])
+
+        names = services if services is not None else [name for name in samples if name is not None]
+        analyses = {}
+        for service in names:
+            service_documents, service_annotations = samples.get(service, ([], []))
+            # Documents indexed for the service, or its share of the sample scaled up; a service
+            # missing from the sample gets the widest intervals
+            service_population = indexed.get(service) or (
+                round(population * len(service_documents) / len(documents)) if documents else 0)
+            estimated = estimate(service_documents, service_annotations, max(service_population, len(service_documents)))
+            analyses[service] = {
+                "total_feedback": estimated["total_feedback"],
+                "average_rating": estimated["average_rating"],
+                "average_sentiment": estimated["average_sentiment"],
+                "sentiment_breakdown": estimated["sentiment_counts"],
+                "top_keywords": keywords.top_terms(service, TOP_KEYWORDS, keyword_ranking),
+                "approximation": estimated["approximation"]
+            }
+
+        return analyses
+    except Exception as e:
+        logger.error(f"Error in approximate_services_analysis: {e}")
+        raise
@@ -0,0 +1,110 @@
+"""
+Batcher module for the feedback analysis API.
+Merges concurrent scoring requests into micro-batches: messages submitted within a few
+milliseconds of each other are annotated together, off the event loop, through the cache tiers,
+so each request pays a short wait instead of a scoring call of its own.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+from analysis import annotate_messages, document_annotation
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Milliseconds a message waits for others to join its batch
+SCORE_BATCH_WINDOW_MS = float(os.getenv("SCORE_BATCH_WINDOW_MS", 5))
+
+# Messages per batch; a full batch is scored without waiting for the window to end
+SCORE_BATCH_SIZE = int(os.getenv("SCORE_BATCH_SIZE", 256))
+
+# Upper bound on the messages of one scoring request
+MAX_SCORE_MESSAGES = int(os.getenv("MAX_SCORE_MESSAGES", 1000))
+
+
+class MicroBatcher:
+    """
+    Collects the messages submitted by concurrent requests and annotates them in batches.
+    Batches are scored concurrently; a failed batch fails the requests waiting on it.
+    """
+
+    def __init__(self, window_seconds: float, max_batch: int):
+        self.window_seconds = window_seconds
+        self.max_batch = max_batch
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Running batches, referenced so they are not garbage collected
+        self._scoring: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.messages = 0
+        self.largest_batch = 0
+
+    async def score(self, messages: List[str]) -> List[Dict[str, Any]]:
+        """Returns the annotation (sentiment, score, keywords) of each message, in order."""
+        loop = asyncio.get_running_loop()
+        futures = []
+        for message in messages:
+            future = loop.create_future()
+            self._pending.append((message, future))
+            futures.append(future)
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+
+        if self._pending and self._timer is None:
+            self._timer = loop.call_later(self.window_seconds, self._flush)
+        return list(await asyncio.gather(*futures))
+
+    def _flush(self):
+        """Starts scoring the pending messages as one batch."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._score_batch(batch))
+            self._scoring.add(task)
+            task.add_done_callback(self._scoring.discard)
+
+    async def _score_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        self.batches += 1
+        self.messages += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        try:
+            # Scores the misses in a worker thread and shares them through the cache tiers
+            await annotate_messages([message for message, _ in batch])
+            for message, future in batch:
+                # Requests cancelled while waiting have their futures cancelled
+                if not future.done():
+                    future.set_result(document_annotation({"message": message}))
+        except Exception as e:
+            logger.error(f"Error in _score_batch: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns batch counters of this worker."""
+        return {
+            "window_ms": self.window_seconds * 1000,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "messages": self.messages,
+            "average_batch": round(self.messages / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "pending": len(self._pending),
+            "scoring": len(self._scoring)
+        }
+
+
+# Scoring batcher of this worker process
+scoring_batcher = MicroBatcher(SCORE_BATCH_WINDOW_MS / 1000, SCORE_BATCH_SIZE)
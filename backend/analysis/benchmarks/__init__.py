@@ -0,0 +1,10 @@
+"""
+Benchmarks for the feedback analysis API.
+Run the scripts from backend/analysis, e.g. `python -m benchmarks.micro`:
+
+    corpus              seeded synthetic feedback corpus, written to MongoDB or JSON lines
+    micro               scoring functions and analyze_service_feedback, call by call
+    graphql_throughput  every GraphQL query field end to end, against the running API
+    subscriptions       subscribers one worker holds for feedbackStatsUpdated, and update fan-out
+    compare             diff of two result files, flagging regressions
+"""
@@ -0,0 +1,69 @@
+"""
+Compares two benchmark result files, e.g. from the commits before and after a change:
+
+    python -m benchmarks.compare before.json after.json --threshold 10
+
+Prints the change of every metric present in both files. Throughput (ops_per_sec) should go up
+and latencies (*_ms) down; a change the wrong way beyond the threshold
+(percent) is flagged, and the exit status is 1 if any metric regressed.
+"""
+
+import argparse
+import sys
+from typing import List, Optional, Tuple
+
+from benchmarks.results import load_results
+
+# Metrics compared, and whether higher values are better
+METRICS = {
+    "ops_per_sec": True,
+    "mean_ms": False,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+}
+
+
+def compare(baseline_path: str, candidate_path: str, threshold: float) -> Tuple[List[List[str]], int]:
+    """Returns the table rows and the number of regressions."""
+    baseline = load_results(baseline_path)
+    candidate = load_results(candidate_path)
+
+    rows = []
+    regressions = 0
+    for name in baseline:
+        if name not in candidate:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            before: Optional[float] = baseline[name].get(metric)
+            after: Optional[float] = candidate[name].get(metric)
+            if not before or after is None:
+                continue
+
+            change = (after - before) / before * 100
+            worse = -change if higher_is_better else change
+            flag = "REGRESSION" if worse > threshold else ("improved" if -worse > threshold else "")
+            regressions += flag == "REGRESSION"
+            rows.append([name, metric, f"{before:g}", f"{after:g}", f"{change:+.1f}%", flag])
+
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Percent change considered significant")
+    args = parser.parse_args()
+
+    rows, regressions = compare(args.baseline, args.candidate, args.threshold)
+    header = ["benchmark", "metric", "baseline", "candidate", "change", ""]
+    widths = [max(len(row[i]) for row in rows + [header]) for i in range(len(header))]
+    for row in [header] + rows:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Seeded generator of realistic synthetic feedback documents.
+
+Documents have the shape written by the NestJS collection service: the real service names,
+the feedback types of the Angular form, ratings consistent with the type, messages whose
+length follows a long-tailed distribution, and createdAt spread over a time range. The same
+seed, size and end date always produce the same documents, so results compare across commits:
+
+    python -m benchmarks.corpus --docs 1M              # replace the collection of MONGO_URI
+    python -m benchmarks.corpus --docs 10k --jsonl corpus.jsonl
+
+Sizes accept k/M suffixes, from 1k to 10M; documents are generated and inserted as a stream.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/feedback")
+DB_NAME = os.getenv("DB_NAME", "feedback")
+COLLECTION_NAME = os.getenv("COLLECTION_NAME", "feedbacks")
+
+# Services of backend/collection (services.constants.ts), most popular first
+SERVICES = [
+    "Customer Relationship Management (CRM)",
+    "E-commerce Platform",
+    "Project Management Tool",
+    "Collaboration and Communication Platform",
+    "Cloud Storage and File Sharing",
+    "Data Analytics Suite",
+    "Email Marketing Automation",
+    "Financial and Accounting Software",
+    "HR and Employee Management System",
+    "Inventory Management System",
+]
+
+# Zipf-like popularity of the services
+SERVICE_WEIGHTS = [1 / (rank + 1) for rank in range(len(SERVICES))]
+
+# Feedback types of the Angular form, with their share and rating distribution (1 to 5)
+FEEDBACK_TYPES = {
+    "suggestion": (0.35, [0.05, 0.10, 0.35, 0.35, 0.15]),
+    "bug": (0.30, [0.30, 0.35, 0.25, 0.08, 0.02]),
+    "praise": (0.20, [0.00, 0.01, 0.04, 0.30, 0.65]),
+    "complaint": (0.15, [0.55, 0.30, 0.12, 0.03, 0.00]),
+}
+
+# Features mentioned in messages, per service, so keywords differ between services
+FEATURES = {
+    "Customer Relationship Management (CRM)": ["contacts", "pipeline", "leads", "deals", "reminders"],
+    "E-commerce Platform": ["checkout", "cart", "payments", "shipping", "discounts"],
+    "Project Management Tool": ["tasks", "timeline", "boards", "sprints", "milestones"],
+    "Collaboration and Communication Platform": ["chat", "calls", "channels", "notifications", "threads"],
+    "Cloud Storage and File Sharing": ["uploads", "sync", "folders", "sharing", "previews"],
+    "Data Analytics Suite": ["dashboards", "reports", "charts", "exports", "queries"],
+    "Email Marketing Automation": ["campaigns", "templates", "newsletters", "segments", "scheduling"],
+    "Financial and Accounting Software": ["invoices", "ledger", "taxes", "expenses", "reconciliation"],
+    "HR and Employee Management System": ["payroll", "onboarding", "timesheets", "leave", "reviews"],
+    "Inventory Management System": ["stock", "barcodes", "warehouses", "orders", "suppliers"],
+}
+
+# Sentence templates per tone; {feature} is replaced by a feature of the service
+SENTENCES = {
+    "positive": [
+        "I really love the new {feature}.",
+        "The {feature} works perfectly and saves me a lot of time.",
+        "Great job on the {feature}, it is fast and easy to use.",
+        "Support helped me with the {feature} within minutes, amazing service.",
+        "The {feature} is intuitive and reliable.",
+    ],
+    "negative": [
+        "The {feature} keeps crashing when I open it.",
+        "The {feature} is terribly slow since the last update.",
+        "I cannot save my {feature}, this is very frustrating.",
+        "The {feature} is broken again and nobody answers my tickets.",
+        "The {feature} is confusing and the documentation is useless.",
+    ],
+    "neutral": [
+        "It would be nice to export the {feature} as a spreadsheet.",
+        "Could you add keyboard shortcuts to the {feature}?",
+        "The {feature} was moved to another menu.",
+        "We use the {feature} every day with our team.",
+        "Please add an option to filter the {feature} by date.",
+    ],
+}
+
+# Tone mix of the sentences of a message, per feedback type
+TONES = {
+    "suggestion": {"neutral": 0.7, "positive": 0.2, "negative": 0.1},
+    "bug": {"negative": 0.7, "neutral": 0.25, "positive": 0.05},
+    "praise": {"positive": 0.85, "neutral": 0.15, "negative": 0.0},
+    "complaint": {"negative": 0.85, "neutral": 0.15, "positive": 0.0},
+}
+
+# Sentences per message: log-normal, median about 2, with a long tail of long messages
+SENTENCES_MU = math.log(2.0)
+SENTENCES_SIGMA = 0.8
+MAX_SENTENCES = 40
+
+# Fixed default end of the time range so the corpus does not depend on the current date
+DEFAULT_END = datetime(2025, 1, 1)
+
+FIRST_NAMES = ["Alice", "Bob", "Chloe", "David", "Emma", "Farid", "Grace", "Hugo", "Ines", "Jonas", "Karim", "Lea"]
+
+
+def parse_count(value: str) -> int:
+    """Parses a document count with an optional k or M suffix, e.g. 10k or 1M."""
+    value = value.strip()
+    multiplier = {"k": 1_000, "K": 1_000, "m": 1_000_000, "M": 1_000_000}.get(value[-1:], 1)
+    return int(float(value[:-1] if multiplier > 1 else value) * multiplier)
+
+
+def generate_feedback(count: int, seed: int = 42, days: int = 365,
+                      end: Optional[datetime] = None) -> Iterator[Dict]:
+    """
+    Yields `count` feedback documents in createdAt order, spread evenly over the `days` before `end`.
+    Documents carry no _id: MongoDB assigns increasing ObjectIds on insert.
+    """
+    rng = random.Random(seed)
+    end = end or DEFAULT_END
+    start = end - timedelta(days=days)
+    step = (end - start) / max(count, 1)
+    types = list(FEEDBACK_TYPES)
+    type_weights = [share for share, _ in FEEDBACK_TYPES.values()]
+
+    for i in range(count):
+        service = rng.choices(SERVICES, SERVICE_WEIGHTS)[0]
+        feedback_type = rng.choices(types, type_weights)[0]
+        rating = rng.choices(range(1, 6), FEEDBACK_TYPES[feedback_type][1])[0]
+
+        tones = TONES[feedback_type]
+        sentences = min(MAX_SENTENCES, max(1, round(rng.lognormvariate(SENTENCES_MU, SENTENCES_SIGMA))))
+        message = " ".join(
+            rng.choice(SENTENCES[rng.choices(list(tones), list(tones.values()))[0]]).format(
+                feature=rng.choice(FEATURES[service]))
+            for _ in range(sentences)
+        )
+
+        created_at = start + step * i
+        name = rng.choice(FIRST_NAMES)
+        yield {
+            "name": name,
+            "email": f"{name.lower()}.{i}@example.com",
+            "feedbackType": feedback_type,
+            "service": service,
+            "message": message,
+            "rating": rating,
+            "attachScreenshot": rng.random() < 0.1,
+            "agreeToTerms": True,
+            "createdAt": created_at,
+            "updatedAt": created_at,
+        }
+
+
+def seed_collection(count: int, seed: int = 42, days: int = 365, end: Optional[datetime] = None,
+                    batch_size: int = 10000, collection=None, progress: bool = False) -> float:
+    """
+    Replaces the content of the feedback collection (of MONGO_URI unless one is given) with a
+    generated corpus. Returns the seconds taken.
+    """
+    from pymongo import MongoClient
+
+    client = None
+    if collection is None:
+        client = MongoClient(MONGO_URI)
+        collection = client[DB_NAME][COLLECTION_NAME]
+
+    start_time = time.perf_counter()
+    collection.delete_many({})
+
+    batch: List[Dict] = []
+    inserted = 0
+    for doc in generate_feedback(count, seed, days, end):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            collection.insert_many(batch, ordered=False)
+            inserted += len(batch)
+            batch = []
+            if progress:
+                print(f"\rInserted {inserted}/{count}", end="", file=sys.stderr)
+    if batch:
+        collection.insert_many(batch, ordered=False)
+        inserted += len(batch)
+
+    if progress:
+        print(f"\rInserted {inserted}/{count}", file=sys.stderr)
+    if client is not None:
+        client.close()
+    return time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=parse_count, default=parse_count("10k"), help="Number of documents, e.g. 1M")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--days", type=int, default=365, help="Length of the createdAt range")
+    parser.add_argument("--end", type=datetime.fromisoformat, default=DEFAULT_END, help="End of the createdAt range")
+    parser.add_argument("--jsonl", help="Write the documents to this JSON lines file instead of MongoDB")
+    args = parser.parse_args()
+
+    if args.jsonl:
+        with open(args.jsonl, "w", encoding="utf-8") as f:
+            for doc in generate_feedback(args.docs, args.seed, args.days, args.end):
+                f.write(json.dumps(doc, default=datetime.isoformat) + "\n")
+        return
+
+    seconds = seed_collection(args.docs, args.seed, args.days, args.end, progress=True)
+    print(json.dumps({"docs": args.docs, "seed": args.seed, "seconds": round(seconds, 1)}))
+
+
+if __name__ == "__main__":
+    main()
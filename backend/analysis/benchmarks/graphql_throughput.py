@@ -0,0 +1,177 @@
+"""
+End-to-end requests/sec benchmark of every GraphQL query field against a local mongod.
+
+Start the API (`python main.py`) on the commit under test, then run:
+
+    python -m benchmarks.graphql_throughput --seed-docs 100k --concurrency 32 --duration 20 --output after.json
+
+The collection is seeded with the corpus of benchmarks.corpus, so the same --seed-docs and
+--seed give the same database on every commit. Run the same command on the commits before and
+after a change and diff the two files with `python -m benchmarks.compare before.json after.json`.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict
+
+from dotenv import load_dotenv
+
+from benchmarks.corpus import DEFAULT_END, SERVICES, parse_count, seed_collection
+from benchmarks.results import latency_summary, run_metadata, write_results
+
+# Load environment variables
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/feedback")
+DB_NAME = os.getenv("DB_NAME", "feedback")
+COLLECTION_NAME = os.getenv("COLLECTION_NAME", "feedbacks")
+
+# Window of the windowed queries: the last 30 days of the corpus
+WINDOW_FROM = (DEFAULT_END - timedelta(days=30)).isoformat()
+WINDOW_TO = DEFAULT_END.isoformat()
+
+# One query per Query field, plus the variants served by other code paths;
+# %(service)s and %(id)s are filled in from the seeded collection
+QUERIES = {
+    "feedbacks": "{ feedbacks(limit: 10) { id message sentiment sentimentScore } }",
+    "feedbacksConnection": (
+        "{ feedbacksConnection(first: 20, filter: {service: %(service)s}) "
+        "{ edges { cursor node { id rating sentiment } } pageInfo { hasNextPage endCursor } } }"
+    ),
+    "feedbackById": '{ feedbackById(id: "%(id)s") { id message sentiment topKeywords { word frequency } } }',
+    "feedbackAnalysis": "{ feedbackAnalysis { averageRating totalFeedback sentimentCounts { key value } } }",
+    "feedbackAnalysis[window]": (
+        '{ feedbackAnalysis(from: "' + WINDOW_FROM + '", to: "' + WINDOW_TO + '", granularity: DAY) '
+        "{ totalFeedback averageRating series { start totalFeedback averageSentiment } } }"
+    ),
+    "serviceAnalysis": (
+        "{ serviceAnalysis(service: %(service)s) "
+        "{ totalFeedback averageSentiment sentimentBreakdown { positive neutral negative } topKeywords } }"
+    ),
+    "serviceAnalysis[tfidf]": (
+        "{ serviceAnalysis(service: %(service)s, keywordRanking: TFIDF) { totalFeedback topKeywords } }"
+    ),
+    "servicesAnalysis": (
+        "{ servicesAnalysis { service totalFeedback averageRating averageSentiment "
+        "sentimentBreakdown { positive neutral negative } topKeywords } }"
+    ),
+}
+
+
+def query_parameters() -> Dict[str, str]:
+    """Values substituted into the queries: the most popular service and the id of one of its feedbacks."""
+    from pymongo import MongoClient
+
+    client = MongoClient(MONGO_URI)
+    doc = client[DB_NAME][COLLECTION_NAME].find_one({"service": SERVICES[0]}, {"_id": 1})
+    client.close()
+    return {"service": json.dumps(SERVICES[0]), "id": str(doc["_id"]) if doc else ""}
+
+
+def post_query(url: str, query: str) -> float:
+    """Sends one GraphQL query and returns its latency in seconds."""
+    body = json.dumps({"query": query}).encode("utf-8")
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        payload = json.loads(response.read())
+    if payload.get("errors"):
+        raise RuntimeError(payload["errors"])
+    return time.perf_counter() - start
+
+
+def run(url: str, query: str, concurrency: int, duration: float) -> dict:
+    """Keeps `concurrency` clients busy for `duration` seconds and reports throughput and latency."""
+    deadline = time.perf_counter() + duration
+    latencies = []
+    errors = 0
+    first_error = None
+    lock = threading.Lock()
+
+    def client():
+        nonlocal errors, first_error
+        while time.perf_counter() < deadline:
+            try:
+                latency = post_query(url, query)
+                with lock:
+                    latencies.append(latency)
+            except Exception as e:
+                with lock:
+                    errors += 1
+                    first_error = first_error or str(e)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(client)
+    elapsed = time.perf_counter() - start
+
+    result = {**latency_summary(latencies, elapsed), "errors": errors}
+    if first_error:
+        result["error"] = first_error
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000/graphql")
+    parser.add_argument("--query", choices=sorted(QUERIES), action="append",
+                        help="Query to benchmark (repeatable, default: all)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per query")
+    parser.add_argument("--seed-docs", type=parse_count, default=0,
+                        help="Reseed the collection with this many corpus documents first, e.g. 1M")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the corpus")
+    parser.add_argument("--label", default="", help="Free-form label stored with the results")
+    parser.add_argument("--output", help="Write the results document to this file")
+    args = parser.parse_args()
+
+    if args.seed_docs:
+        seed_collection(args.seed_docs, args.seed, progress=True)
+
+    parameters = query_parameters()
+    names = args.query or sorted(QUERIES)
+
+    # One warm-up request per query so annotation and cache fill are not measured;
+    # a query failing there is reported and not measured, the others still are
+    failed = {}
+    for name in names:
+        try:
+            post_query(args.url, QUERIES[name] % parameters)
+        except Exception as e:
+            print(f"{name}: warm-up failed: {e}", file=sys.stderr)
+            failed[name] = str(e)
+
+    results = []
+    for name in names:
+        if name in failed:
+            results.append({"name": name, "error": failed[name]})
+            continue
+        result = run(args.url, QUERIES[name] % parameters, args.concurrency, args.duration)
+        if result["errors"]:
+            print(f"{name}: {result['errors']} failed requests, first: {result['error']}", file=sys.stderr)
+        results.append({"name": name, **result})
+
+    write_results({
+        "suite": "graphql",
+        **run_metadata(args.label),
+        "url": args.url,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "corpus": {"documents": args.seed_docs or None, "seed": args.seed},
+        "results": results,
+    }, args.output)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Tokens/sec benchmark of keyword extraction on a synthetic corpus.
+
+Compares the previous NLTK path (re.sub + word_tokenize + stopword filter + Counter per message)
+with extract_keywords_batch, with the keywords cache cleared so every message is tokenized:
+
+    python -m benchmarks.keyword_extraction --messages 50000
+
+The NLTK path needs the Punkt tokenizer data (`nltk.download('punkt_tab')`); it is reported as
+skipped when the data is not installed.
+"""
+
+import argparse
+import json
+import re
+import time
+from collections import Counter
+from typing import Dict, List
+
+import analysis
+from benchmarks.sentiment_backends import synthetic_messages
+
+
+def input_tokens(messages: List[str]) -> int:
+    """Whitespace-delimited tokens of the corpus, the common unit of both paths."""
+    return sum(len(message.split()) for message in messages)
+
+
+def nltk_keywords(messages: List[str], top_n: int) -> int:
+    """Previous per-message implementation. Returns the number of input tokens."""
+    from nltk.tokenize import word_tokenize
+
+    stop = analysis._stopwords
+    for message in messages:
+        tokens = word_tokenize(re.sub(r'[^\w\s]', '', message.lower()))
+        Counter(word for word in tokens if word not in stop and len(word) > 2).most_common(top_n)
+    return input_tokens(messages)
+
+
+def batch_keywords(messages: List[str], top_n: int) -> int:
+    """Current batch engine, cache cleared first. Returns the number of input tokens."""
+    analysis.keywords_cache.clear()
+    analysis.extract_keywords_batch(messages, top_n)
+    return input_tokens(messages)
+
+
+def measure(name: str, function, messages: List[str], top_n: int) -> Dict:
+    start = time.perf_counter()
+    tokens = function(messages, top_n)
+    elapsed = time.perf_counter() - start
+    return {
+        "path": name,
+        "messages": len(messages),
+        "tokens": tokens,
+        "seconds": round(elapsed, 3),
+        "tokens_per_sec": round(tokens / elapsed, 1),
+        "messages_per_sec": round(len(messages) / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    messages = synthetic_messages(args.messages, args.seed)
+    analysis.init_nlp_resources()
+    # Large enough that the batch run is not limited by evictions
+    analysis.keywords_cache.max_bytes = max(analysis.keywords_cache.max_bytes, 2000 * len(messages))
+
+    results = [measure("extract_keywords_batch", batch_keywords, messages, args.top_n)]
+    try:
+        results.append(measure("nltk_word_tokenize", nltk_keywords, messages, args.top_n))
+    except LookupError:
+        results.append({"path": "nltk_word_tokenize", "skipped": "NLTK Punkt tokenizer data not installed"})
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
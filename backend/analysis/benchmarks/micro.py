@@ -0,0 +1,103 @@
+"""
+Micro-benchmarks of the analysis functions on a seeded corpus.
+
+Scoring functions are timed call by call, with cold caches (every message scored) and then
+warm caches (every message cached). With --mongo, analyze_service_feedback is timed against
+the collection of MONGO_URI, optionally reseeded first:
+
+    python -m benchmarks.micro --messages 20k --output micro.json
+    python -m benchmarks.micro --mongo --seed-docs 100k --output micro.json
+
+Compare two runs with `python -m benchmarks.compare before.json after.json`.
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Callable, Dict, List
+
+import analysis
+import database
+from benchmarks.corpus import SERVICES, generate_feedback, parse_count, seed_collection
+from benchmarks.results import latency_summary, run_metadata, write_results
+
+
+def corpus_messages(count: int, seed: int) -> List[str]:
+    """Distinct messages of a generated corpus, so a cold pass scores every one of them."""
+    return list(dict.fromkeys(doc["message"] for doc in generate_feedback(count, seed)))
+
+
+def time_calls(name: str, function: Callable, arguments: List) -> Dict:
+    """Times `function` once per argument."""
+    latencies = []
+    for argument in arguments:
+        start = time.perf_counter()
+        function(argument)
+        latencies.append(time.perf_counter() - start)
+    return {"name": name, **latency_summary(latencies)}
+
+
+def scoring_benchmarks(messages: List[str]) -> List[Dict]:
+    analysis.init_nlp_resources()
+    results = []
+
+    analysis.sentiment_cache.clear()
+    results.append(time_calls("get_sentiment_score[cold]", analysis.get_sentiment_score, messages))
+    results.append(time_calls("get_sentiment_score[warm]", analysis.get_sentiment_score, messages))
+
+    analysis.keywords_cache.clear()
+    results.append(time_calls("extract_top_keywords[cold]", analysis.extract_top_keywords, messages))
+    results.append(time_calls("extract_top_keywords[warm]", analysis.extract_top_keywords, messages))
+    return results
+
+
+async def service_analysis_benchmark(iterations: int) -> Dict:
+    """Times analyze_service_feedback round-robin over the services, after one untimed call each."""
+    collection = database.get_collection()
+    for service in SERVICES:
+        await analysis.analyze_service_feedback(collection, service)
+
+    latencies = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        await analysis.analyze_service_feedback(collection, SERVICES[i % len(SERVICES)])
+        latencies.append(time.perf_counter() - start)
+
+    database.close()
+    return {"name": "analyze_service_feedback", **latency_summary(latencies)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=parse_count, default=parse_count("20k"),
+                        help="Corpus documents whose messages are scored")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongo", action="store_true", help="Also benchmark analyze_service_feedback")
+    parser.add_argument("--seed-docs", type=parse_count, default=0,
+                        help="Reseed the collection with this many documents first")
+    parser.add_argument("--iterations", type=int, default=200, help="analyze_service_feedback calls")
+    parser.add_argument("--label", default="", help="Free-form label stored with the results")
+    parser.add_argument("--output", help="Write the results document to this file")
+    args = parser.parse_args()
+
+    messages = corpus_messages(args.messages, args.seed)
+    # Large enough that the warm pass is not limited by evictions
+    analysis.sentiment_cache.max_bytes = max(analysis.sentiment_cache.max_bytes, 500 * len(messages))
+    analysis.keywords_cache.max_bytes = max(analysis.keywords_cache.max_bytes, 2000 * len(messages))
+
+    results = scoring_benchmarks(messages)
+    if args.mongo:
+        if args.seed_docs:
+            seed_collection(args.seed_docs, args.seed, progress=True)
+        results.append(asyncio.run(service_analysis_benchmark(args.iterations)))
+
+    write_results({
+        "suite": "micro",
+        **run_metadata(args.label),
+        "corpus": {"documents": args.messages, "distinct_messages": len(messages), "seed": args.seed},
+        "results": results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Result helpers shared by the benchmark scripts: run metadata, latency summaries and result
+files, in a format benchmarks.compare can diff between two commits.
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+
+def run_metadata(label: str = "") -> Dict[str, Any]:
+    """Describes the run: label, commit under test, time and machine."""
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                         stderr=subprocess.DEVNULL).strip()
+        dirty = bool(subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"], text=True,
+                                             stderr=subprocess.DEVNULL).strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+
+    return {
+        "label": label,
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def latency_summary(latencies: List[float], elapsed: Optional[float] = None) -> Dict[str, Any]:
+    """Summarizes per-operation latencies (seconds) into throughput and percentiles (milliseconds)."""
+    if not latencies:
+        return {"ops": 0}
+
+    ordered = sorted(latencies)
+    elapsed = elapsed if elapsed is not None else sum(ordered)
+
+    def percentile(fraction: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000, 4)
+
+    return {
+        "ops": len(ordered),
+        "seconds": round(elapsed, 3),
+        "ops_per_sec": round(len(ordered) / elapsed, 1) if elapsed > 0 else None,
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 4),
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+    }
+
+
+def write_results(document: Dict[str, Any], output: Optional[str]):
+    """Prints a results document and writes it to `output` if given."""
+    text = json.dumps(document, indent=2)
+    print(text)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+def load_results(path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Loads a results file, either one document with a "results" list or JSON lines of results,
+    keyed by result name.
+    """
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+
+    try:
+        results = json.loads(text)["results"]
+    except (ValueError, KeyError, TypeError):
+        results = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    return {result["name"]: result for result in results}
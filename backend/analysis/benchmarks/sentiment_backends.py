@@ -0,0 +1,118 @@
+"""
+Parity and throughput report of the sentiment backends.
+
+Scores the same corpus with every backend, compares each one against TextBlob (the reference
+the existing annotations were produced with) and measures batch throughput:
+
+    python -m benchmarks.sentiment_backends --messages 20000
+    python -m benchmarks.sentiment_backends --from-mongo 50000   # sample real feedback
+
+Prints one JSON document with, per backend: messages/sec, Pearson correlation and mean absolute
+difference of the scores, and label agreement plus confusion matrix of positive/neutral/negative.
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+from typing import Dict, List
+
+import numpy as np
+from dotenv import load_dotenv
+
+from sentiment_backends import BACKENDS
+
+# Load environment variables
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/feedback")
+DB_NAME = os.getenv("DB_NAME", "feedback")
+COLLECTION_NAME = os.getenv("COLLECTION_NAME", "feedbacks")
+
+LABELS = ["positive", "neutral", "negative"]
+
+SUBJECTS = ["the app", "the checkout", "support", "the dashboard", "the new release", "search", "the mobile site"]
+OPINIONS = [
+    "is great", "is really fast", "works perfectly", "is amazing", "is helpful", "is easy to use",
+    "is terrible", "is slow", "keeps crashing", "is broken", "is confusing", "is not good",
+    "is okay", "was updated yesterday", "loads the page", "is not bad", "could be better", "is fine",
+]
+TAILS = ["", "", "thanks!", "please fix it.", "I love it.", "very disappointing.", "no complaints.", "as usual."]
+
+
+def synthetic_messages(count: int, seed: int = 42) -> List[str]:
+    """Builds `count` short feedback messages from positive, negative and neutral fragments."""
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        parts = [f"{rng.choice(SUBJECTS)} {rng.choice(OPINIONS)}" for _ in range(rng.randint(1, 3))]
+        messages.append(" and ".join(parts) + " " + rng.choice(TAILS))
+    return messages
+
+
+def mongo_messages(count: int) -> List[str]:
+    """Samples `count` messages from the feedback collection."""
+    from pymongo import MongoClient
+
+    client = MongoClient(MONGO_URI)
+    pipeline = [{"$sample": {"size": count}}, {"$project": {"message": 1}}]
+    messages = [doc.get("message", "") for doc in client[DB_NAME][COLLECTION_NAME].aggregate(pipeline)]
+    client.close()
+    return [message for message in messages if message and isinstance(message, str)]
+
+
+def label(scores: np.ndarray) -> np.ndarray:
+    """Applies the classify_sentiment thresholds to an array of scores."""
+    return np.where(scores > 0.1, "positive", np.where(scores < -0.1, "negative", "neutral"))
+
+
+def report(messages: List[str], batch_size: int) -> Dict:
+    """Scores the corpus with every backend and compares each with TextBlob."""
+    results = {}
+    scores = {}
+
+    for name, backend_class in BACKENDS.items():
+        backend = backend_class()
+        start = time.perf_counter()
+        batches = [
+            backend.score_batch(messages[i:i + batch_size])
+            for i in range(0, len(messages), batch_size)
+        ]
+        elapsed = time.perf_counter() - start
+        scores[name] = np.round(np.concatenate(batches), 2)
+        results[name] = {"messages_per_sec": round(len(messages) / elapsed, 1), "seconds": round(elapsed, 3)}
+
+    reference = scores["textblob"]
+    reference_labels = label(reference)
+    for name, backend_scores in scores.items():
+        backend_labels = label(backend_scores)
+        confusion = {
+            expected: {got: int(np.sum((reference_labels == expected) & (backend_labels == got))) for got in LABELS}
+            for expected in LABELS
+        }
+        results[name].update({
+            "pearson_vs_textblob": round(float(np.corrcoef(reference, backend_scores)[0, 1]), 4)
+            if reference.std() and backend_scores.std() else None,
+            "mean_abs_diff_vs_textblob": round(float(np.mean(np.abs(reference - backend_scores))), 4),
+            "label_agreement_vs_textblob": round(float(np.mean(reference_labels == backend_labels)), 4),
+            "confusion_vs_textblob": confusion,
+        })
+
+    return {"messages": len(messages), "batch_size": batch_size, "backends": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20000, help="Size of the synthetic corpus")
+    parser.add_argument("--from-mongo", type=int, default=0, help="Sample this many messages from MongoDB instead")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    messages = mongo_messages(args.from_mongo) if args.from_mongo else synthetic_messages(args.messages, args.seed)
+    print(json.dumps(report(messages, args.batch_size), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Subscriber capacity of one API worker for the feedbackStatsUpdated subscription, over WebSocket.
+
+Start one worker of the API (`python main.py`) on the commit under test, then run:
+
+    python -m benchmarks.subscriptions --subscribers 2000 --duration 30 --insert-rate 20 --output subscriptions.json
+
+Opens --subscribers subscriptions (graphql-transport-ws protocol, --ramp new ones per second) and,
+while they are open, inserts --insert-rate feedbacks per second into the collection of MONGO_URI
+so the live statistics change. Reports how long a subscriber waits for its first update ("connect")
+and, for every later update, the delay between the first and the last subscriber receiving it
+("fanout"), with the number of subscribers held and the errors. Large runs need a higher open files
+limit (ulimit -n) on both ends.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import websockets
+from dotenv import load_dotenv
+
+from benchmarks.corpus import generate_feedback
+from benchmarks.results import latency_summary, run_metadata, write_results
+
+# Load environment variables
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/feedback")
+DB_NAME = os.getenv("DB_NAME", "feedback")
+COLLECTION_NAME = os.getenv("COLLECTION_NAME", "feedbacks")
+
+SUBSCRIPTION = "subscription { feedbackStatsUpdated%s { totalFeedback averageRating sentimentCounts { key value } } }"
+
+
+async def subscribe(url: str, query: str, deadline: float, connect_latencies: List[float],
+                    deliveries: Dict[int, List[float]]):
+    """Holds one subscription until the deadline, recording when each update arrives."""
+    start = time.perf_counter()
+    async with websockets.connect(url, subprotocols=["graphql-transport-ws"], open_timeout=60) as websocket:
+        await websocket.send(json.dumps({"type": "connection_init"}))
+        if json.loads(await websocket.recv())["type"] != "connection_ack":
+            raise RuntimeError("Connection not acknowledged")
+        await websocket.send(json.dumps({"id": "1", "type": "subscribe", "payload": {"query": query}}))
+
+        first = True
+        while time.perf_counter() < deadline:
+            try:
+                message = json.loads(await asyncio.wait_for(websocket.recv(), deadline - time.perf_counter()))
+            except asyncio.TimeoutError:
+                break
+
+            if message["type"] == "ping":
+                await websocket.send(json.dumps({"type": "pong"}))
+            elif message["type"] != "next" or message["payload"].get("errors"):
+                raise RuntimeError(message)
+            elif first:
+                # The whole view, sent on subscription
+                connect_latencies.append(time.perf_counter() - start)
+                first = False
+            else:
+                total = message["payload"]["data"]["feedbackStatsUpdated"]["totalFeedback"]
+                if total is not None:
+                    deliveries.setdefault(total, []).append(time.perf_counter())
+
+
+def insert_feedback(rate: float, stop: threading.Event, seed: int) -> int:
+    """Inserts `rate` generated feedbacks per second, dated now, until stopped. Returns the number inserted."""
+    from pymongo import MongoClient
+
+    client = MongoClient(MONGO_URI)
+    collection = client[DB_NAME][COLLECTION_NAME]
+    inserted = 0
+    for doc in generate_feedback(10_000_000, seed):
+        if stop.wait(1 / rate):
+            break
+        doc["createdAt"] = doc["updatedAt"] = datetime.utcnow()
+        collection.insert_one(doc)
+        inserted += 1
+    client.close()
+    return inserted
+
+
+async def run(url: str, query: str, subscribers: int, ramp: float, duration: float) -> Dict:
+    connect_latencies: List[float] = []
+    deliveries: Dict[int, List[float]] = {}
+    deadline = time.perf_counter() + subscribers / ramp + duration
+
+    tasks = []
+    for _ in range(subscribers):
+        tasks.append(asyncio.create_task(subscribe(url, query, deadline, connect_latencies, deliveries)))
+        await asyncio.sleep(1 / ramp)
+    outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+
+    # Spread of the arrival times of each update among the subscribers that received it
+    fanout = [max(times) - min(times) for times in deliveries.values() if len(times) > 1]
+    errors = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+    return {
+        "subscribers": subscribers,
+        "held": len(connect_latencies),
+        "errors": len(errors),
+        "first_error": repr(errors[0]) if errors else None,
+        "updates": len(deliveries),
+        "deliveries": sum(len(times) for times in deliveries.values()),
+        "results": [
+            {"name": "connect", **latency_summary(connect_latencies)},
+            {"name": "fanout", **latency_summary(fanout)},
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="ws://127.0.0.1:8000/graphql")
+    parser.add_argument("--subscribers", type=int, default=1000)
+    parser.add_argument("--ramp", type=float, default=200.0, help="New subscriptions per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to hold every subscription")
+    parser.add_argument("--service", help="Subscribe to this service instead of the overall statistics")
+    parser.add_argument("--insert-rate", type=float, default=10.0, help="Feedbacks inserted per second, 0 for none")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the inserted feedbacks")
+    parser.add_argument("--label", default="", help="Free-form label stored with the results")
+    parser.add_argument("--output", help="Write the results document to this file")
+    args = parser.parse_args()
+
+    query = SUBSCRIPTION % (f"(service: {json.dumps(args.service)})" if args.service else "")
+
+    stop = threading.Event()
+    inserted = []
+    if args.insert_rate > 0:
+        inserter = threading.Thread(target=lambda: inserted.append(insert_feedback(args.insert_rate, stop, args.seed)))
+        inserter.start()
+    try:
+        outcome = asyncio.run(run(args.url, query, args.subscribers, args.ramp, args.duration))
+    finally:
+        stop.set()
+        if args.insert_rate > 0:
+            inserter.join()
+
+    write_results({
+        "suite": "subscriptions",
+        **run_metadata(args.label),
+        "url": args.url,
+        "service": args.service,
+        "ramp": args.ramp,
+        "duration": args.duration,
+        "insert_rate": args.insert_rate,
+        "inserted": inserted[0] if inserted else 0,
+        **outcome,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Cache module for the feedback analysis API.
+Bounded in-process LRU caches keyed by a compact content hash, with a memory budget,
+optional TTL expiry and hit/miss/eviction counters for monitoring.
+"""
+
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Tuple
+
+# Bookkeeping cost of one entry (OrderedDict node, entry tuple) added to the key and value sizes
+ENTRY_OVERHEAD_BYTES = 120
+
+# All caches created in this process, by name
+_registry: Dict[str, "BoundedCache"] = {}
+
+
+def content_hash(message: str) -> int:
+    """
+    Returns a 64-bit hash of a message, used as cache key instead of the full string.
+    blake2b is stable across processes and restarts, unlike the built-in hash().
+    """
+    digest = hashlib.blake2b(message.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def estimate_size(value: Any) -> int:
+    """Approximates the memory held by a cached value, following lists, tuples and dicts."""
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        size += sum(estimate_size(item) for item in value)
+    elif isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    return size
+
+
+class BoundedCache:
+    """
+    Thread-safe LRU cache bounded by an approximate memory budget in bytes.
+    Entries older than ttl seconds (if set) are treated as misses and dropped.
+    """
+
+    def __init__(self, name: str, max_bytes: int, ttl: Optional[float] = None):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.ttl = ttl or None
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int, Optional[float]]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        _registry[name] = self
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Returns the cached value and marks it as recently used, or default on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        """Stores a value, evicting least recently used entries to stay within the budget."""
+        size = estimate_size(key) + estimate_size(value) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        """Iterates over a snapshot of the live entries, without touching recency or counters."""
+        with self._lock:
+            entries = list(self._entries.items())
+        now = time.monotonic()
+        for key, (value, _, expires_at) in entries:
+            if expires_at is None or expires_at > now:
+                yield key, value
+
+    def clear(self):
+        """Drops every entry. Counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Checks for a live entry without touching recency or counters."""
+        entry = self._entries.get(key)
+        return entry is not None and (entry[2] is None or entry[2] > time.monotonic())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns size and hit/miss/eviction counters of the cache."""
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def cache_stats() -> List[Dict[str, Any]]:
+    """Returns the stats of every cache of this process."""
+    return [cache.stats() for cache in _registry.values()]
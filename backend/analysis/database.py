@@ -0,0 +1,72 @@
+"""
+Database module for the feedback analysis API.
+Owns the single Motor client of the worker process, opened at startup and closed at shutdown.
+"""
+
+import logging
+import os
+from typing import Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection, AsyncIOMotorDatabase
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# MongoDB configuration
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/feedback")
+DB_NAME = os.getenv("DB_NAME", "feedback")
+COLLECTION_NAME = os.getenv("COLLECTION_NAME", "feedbacks")
+ROLLUP_COLLECTION_NAME = os.getenv("ROLLUP_COLLECTION_NAME", "feedback_rollups")
+STATE_COLLECTION_NAME = os.getenv("STATE_COLLECTION_NAME", "analysis_state")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 50))
+
+# Shared client for this worker process
+_client: Optional[AsyncIOMotorClient] = None
+
+
+def connect() -> AsyncIOMotorClient:
+    """
+    Opens the process-wide Motor client if it is not open yet.
+    Called from the application startup hook; the connection pool is reused by every request.
+    """
+    global _client
+
+    if _client is None:
+        _client = AsyncIOMotorClient(MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE)
+        logger.info(f"Opened MongoDB client (maxPoolSize={MONGO_MAX_POOL_SIZE})")
+    return _client
+
+
+def close():
+    """Closes the process-wide Motor client. Called from the application shutdown hook."""
+    global _client
+
+    if _client is not None:
+        _client.close()
+        _client = None
+        logger.info("Closed MongoDB client")
+
+
+def get_db() -> AsyncIOMotorDatabase:
+    """Returns the feedback database from the shared client, opening it on first use."""
+    return connect()[DB_NAME]
+
+
+def get_collection() -> AsyncIOMotorCollection:
+    """Returns the feedback collection from the shared client."""
+    return get_db()[COLLECTION_NAME]
+
+
+def get_rollup_collection() -> AsyncIOMotorCollection:
+    """Returns the collection of time-bucketed feedback rollups from the shared client."""
+    return get_db()[ROLLUP_COLLECTION_NAME]
+
+
+def get_state_collection() -> AsyncIOMotorCollection:
+    """Returns the collection of persisted analysis state (snapshots, resume tokens) from the shared client."""
+    return get_db()[STATE_COLLECTION_NAME]
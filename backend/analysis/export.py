@@ -0,0 +1,123 @@
+"""
+Export module for the feedback analysis API.
+Streams annotated feedbacks as NDJSON or CSV, one cursor batch at a time: each batch is
+annotated (stale rows scored together) and encoded before the next one is fetched, so memory
+stays bounded by the batch size and a slow client slows the cursor down instead of filling buffers.
+"""
+
+import csv
+import io
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from analysis import document_annotations, iter_batches
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Documents fetched, annotated and written per chunk of an export
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+
+# Export formats and their media types
+FORMAT_NDJSON = "ndjson"
+FORMAT_CSV = "csv"
+MEDIA_TYPES = {FORMAT_NDJSON: "application/x-ndjson", FORMAT_CSV: "text/csv"}
+
+# Newest first, backed by the (createdAt, _id) compound indexes like the list queries
+EXPORT_SORT = [("createdAt", -1), ("_id", -1)]
+
+# Columns of an exported row; personal fields (name, email) are not exported
+EXPORT_COLUMNS = (
+    "id", "service", "feedbackType", "rating", "message", "createdAt", "updatedAt",
+    "sentiment", "sentimentScore", "keywords"
+)
+
+# Document fields read for an export: the exported ones and the stored annotation
+EXPORT_PROJECTION = {
+    "_id": 1, "service": 1, "feedbackType": 1, "rating": 1, "message": 1, "createdAt": 1, "updatedAt": 1,
+    "sentiment": 1, "sentimentScore": 1, "keywords": 1, "scorerVersion": 1
+}
+
+
+def export_query(service: Optional[str] = None, feedback_type: Optional[str] = None,
+                 from_: Optional[datetime] = None, to: Optional[datetime] = None) -> Dict[str, Any]:
+    """Builds the MongoDB filter of an export: equality on service and type, createdAt in [from, to)."""
+    query: Dict[str, Any] = {}
+    if service is not None:
+        query["service"] = service
+    if feedback_type is not None:
+        query["feedbackType"] = feedback_type
+    if from_ is not None or to is not None:
+        query["createdAt"] = {}
+        if from_ is not None:
+            query["createdAt"]["$gte"] = from_
+        if to is not None:
+            query["createdAt"]["$lt"] = to
+    return query
+
+
+def export_row(document: Dict[str, Any], annotation: Dict[str, Any]) -> Dict[str, Any]:
+    """Exported row of a feedback document and its annotation."""
+    created_at, updated_at = document.get("createdAt"), document.get("updatedAt")
+    return {
+        "id": str(document["_id"]),
+        "service": document.get("service"),
+        "feedbackType": document.get("feedbackType"),
+        "rating": document.get("rating"),
+        "message": document.get("message"),
+        "createdAt": created_at.isoformat() if created_at else None,
+        "updatedAt": updated_at.isoformat() if updated_at else None,
+        "sentiment": annotation["sentiment"],
+        "sentimentScore": annotation["sentimentScore"],
+        "keywords": annotation["keywords"]
+    }
+
+
+def encode_ndjson(rows: List[Dict[str, Any]]) -> bytes:
+    return "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows).encode("utf-8")
+
+
+def encode_csv(rows: List[Dict[str, Any]], header: bool = False) -> bytes:
+    """CSV lines of the rows; keywords are written as space-separated words, most frequent first."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        values = dict(row, keywords=" ".join(keyword["word"] for keyword in row["keywords"]))
+        writer.writerow(["" if values[column] is None else values[column] for column in EXPORT_COLUMNS])
+    return buffer.getvalue().encode("utf-8")
+
+
+async def iter_export(collection, query: Dict[str, Any], export_format: str = FORMAT_NDJSON,
+                      batch_size: Optional[int] = None) -> AsyncIterator[bytes]:
+    """
+    Yields the encoded chunks of an export, one per cursor batch. The next batch is only
+    fetched once the consumer asks for the next chunk.
+    """
+    exported = 0
+    try:
+        if export_format == FORMAT_CSV:
+            yield encode_csv([], header=True)
+
+        async for batch in iter_batches(collection, query, EXPORT_PROJECTION, batch_size or EXPORT_BATCH_SIZE,
+                                        sort=EXPORT_SORT):
+            annotations = await document_annotations(batch)
+            rows = [export_row(doc, annotation) for doc, annotation in zip(batch, annotations)]
+            yield encode_csv(rows) if export_format == FORMAT_CSV else encode_ndjson(rows)
+            exported += len(rows)
+
+        logger.info(f"Exported {exported} feedbacks as {export_format}")
+    except Exception as e:
+        # Headers are already sent: the client sees a truncated body
+        logger.error(f"Error in iter_export after {exported} rows: {e}")
+        raise
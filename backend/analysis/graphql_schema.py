@@ -3,44 +3,165 @@ GraphQL schema definition for the feedback analysis API.
 Contains type definitions and resolvers with performance optimizations.
 """
 
+import base64
+import os
 import strawberry
-from typing import List, Optional
+from strawberry.dataloader import DataLoader
+from strawberry.types import Info
+from strawberry.types.nodes import FragmentSpread, InlineFragment
+from typing import Annotated, Any, AsyncGenerator, Dict, Iterable, List, Optional
 from datetime import datetime
+from enum import Enum
 from bson import ObjectId
 import logging
-from pymongo import MongoClient
-import os
-from dotenv import load_dotenv
 
+import metrics
 from analysis import (
+    SCORER_VERSION,
     analyze_feedback,
     analyze_service_feedback,
-    extract_top_keywords,
-    classify_sentiment,
-    get_sentiment_score
+    analyze_services_feedback,
+    document_annotation,
+    document_annotations,
+    service_top_keywords,
+    services_top_keywords
+)
+from approximate import approximate_feedback_analysis, approximate_services_analysis
+from batcher import MAX_SCORE_MESSAGES, scoring_batcher
+from database import get_collection, get_rollup_collection
+from live_stats import stats_maintainer
+from response_cache import response_cache
+from subscriptions import stats_broadcaster
+from rollups import (
+    GRANULARITY_DAY,
+    bucket_series,
+    read_buckets,
+    rollups_ready,
+    schedule_rollup_sync,
+    summarize_buckets,
+    top_bucket_keywords
 )
-
-# Load environment variables
-load_dotenv()
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
-# MongoDB configuration
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/feedback")
-DB_NAME = os.getenv("DB_NAME", "feedback")
-COLLECTION_NAME = os.getenv("COLLECTION_NAME", "feedbacks")
+# Upper bound on the page size of the list queries
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 100))
+
+# Keyset order of the list queries, backed by the (createdAt, _id) compound indexes
+FEEDBACK_SORT = [("createdAt", -1), ("_id", -1)]
+
+# Ratings are integers from 1 to 5 (validated by the collection service). A rating range is sent as
+# the list of its values, so the (rating, createdAt, _id) index serves it in keyset order: the
+# server merges the sorted entries of each rating instead of sorting or filtering a whole range.
+MIN_RATING = 1
+MAX_RATING = 5
+
+# Document fields needed by the analysis fields of Feedback
+ANNOTATION_FIELDS = ("message", "sentiment", "sentimentScore", "keywords", "scorerVersion")
+
+# Document fields to fetch for each selectable Feedback field
+FEEDBACK_FIELD_PROJECTION = {
+    "id": ("_id",),
+    "name": ("name",),
+    "email": ("email",),
+    "feedbackType": ("feedbackType",),
+    "service": ("service",),
+    "message": ("message",),
+    "rating": ("rating",),
+    "attachScreenshot": ("attachScreenshot",),
+    "agreeToTerms": ("agreeToTerms",),
+    "createdAt": ("createdAt",),
+    "updatedAt": ("updatedAt",),
+    "sentiment": ANNOTATION_FIELDS,
+    "sentimentScore": ANNOTATION_FIELDS,
+    "topKeywords": ANNOTATION_FIELDS,
+}
+
+
+async def load_message_annotations(messages: List[str]) -> List[Dict[str, Any]]:
+    """DataLoader batch function: annotates every message requested while resolving a page at once."""
+    return await document_annotations([{"message": message} for message in messages])
+
+
+def new_annotation_loader() -> DataLoader:
+    """Creates the per-request DataLoader batching the annotation of unannotated messages."""
+    return DataLoader(load_fn=load_message_annotations)
+
+
+def _selected_names(selections: Iterable) -> Iterable[str]:
+    """Yields the field names of a selection set, looking through fragments."""
+    for selection in selections:
+        if isinstance(selection, (FragmentSpread, InlineFragment)):
+            yield from _selected_names(selection.selections)
+        else:
+            yield selection.name
+
+
+def _child_selections(selections: Iterable, name: str) -> List:
+    """Returns the selections under the field `name` of a selection set, looking through fragments."""
+    children = []
+    for selection in selections:
+        if isinstance(selection, (FragmentSpread, InlineFragment)):
+            children.extend(_child_selections(selection.selections, name))
+        elif selection.name == name:
+            children.extend(selection.selections)
+    return children
+
+
+async def _from_rollups(rollups, windowed: bool, approximate: bool) -> bool:
+    """
+    Whether an analysis is read from the rollup buckets: windows always are, and so are whole-history
+    totals without live statistics once the rollups are synced, so reads never score or scan feedbacks.
+    """
+    if windowed:
+        return True
+    return not approximate and not stats_maintainer.ready and await rollups_ready(rollups)
+
+
+def _bucket_granularity(granularity: "Granularity", windowed: bool, with_series: bool) -> str:
+    """Granularity of the buckets read: whole-history totals without a series add up the fewer day buckets."""
+    return granularity.value if windowed or with_series else GRANULARITY_DAY
+
+
+def feedback_projection(selections: Iterable) -> Dict[str, int]:
+    """Builds the MongoDB projection for the Feedback fields of a selection set."""
+    projection = {"_id": 1}
+    for name in _selected_names(selections):
+        for document_field in FEEDBACK_FIELD_PROJECTION.get(name, ()):
+            projection[document_field] = 1
+    return projection
+
+
+def encode_cursor(document: Dict[str, Any]) -> str:
+    """Encodes the (createdAt, _id) keyset position of a document as an opaque cursor."""
+    raw = f"{document['createdAt'].isoformat()}|{document['_id']}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    """Decodes a cursor produced by encode_cursor into (createdAt, _id)."""
+    try:
+        created_at, object_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(created_at), ObjectId(object_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
 
 
-# Database connection factory (uses connection pooling)
-def get_db():
-    client = MongoClient(MONGO_URI, maxPoolSize=50)
-    db = client[DB_NAME]
-    return db
+# Type definitions
+@strawberry.enum
+class KeywordRanking(Enum):
+    FREQUENCY = "frequency"
+    TFIDF = "tfidf"
+
+
+@strawberry.enum
+class Granularity(Enum):
+    HOUR = "hour"
+    DAY = "day"
 
 
-# Type definitions
 @strawberry.type
 class Keyword:
     word: str
@@ -66,17 +187,68 @@ class Feedback:
     agree_to_terms: bool
     created_at: datetime
     updated_at: datetime
+    document: strawberry.Private[Dict[str, Any]]
+
+    @classmethod
+    def from_document(cls, document: Dict[str, Any]) -> "Feedback":
+        """Builds a Feedback from a (possibly projected) document; unselected fields get placeholders."""
+        return cls(
+            id=str(document["_id"]),
+            name=document.get("name", ""),
+            email=document.get("email", ""),
+            feedback_type=document.get("feedbackType", ""),
+            service=document.get("service", ""),
+            message=document.get("message", ""),
+            rating=document.get("rating", 0),
+            attach_screenshot=document.get("attachScreenshot", False),
+            agree_to_terms=document.get("agreeToTerms", False),
+            created_at=document.get("createdAt"),
+            updated_at=document.get("updatedAt"),
+            document=document,
+        )
+
+    async def annotation(self, info: Info) -> Dict[str, Any]:
+        """
+        Returns the stored annotation, or loads it through the request DataLoader so the
+        NLP work of every unannotated row of a page runs as one batch.
+        """
+        if self.document.get("scorerVersion") == SCORER_VERSION:
+            return document_annotation(self.document)
+
+        if "annotation_loader" not in info.context:
+            info.context["annotation_loader"] = new_annotation_loader()
+        return await info.context["annotation_loader"].load(self.message)
+
+    @strawberry.field
+    async def sentiment(self, info: Info) -> str:
+        return (await self.annotation(info))["sentiment"]
+
+    @strawberry.field
+    async def sentiment_score(self, info: Info) -> float:
+        return (await self.annotation(info))["sentimentScore"]
+
+    @strawberry.field
+    async def top_keywords(self, info: Info) -> List[Keyword]:
+        return [
+            Keyword(word=keyword["word"], frequency=keyword["frequency"])
+            for keyword in (await self.annotation(info))["keywords"][:5]
+        ]
+
+
+@strawberry.type
+class MessageScore:
     sentiment: str
     sentiment_score: float
     top_keywords: List[Keyword]
 
-
-@strawberry.type
-class FeedbackAnalysis:
-    average_rating: float
-    total_feedback: int
-    feedback_type_counts: List[KeyValuePair]
-    sentiment_counts: List[KeyValuePair]
+    @classmethod
+    def from_annotation(cls, annotation: Dict[str, Any]) -> "MessageScore":
+        return cls(
+            sentiment=annotation["sentiment"],
+            sentiment_score=annotation["sentimentScore"],
+            top_keywords=[Keyword(word=keyword["word"], frequency=keyword["frequency"])
+                          for keyword in annotation["keywords"][:5]],
+        )
 
 
 @strawberry.type
@@ -86,6 +258,81 @@ class SentimentBreakdown:
     negative: int
 
 
+@strawberry.type
+class AnalysisBucket:
+    start: datetime
+    total_feedback: int
+    average_rating: float
+    average_sentiment: float
+    sentiment_breakdown: SentimentBreakdown
+
+    @classmethod
+    def from_point(cls, point: Dict[str, Any]) -> "AnalysisBucket":
+        """Builds an AnalysisBucket from a point of rollups.bucket_series."""
+        return cls(
+            start=point["start"],
+            total_feedback=point["total_feedback"],
+            average_rating=point["average_rating"],
+            average_sentiment=point["average_sentiment"],
+            sentiment_breakdown=SentimentBreakdown(
+                positive=point["sentiment_counts"]["positive"],
+                neutral=point["sentiment_counts"]["neutral"],
+                negative=point["sentiment_counts"]["negative"],
+            ),
+        )
+
+
+@strawberry.type
+class ConfidenceInterval:
+    estimate: float
+    low: float
+    high: float
+
+
+@strawberry.type
+class SentimentProportions:
+    positive: ConfidenceInterval
+    neutral: ConfidenceInterval
+    negative: ConfidenceInterval
+
+
+@strawberry.type
+class Approximation:
+    sample_size: int
+    population: int
+    confidence_level: float
+    average_rating: ConfidenceInterval
+    sentiment_proportions: SentimentProportions
+
+    @classmethod
+    def from_estimate(cls, approximation: Optional[Dict[str, Any]]) -> Optional["Approximation"]:
+        """Builds an Approximation from the "approximation" entry of an approximate analysis, if any."""
+        if approximation is None:
+            return None
+        proportions = approximation["sentiment_proportions"]
+        return cls(
+            sample_size=approximation["sample_size"],
+            population=approximation["population"],
+            confidence_level=approximation["confidence_level"],
+            average_rating=ConfidenceInterval(**approximation["average_rating"]),
+            sentiment_proportions=SentimentProportions(
+                positive=ConfidenceInterval(**proportions["positive"]),
+                neutral=ConfidenceInterval(**proportions["neutral"]),
+                negative=ConfidenceInterval(**proportions["negative"]),
+            ),
+        )
+
+
+@strawberry.type
+class FeedbackAnalysis:
+    average_rating: float
+    total_feedback: int
+    feedback_type_counts: List[KeyValuePair]
+    sentiment_counts: List[KeyValuePair]
+    series: List[AnalysisBucket] = strawberry.field(default_factory=list)
+    approximation: Optional[Approximation] = None
+
+
 @strawberry.type
 class ServiceAnalysis:
     service: str
@@ -94,115 +341,226 @@ class ServiceAnalysis:
     average_sentiment: float
     sentiment_breakdown: SentimentBreakdown
     top_keywords: List[str]
+    series: List[AnalysisBucket] = strawberry.field(default_factory=list)
+    approximation: Optional[Approximation] = None
+
+    @classmethod
+    def from_analysis(cls, service: str, analysis: Dict[str, Any]) -> "ServiceAnalysis":
+        """Builds a ServiceAnalysis from the result of analyze_service_feedback, with its series points."""
+        return cls(
+            service=service,
+            total_feedback=analysis["total_feedback"],
+            average_rating=analysis["average_rating"],
+            average_sentiment=analysis["average_sentiment"],
+            sentiment_breakdown=SentimentBreakdown(
+                positive=analysis["sentiment_breakdown"]["positive"],
+                neutral=analysis["sentiment_breakdown"]["neutral"],
+                negative=analysis["sentiment_breakdown"]["negative"],
+            ),
+            top_keywords=analysis["top_keywords"],
+            series=[AnalysisBucket.from_point(point) for point in analysis.get("series", [])],
+            approximation=Approximation.from_estimate(analysis.get("approximation")),
+        )
+
+
+@strawberry.type
+class FeedbackStatsUpdate:
+    """Live statistics of a service, or of every service; null fields did not change since the last update."""
+    service: Optional[str]
+    total_feedback: Optional[int] = None
+    average_rating: Optional[float] = None
+    average_sentiment: Optional[float] = None
+    sentiment_counts: Optional[List[KeyValuePair]] = None
+    feedback_type_counts: Optional[List[KeyValuePair]] = None
+
+    @classmethod
+    def from_delta(cls, service: Optional[str], delta: Dict[str, Any]) -> "FeedbackStatsUpdate":
+        """Builds an update from a delta of subscriptions.StatsBroadcaster; counters hold the changed keys only."""
+        counters = {
+            field: [KeyValuePair(key=key, value=value) for key, value in delta[field].items()]
+            for field in ("sentiment_counts", "feedback_type_counts") if field in delta
+        }
+        return cls(
+            service=service,
+            total_feedback=delta.get("total_feedback"),
+            average_rating=delta.get("average_rating"),
+            average_sentiment=delta.get("average_sentiment"),
+            **counters,
+        )
+
+
+@strawberry.input
+class FeedbackFilter:
+    service: Optional[str] = None
+    feedback_type: Optional[str] = None
+    min_rating: Optional[int] = None
+    max_rating: Optional[int] = None
+
+    def to_query(self) -> Dict[str, Any]:
+        """Builds the MongoDB filter; equality fields lead the compound indexes, rating is a list of values."""
+        query = {}
+        if self.service is not None:
+            query["service"] = self.service
+        if self.feedback_type is not None:
+            query["feedbackType"] = self.feedback_type
+        if self.min_rating is not None or self.max_rating is not None:
+            low = max(MIN_RATING, self.min_rating if self.min_rating is not None else MIN_RATING)
+            high = min(MAX_RATING, self.max_rating if self.max_rating is not None else MAX_RATING)
+            query["rating"] = {"$in": list(range(low, high + 1))}
+        return query
+
+
+@strawberry.type
+class FeedbackEdge:
+    cursor: str
+    node: Feedback
+
+
+@strawberry.type
+class PageInfo:
+    has_next_page: bool
+    end_cursor: Optional[str]
+
+
+@strawberry.type
+class FeedbackConnection:
+    edges: List[FeedbackEdge]
+    page_info: PageInfo
 
 
 # GraphQL Query resolver
 @strawberry.type
 class Query:
     @strawberry.field
-    def feedbacks(self, limit: int = 10, skip: int = 0) -> List[Feedback]:
-        """Get a paginated list of feedback entries with sentiment analysis."""
-        db = get_db()
-        collection = db[COLLECTION_NAME]
+    async def feedbacks(self, info: Info, limit: int = 10, skip: int = 0) -> List[Feedback]:
+        """
+        Get a paginated list of feedback entries with sentiment analysis.
+        Only the selected fields are fetched; analysis fields are resolved lazily.
+        Deep pages cost O(skip): prefer feedbacksConnection for large offsets.
+        """
+        collection = get_collection()
+        limit = max(0, min(limit, MAX_PAGE_SIZE))
+        if limit == 0:
+            return []
 
         # Use projection and sorting for better performance
-        feedback_list = collection.find().sort("createdAt", -1).skip(skip).limit(limit)
+        projection = feedback_projection(info.selected_fields[0].selections)
+        cursor = collection.find({}, projection).sort(FEEDBACK_SORT).skip(skip).limit(limit)
+        with metrics.stage(metrics.STAGE_MONGO):
+            feedback_list = await cursor.to_list(length=limit)
+        # Skipped entries are read from the index too
+        metrics.add_scanned(skip + len(feedback_list))
 
-        result = []
-        for f in feedback_list:
-            message = f.get("message", "")
-            sentiment = classify_sentiment(message)
-            sentiment_score = get_sentiment_score(message)
+        return [Feedback.from_document(f) for f in feedback_list]
 
-            keywords = [
-                Keyword(word=word, frequency=freq)
-                for word, freq in extract_top_keywords(message)
+    @strawberry.field
+    async def feedbacks_connection(self, info: Info, first: int = 10, after: Optional[str] = None,
+                                   filter: Optional[FeedbackFilter] = None) -> FeedbackConnection:
+        """
+        Get a page of feedback entries with keyset pagination on (createdAt, _id).
+        Every page, however deep, is one index range scan of at most `first` + 1 entries.
+        """
+        collection = get_collection()
+        first = max(0, min(first, MAX_PAGE_SIZE))
+
+        query = filter.to_query() if filter else {}
+        if after:
+            created_at, object_id = decode_cursor(after)
+            query["$or"] = [
+                {"createdAt": {"$lt": created_at}},
+                {"createdAt": created_at, "_id": {"$lt": object_id}}
             ]
 
-            result.append(
-                Feedback(
-                    id=str(f["_id"]),
-                    name=f["name"],
-                    email=f["email"],
-                    feedback_type=f["feedbackType"],
-                    service=f["service"],
-                    message=message,
-                    rating=f["rating"],
-                    attach_screenshot=f["attachScreenshot"],
-                    agree_to_terms=f["agreeToTerms"],
-                    created_at=f["createdAt"],
-                    updated_at=f["updatedAt"],
-                    sentiment=sentiment,
-                    sentiment_score=sentiment_score,
-                    top_keywords=keywords,
-                )
+        # The cursor of each edge needs createdAt, whatever the selection
+        node_selections = _child_selections(_child_selections(info.selected_fields[0].selections, "edges"), "node")
+        projection = feedback_projection(node_selections)
+        projection["createdAt"] = 1
+
+        # Fetch one extra document to know whether there is a next page
+        cursor = collection.find(query, projection).sort(FEEDBACK_SORT).limit(first + 1)
+        with metrics.stage(metrics.STAGE_MONGO):
+            documents = await cursor.to_list(length=first + 1)
+        metrics.add_scanned(len(documents))
+        has_next_page = len(documents) > first
+        documents = documents[:first]
+
+        edges = [FeedbackEdge(cursor=encode_cursor(doc), node=Feedback.from_document(doc)) for doc in documents]
+        return FeedbackConnection(
+            edges=edges,
+            page_info=PageInfo(
+                has_next_page=has_next_page,
+                end_cursor=edges[-1].cursor if edges else None
             )
-
-        return result
+        )
 
     @strawberry.field
-    def feedback_by_id(self, id: str) -> Optional[Feedback]:
+    async def feedback_by_id(self, info: Info, id: str) -> Optional[Feedback]:
         """Get a specific feedback entry by ID with sentiment analysis."""
-        db = get_db()
-        collection = db[COLLECTION_NAME]
+        collection = get_collection()
 
         try:
-            feedback = collection.find_one({"_id": ObjectId(id)})
+            projection = feedback_projection(info.selected_fields[0].selections)
+            with metrics.stage(metrics.STAGE_MONGO):
+                feedback = await collection.find_one({"_id": ObjectId(id)}, projection)
+            metrics.add_scanned(1 if feedback else 0)
 
             if feedback:
-                message = feedback.get("message", "")
-                sentiment = classify_sentiment(message)
-                sentiment_score = get_sentiment_score(message)
-
-                keywords = [
-                    Keyword(word=word, frequency=freq)
-                    for word, freq in extract_top_keywords(message)
-                ]
-
-                return Feedback(
-                    id=str(feedback["_id"]),
-                    name=feedback["name"],
-                    email=feedback["email"],
-                    feedback_type=feedback["feedbackType"],
-                    service=feedback["service"],
-                    message=message,
-                    rating=feedback["rating"],
-                    attach_screenshot=feedback["attachScreenshot"],
-                    agree_to_terms=feedback["agreeToTerms"],
-                    created_at=feedback["createdAt"],
-                    updated_at=feedback["updatedAt"],
-                    sentiment=sentiment,
-                    sentiment_score=sentiment_score,
-                    top_keywords=keywords,
-                )
+                return Feedback.from_document(feedback)
             return None
         except Exception as e:
             logger.error(f"Error in feedback_by_id: {e}")
             return None
 
     @strawberry.field
-    def feedback_analysis(self) -> FeedbackAnalysis:
-        """Get overall feedback analysis with aggregated metrics."""
-        db = get_db()
-        collection = db[COLLECTION_NAME]
-
-        analysis = analyze_feedback(collection)
-
-        # Calculate sentiment counts using aggregation
-        pipeline = [
-            {"$project": {"message": 1}},
-            {"$group": {"_id": None, "messages": {"$push": "$message"}}}
-        ]
-
-        result = list(collection.aggregate(pipeline))
-        sentiment_counts = {"positive": 0, "neutral": 0, "negative": 0}
-
-        if result:
-            messages = result[0].get("messages", [])
-            for message in messages:
-                if message and isinstance(message, str):
-                    sentiment = classify_sentiment(message)
-                    sentiment_counts[sentiment] += 1
+    async def feedback_analysis(self, info: Info,
+                                from_: Annotated[Optional[datetime], strawberry.argument(name="from")] = None,
+                                to: Optional[datetime] = None,
+                                granularity: Granularity = Granularity.DAY,
+                                approximate: bool = False,
+                                sample_size: Optional[int] = None) -> FeedbackAnalysis:
+        """
+        Get overall feedback analysis with aggregated metrics.
+        With from/to the metrics cover that window and are read from the rollup buckets;
+        series is the time series of the window at the requested granularity.
+        With approximate the metrics are estimated from a random sample of sampleSize feedbacks,
+        with confidence intervals in approximation; windows are always read from the rollups.
+        Results computed from MongoDB are served from the response cache until the data changes.
+        """
+        collection = get_collection()
+        windowed = from_ is not None or to is not None
+        approximate = approximate and not windowed
+        with_series = "series" in _selected_names(info.selected_fields[0].selections)
+
+        async def compute() -> Dict[str, Any]:
+            rollups = get_rollup_collection()
+            from_rollups = await _from_rollups(rollups, windowed, approximate)
+            buckets = []
+            if from_rollups or with_series:
+                schedule_rollup_sync(collection, rollups)
+                buckets = await read_buckets(rollups, _bucket_granularity(granularity, windowed, with_series),
+                                             from_, to)
+
+            if from_rollups:
+                analysis = summarize_buckets(buckets)
+            elif approximate:
+                analysis = await approximate_feedback_analysis(collection, sample_size)
+            elif stats_maintainer.ready:
+                # Running aggregates kept up to date by the live statistics maintainer
+                analysis = stats_maintainer.stats.overall()
+            else:
+                # Until the first rollup sync: sentiment counts come from persisted annotations
+                schedule_rollup_sync(collection, rollups)
+                analysis = await analyze_feedback(collection)
+
+            analysis["series"] = bucket_series(buckets) if with_series else []
+            return analysis
+
+        # Live statistics are already a lookup, and trail the collection: a cached copy would outlive them
+        if windowed or approximate or not stats_maintainer.ready:
+            key = ("feedbackAnalysis", from_, to, granularity.value, with_series, approximate, sample_size)
+            analysis = await response_cache.get_or_compute(key, collection, get_rollup_collection(), compute)
+        else:
+            analysis = await compute()
 
         # Convert dicts to List[KeyValuePair]
         feedback_type_counts = [
@@ -212,7 +570,7 @@ class Query:
 
         sentiment_counts_list = [
             KeyValuePair(key=key, value=value)
-            for key, value in sentiment_counts.items()
+            for key, value in analysis["sentiment_counts"].items()
         ]
 
         return FeedbackAnalysis(
@@ -220,25 +578,168 @@ class Query:
             total_feedback=analysis["total_feedback"],
             feedback_type_counts=feedback_type_counts,
             sentiment_counts=sentiment_counts_list,
+            series=[AnalysisBucket.from_point(point) for point in analysis["series"]],
+            approximation=Approximation.from_estimate(analysis.get("approximation")),
         )
 
     @strawberry.field
-    def service_analysis(self, service: str) -> ServiceAnalysis:
-        """Get analysis for a specific service with detailed metrics."""
-        db = get_db()
-        collection = db[COLLECTION_NAME]
-
-        analysis = analyze_service_feedback(collection, service)
+    async def service_analysis(self, info: Info, service: str,
+                               keyword_ranking: KeywordRanking = KeywordRanking.FREQUENCY,
+                               from_: Annotated[Optional[datetime], strawberry.argument(name="from")] = None,
+                               to: Optional[datetime] = None,
+                               granularity: Granularity = Granularity.DAY,
+                               approximate: bool = False,
+                               sample_size: Optional[int] = None) -> ServiceAnalysis:
+        """
+        Get analysis for a specific service with detailed metrics.
+        Top keywords are ranked by document frequency, or by TF-IDF to surface terms distinctive of the service.
+        With from/to the metrics cover that window and are read from the rollup buckets.
+        With approximate the metrics are estimated from the feedbacks of the service among a random
+        sample of sampleSize feedbacks, and top keywords come from the keyword index.
+        Results computed from MongoDB are served from the response cache until the data changes.
+        """
+        collection = get_collection()
+        windowed = from_ is not None or to is not None
+        approximate = approximate and not windowed
+        with_series = "series" in _selected_names(info.selected_fields[0].selections)
+
+        async def compute() -> Dict[str, Any]:
+            rollups = get_rollup_collection()
+            from_rollups = await _from_rollups(rollups, windowed, approximate)
+            buckets = []
+            if from_rollups or with_series:
+                schedule_rollup_sync(collection, rollups)
+                buckets = await read_buckets(rollups, _bucket_granularity(granularity, windowed, with_series),
+                                             from_, to, service=service, with_keywords=windowed)
+
+            if from_rollups:
+                analysis = summarize_buckets(buckets)
+                analysis["sentiment_breakdown"] = analysis["sentiment_counts"]
+                if windowed:
+                    analysis["top_keywords"] = top_bucket_keywords(buckets, ranking=keyword_ranking.value)
+                else:
+                    analysis["top_keywords"] = await service_top_keywords(collection, service, keyword_ranking.value)
+            elif approximate:
+                analyses = await approximate_services_analysis(collection, [service], sample_size,
+                                                               keyword_ranking.value)
+                analysis = analyses[service]
+            elif stats_maintainer.ready:
+                analysis = stats_maintainer.stats.service(service)
+                analysis["top_keywords"] = await service_top_keywords(collection, service, keyword_ranking.value)
+            else:
+                schedule_rollup_sync(collection, rollups)
+                analysis = await analyze_service_feedback(collection, service, keyword_ranking.value)
+
+            analysis["series"] = bucket_series(buckets) if with_series else []
+            return analysis
+
+        if windowed or approximate or not stats_maintainer.ready:
+            key = ("serviceAnalysis", service, keyword_ranking.value, from_, to, granularity.value, with_series,
+                   approximate, sample_size)
+            analysis = await response_cache.get_or_compute(key, collection, get_rollup_collection(), compute)
+        else:
+            analysis = await compute()
+
+        return ServiceAnalysis.from_analysis(service, analysis)
 
-        return ServiceAnalysis(
-            service=service,
-            total_feedback=analysis["total_feedback"],
-            average_rating=analysis["average_rating"],
-            average_sentiment=analysis["average_sentiment"],
-            sentiment_breakdown=SentimentBreakdown(
-                positive=analysis["sentiment_breakdown"]["positive"],
-                neutral=analysis["sentiment_breakdown"]["neutral"],
-                negative=analysis["sentiment_breakdown"]["negative"],
-            ),
-            top_keywords=analysis["top_keywords"],
-        )
\ No newline at end of file
+    @strawberry.field
+    async def services_analysis(self, info: Info, services: Optional[List[str]] = None,
+                                keyword_ranking: KeywordRanking = KeywordRanking.FREQUENCY,
+                                from_: Annotated[Optional[datetime], strawberry.argument(name="from")] = None,
+                                to: Optional[datetime] = None,
+                                granularity: Granularity = Granularity.DAY,
+                                approximate: bool = False,
+                                sample_size: Optional[int] = None) -> List[ServiceAnalysis]:
+        """
+        Get the analysis of several services at once, in the order requested, or of every service
+        (by name) if services is omitted. Same fields and arguments as serviceAnalysis, computed with
+        one aggregation grouped by service instead of one per service, or from one shared sample.
+        """
+        collection = get_collection()
+        windowed = from_ is not None or to is not None
+        approximate = approximate and not windowed
+        with_series = "series" in _selected_names(info.selected_fields[0].selections)
+        if services is not None:
+            services = list(dict.fromkeys(services))
+            if not services:
+                return []
+
+        async def compute() -> Dict[str, Dict[str, Any]]:
+            rollups = get_rollup_collection()
+            from_rollups = await _from_rollups(rollups, windowed, approximate)
+            buckets_by_service: Dict[str, List[Dict[str, Any]]] = {}
+            if from_rollups or with_series:
+                schedule_rollup_sync(collection, rollups)
+                for bucket in await read_buckets(rollups, _bucket_granularity(granularity, windowed, with_series),
+                                                 from_, to, with_keywords=windowed, services=services):
+                    buckets_by_service.setdefault(bucket["service"], []).append(bucket)
+
+            if from_rollups:
+                analyses = {}
+                for service in services if services is not None else buckets_by_service:
+                    buckets = buckets_by_service.get(service, [])
+                    analysis = analyses[service] = summarize_buckets(buckets)
+                    analysis["sentiment_breakdown"] = analysis["sentiment_counts"]
+                    if windowed:
+                        analysis["top_keywords"] = top_bucket_keywords(buckets, ranking=keyword_ranking.value)
+                if not windowed:
+                    keywords = await services_top_keywords(collection, list(analyses), keyword_ranking.value)
+                    for service, analysis in analyses.items():
+                        analysis["top_keywords"] = keywords[service]
+            elif approximate:
+                analyses = await approximate_services_analysis(collection, services, sample_size, keyword_ranking.value)
+            elif stats_maintainer.ready:
+                names = services if services is not None else [name for name in stats_maintainer.stats.services if name]
+                analyses = {service: stats_maintainer.stats.service(service) for service in names}
+                keywords = await services_top_keywords(collection, names, keyword_ranking.value)
+                for service, analysis in analyses.items():
+                    analysis["top_keywords"] = keywords[service]
+            else:
+                schedule_rollup_sync(collection, rollups)
+                analyses = await analyze_services_feedback(collection, services, keyword_ranking.value)
+
+            for service, analysis in analyses.items():
+                analysis["series"] = bucket_series(buckets_by_service.get(service, [])) if with_series else []
+            return analyses
+
+        if windowed or approximate or not stats_maintainer.ready:
+            key = ("servicesAnalysis", tuple(services) if services is not None else None, keyword_ranking.value,
+                   from_, to, granularity.value, with_series, approximate, sample_size)
+            analyses = await response_cache.get_or_compute(key, collection, get_rollup_collection(), compute)
+        else:
+            analyses = await compute()
+
+        names = services if services is not None else sorted(service for service in analyses if service is not None)
+        return [ServiceAnalysis.from_analysis(service, analyses[service]) for service in names]
+
+
+# GraphQL Mutation resolver
+@strawberry.type
+class Mutation:
+    @strawberry.mutation
+    async def score_feedback(self, messages: List[str]) -> List[MessageScore]:
+        """
+        Scores messages with the sentiment and keyword logic of the analytics, e.g. at ingest time.
+        Nothing is stored. Messages of concurrent requests are scored together in micro-batches,
+        and their scores fill the caches the analytics read.
+        """
+        if len(messages) > MAX_SCORE_MESSAGES:
+            raise ValueError(f"At most {MAX_SCORE_MESSAGES} messages can be scored per request")
+
+        annotations = await scoring_batcher.score(messages)
+        return [MessageScore.from_annotation(annotation) for annotation in annotations]
+
+
+# GraphQL Subscription resolver
+@strawberry.type
+class Subscription:
+    @strawberry.subscription
+    async def feedback_stats_updated(self, service: Optional[str] = None) -> AsyncGenerator[FeedbackStatsUpdate, None]:
+        """
+        Live statistics of a service, or of every service if omitted, pushed as they change.
+        The first update holds every field, the next ones only the fields and counters that changed.
+        Updates follow the live statistics maintainer: nothing is sent before it is ready.
+        """
+        with stats_broadcaster.subscribe(service) as subscriber:
+            async for delta in subscriber:
+                yield FeedbackStatsUpdate.from_delta(service, delta)
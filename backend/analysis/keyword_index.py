@@ -0,0 +1,173 @@
+"""
+Keyword index module for the feedback analysis API.
+In-memory inverted index of the persisted keywords: for every service and term, the number of
+documents having the term among their keywords (document frequency) and the sum of its
+frequencies (term frequency), kept in growable NumPy arrays indexed by term id.
+"""
+
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Keyword rankings supported by top_terms
+RANKING_FREQUENCY = "frequency"
+RANKING_TFIDF = "tfidf"
+
+# Initial capacity (terms) of the per-service arrays, doubled when the vocabulary outgrows it
+INITIAL_CAPACITY = 1024
+
+
+class ServiceTerms:
+    """Term statistics of one service."""
+
+    def __init__(self, capacity: int):
+        self.documents = 0
+        self.document_frequency = np.zeros(capacity, dtype=np.int64)
+        self.term_frequency = np.zeros(capacity, dtype=np.int64)
+
+    def grow(self, capacity: int):
+        """Extends the arrays to hold at least `capacity` terms."""
+        size = len(self.document_frequency)
+        if capacity > size:
+            new_size = max(capacity, size * 2)
+            self.document_frequency = np.concatenate(
+                [self.document_frequency, np.zeros(new_size - size, dtype=np.int64)])
+            self.term_frequency = np.concatenate(
+                [self.term_frequency, np.zeros(new_size - size, dtype=np.int64)])
+
+
+class KeywordIndex:
+    """
+    Inverted keyword index over all services.
+    Thread-safe; `mark` is the (createdAt, _id) high-water mark of the documents already indexed.
+    """
+
+    def __init__(self):
+        self._term_ids: Dict[str, int] = {}
+        self._terms: List[str] = []
+        self._services: Dict[str, ServiceTerms] = {}
+        # Number of services in which each term occurs, for the IDF of TF-IDF ranking
+        self._service_frequency = np.zeros(INITIAL_CAPACITY, dtype=np.int64)
+        self._lock = threading.Lock()
+        self.mark: Optional[Tuple[datetime, Any]] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.mark is not None
+
+    def _term_id(self, term: str) -> int:
+        term_id = self._term_ids.get(term)
+        if term_id is None:
+            term_id = len(self._terms)
+            self._term_ids[term] = term_id
+            self._terms.append(term)
+            if term_id >= len(self._service_frequency):
+                self._service_frequency = np.concatenate(
+                    [self._service_frequency, np.zeros(len(self._service_frequency), dtype=np.int64)])
+        return term_id
+
+    def _service(self, service: str) -> ServiceTerms:
+        terms = self._services.get(service)
+        if terms is None:
+            terms = ServiceTerms(max(INITIAL_CAPACITY, len(self._terms)))
+            self._services[service] = terms
+        return terms
+
+    def add_counts(self, service: str, term: str, document_frequency: int, term_frequency: int):
+        """Adds aggregated counts of one term, e.g. from a bootstrap aggregation."""
+        with self._lock:
+            term_id = self._term_id(term)
+            terms = self._service(service)
+            terms.grow(term_id + 1)
+            if terms.document_frequency[term_id] == 0 and document_frequency > 0:
+                self._service_frequency[term_id] += 1
+            terms.document_frequency[term_id] += document_frequency
+            terms.term_frequency[term_id] += term_frequency
+
+    def add_document_count(self, service: str, documents: int):
+        """Adds to the number of documents indexed for a service."""
+        with self._lock:
+            self._service(service).documents += documents
+
+    def add_document(self, service: str, keywords: List[Dict[str, Any]]):
+        """Indexes the persisted keywords ({word, frequency} dicts) of one new document."""
+        with self._lock:
+            terms = self._service(service)
+            terms.documents += 1
+            for keyword in keywords:
+                term_id = self._term_id(keyword["word"])
+                terms.grow(term_id + 1)
+                if terms.document_frequency[term_id] == 0:
+                    self._service_frequency[term_id] += 1
+                terms.document_frequency[term_id] += 1
+                terms.term_frequency[term_id] += keyword["frequency"]
+
+    def top_terms(self, service: str, k: int = 5, ranking: str = RANKING_FREQUENCY) -> List[str]:
+        """
+        Returns the k best terms of a service: by document frequency, or by TF-IDF across services.
+        Selection is a vectorized argpartition over the vocabulary, then only the k winners are sorted.
+        """
+        with self._lock:
+            terms = self._services.get(service)
+            if terms is None or k <= 0:
+                return []
+
+            size = len(self._terms)
+            terms.grow(size)
+            if ranking == RANKING_TFIDF:
+                service_count = len(self._services)
+                idf = np.log((1 + service_count) / (1 + self._service_frequency[:size])) + 1.0
+                scores = terms.term_frequency[:size] * idf
+            else:
+                scores = terms.document_frequency[:size].astype(np.float64)
+
+            candidates = np.flatnonzero(scores > 0)
+            if len(candidates) > k:
+                # Keep every term scoring at least the k-th best, so ties at the boundary are all kept
+                kth = -np.partition(-scores[candidates], k - 1)[k - 1]
+                candidates = candidates[scores[candidates] >= kth]
+
+            # Highest score first, ties broken alphabetically for stable results
+            return [
+                self._terms[term_id]
+                for term_id in sorted(candidates, key=lambda term_id: (-scores[term_id], self._terms[term_id]))[:k]
+            ]
+
+    def document_counts(self) -> Dict[str, int]:
+        """Returns the number of documents indexed per service."""
+        with self._lock:
+            return {service: terms.documents for service, terms in self._services.items()}
+
+    def idf(self, terms: List[str]) -> np.ndarray:
+        """Returns the TF-IDF inverse service frequency of each term; unknown terms get the highest weight."""
+        with self._lock:
+            service_count = len(self._services)
+            service_frequency = np.array([
+                self._service_frequency[self._term_ids[term]] if term in self._term_ids else 0
+                for term in terms
+            ], dtype=np.int64)
+        return np.log((1 + service_count) / (1 + service_frequency)) + 1.0
+
+    def clear(self):
+        """Drops every statistic, e.g. before a rebuild."""
+        with self._lock:
+            self._term_ids.clear()
+            self._terms.clear()
+            self._services.clear()
+            self._service_frequency = np.zeros(INITIAL_CAPACITY, dtype=np.int64)
+            self.mark = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the size of the index."""
+        return {
+            "terms": len(self._terms),
+            "services": len(self._services),
+            "documents": sum(terms.documents for terms in self._services.values()),
+            "mark": [self.mark[0].isoformat(), str(self.mark[1])] if self.mark is not None else None
+        }
+
+
+# Index of this worker process
+keyword_index = KeywordIndex()
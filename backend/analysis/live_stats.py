@@ -0,0 +1,490 @@
+"""
+Live statistics module for the feedback analysis API.
+Keeps running per-service aggregates (totals, rating sums, sentiment counts) up to date by
+tailing the feedback collection: a change stream on replica sets and sharded clusters,
+polling on (createdAt, _id) otherwise. Feedback is only ever inserted, so inserts are all it follows.
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from dotenv import load_dotenv
+
+from analysis import ANALYSIS_BATCH_SIZE, SCORER_VERSION, annotate_missing, persist_annotations
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# One worker (the leader) tails the collection and holds a lease renewed with every snapshot;
+# the other workers reload the snapshot
+STATS_LEASE_SECONDS = int(os.getenv("STATS_LEASE_SECONDS", 15))
+STATS_SNAPSHOT_SECONDS = float(os.getenv("STATS_SNAPSHOT_SECONDS", 1))
+STATS_REFRESH_SECONDS = float(os.getenv("STATS_REFRESH_SECONDS", 2))
+
+# Polling fallback: seconds between polls, and age under which documents are left for the
+# next poll so inserts still in flight cannot land behind the high-water mark
+STATS_POLL_INTERVAL = float(os.getenv("STATS_POLL_INTERVAL", 1))
+STATS_POLL_LAG_SECONDS = int(os.getenv("STATS_POLL_LAG_SECONDS", 5))
+
+# Seconds to wait before retrying after an error
+STATS_RETRY_SECONDS = 5
+
+# _id of the snapshot document in the state collection
+STATS_STATE_ID = "live_stats"
+
+# Tailing modes
+MODE_CHANGE_STREAM = "change_stream"
+MODE_POLLING = "polling"
+
+# Change stream errors after which the resume token is unusable and the aggregates are rebuilt:
+# InvalidResumeToken, ChangeStreamFatalError, ChangeStreamHistoryLost
+RESUME_ERROR_CODES = {260, 280, 286}
+
+# Fields of a feedback document needed to score it and update the aggregates
+STATS_PROJECTION = {
+    "_id": 1, "createdAt": 1, "service": 1, "feedbackType": 1, "rating": 1, "message": 1,
+    "sentiment": 1, "sentimentScore": 1, "scorerVersion": 1
+}
+
+
+def _empty_service() -> Dict[str, Any]:
+    return {
+        "count": 0,
+        "ratingSum": 0,
+        "sentimentCount": 0,
+        "sentimentSum": 0.0,
+        "sentiment": {"positive": 0, "neutral": 0, "negative": 0},
+        "feedbackTypes": {}
+    }
+
+
+class LiveStats:
+    """Running aggregates per service. Every update is O(1); reads are O(number of services)."""
+
+    def __init__(self, services: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.services: Dict[str, Dict[str, Any]] = services or {}
+
+    def add_group(self, service: str, feedback_type: Optional[str], count: int, rating_sum: float,
+                  sentiment_sum: float, sentiment_counts: Dict[str, int]):
+        """Adds the aggregated counts of one (service, feedbackType) group."""
+        totals = self.services.get(service)
+        if totals is None:
+            totals = self.services[service] = _empty_service()
+
+        totals["count"] += count
+        totals["ratingSum"] += rating_sum
+        totals["sentimentSum"] += sentiment_sum
+        for label, label_count in sentiment_counts.items():
+            totals["sentiment"][label] = totals["sentiment"].get(label, 0) + label_count
+            totals["sentimentCount"] += label_count
+        if feedback_type is not None:
+            totals["feedbackTypes"][feedback_type] = totals["feedbackTypes"].get(feedback_type, 0) + count
+
+    def add(self, doc: Dict[str, Any]):
+        """Adds one annotated feedback document."""
+        rating = doc.get("rating")
+        sentiment = doc.get("sentiment")
+        self.add_group(
+            doc.get("service"),
+            doc.get("feedbackType"),
+            1,
+            rating if isinstance(rating, (int, float)) else 0,
+            (doc.get("sentimentScore") or 0.0) if sentiment is not None else 0.0,
+            {sentiment: 1} if sentiment is not None else {}
+        )
+
+    def overall(self) -> Dict[str, Any]:
+        """Returns the totals over every service, shaped like the result of analyze_feedback."""
+        total_feedback = 0
+        total_rating = 0
+        feedback_type_counts: Dict[str, int] = {}
+        sentiment_counts = {"positive": 0, "neutral": 0, "negative": 0}
+
+        for totals in self.services.values():
+            total_feedback += totals["count"]
+            total_rating += totals["ratingSum"]
+            for feedback_type, count in totals["feedbackTypes"].items():
+                feedback_type_counts[feedback_type] = feedback_type_counts.get(feedback_type, 0) + count
+            for label, count in totals["sentiment"].items():
+                sentiment_counts[label] = sentiment_counts.get(label, 0) + count
+
+        return {
+            "average_rating": round(total_rating / total_feedback, 2) if total_feedback > 0 else 0.0,
+            "total_feedback": total_feedback,
+            "feedback_type_counts": feedback_type_counts,
+            "sentiment_counts": sentiment_counts
+        }
+
+    def service(self, service: str) -> Dict[str, Any]:
+        """Returns the totals of one service, shaped like the result of analyze_service_feedback."""
+        totals = self.services.get(service) or _empty_service()
+        count = totals["count"]
+        return {
+            "total_feedback": count,
+            "average_rating": round(totals["ratingSum"] / count, 2) if count > 0 else 0.0,
+            "average_sentiment": round(totals["sentimentSum"] / totals["sentimentCount"], 2)
+            if totals["sentimentCount"] > 0 else 0.0,
+            "sentiment_breakdown": dict(totals["sentiment"]),
+            "feedback_type_counts": dict(totals["feedbackTypes"])
+        }
+
+    def to_document(self) -> List[Dict[str, Any]]:
+        """Serializes the aggregates; a list, as service names may not be valid field names."""
+        return [
+            {**totals, "service": service, "feedbackTypes": list(totals["feedbackTypes"].items())}
+            for service, totals in self.services.items()
+        ]
+
+    @classmethod
+    def from_document(cls, entries: List[Dict[str, Any]]) -> "LiveStats":
+        services = {}
+        for entry in entries:
+            totals = {key: value for key, value in entry.items() if key != "service"}
+            totals["feedbackTypes"] = {feedback_type: count for feedback_type, count in entry["feedbackTypes"]}
+            services[entry["service"]] = totals
+        return cls(services)
+
+
+class StatsMaintainer:
+    """
+    Background task maintaining the live statistics of this worker.
+    The leader scores every new document once, updates the aggregates and persists them in a
+    snapshot together with its resume token (or polling high-water mark), so a restarted or
+    newly elected leader resumes where the last snapshot left off.
+    """
+
+    def __init__(self):
+        self.stats = LiveStats()
+        self.ready = False
+        self.leader = False
+        self.mode: Optional[str] = None
+        self.resume_token: Optional[Dict[str, Any]] = None
+        self.start_at = None
+        # (createdAt, _id) of the last document counted by a bootstrap or a poll
+        self.mark: Optional[Tuple[datetime, Any]] = None
+        # Cluster time at which the bootstrap aggregation had ended, in change stream mode
+        self.counted_until = None
+        self.applied = 0
+        self.snapshot_at: Optional[datetime] = None
+        self._owner = uuid.uuid4().hex
+        self._last_save = 0.0
+        # Called with the aggregates whenever they may have changed
+        self._listeners: List[Callable[[LiveStats], None]] = []
+
+    def on_change(self, listener: Callable[[LiveStats], None]):
+        """Registers a callback run on the event loop after every update or reload of the aggregates."""
+        self._listeners.append(listener)
+
+    def _notify(self):
+        for listener in self._listeners:
+            try:
+                listener(self.stats)
+            except Exception as e:
+                logger.error(f"Error in live statistics listener: {e}")
+
+    async def run(self, collection, state):
+        """Leads while this worker holds the lease, follows the snapshot otherwise. Runs until cancelled."""
+        while True:
+            try:
+                if await self._acquire_lease(state):
+                    await self._lead(collection, state)
+                else:
+                    self.leader = False
+                    await self._load_snapshot(state)
+                    await asyncio.sleep(STATS_REFRESH_SECONDS)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in stats maintainer: {e}")
+                self.leader = False
+                await asyncio.sleep(STATS_RETRY_SECONDS)
+
+    async def _acquire_lease(self, state) -> bool:
+        """Takes the lease unless another worker holds an unexpired one."""
+        now = datetime.utcnow()
+        try:
+            await state.find_one_and_update(
+                {"_id": STATS_STATE_ID,
+                 "$or": [{"leaseUntil": {"$exists": False}}, {"leaseUntil": {"$lt": now}},
+                         {"leaseOwner": self._owner}]},
+                {"$set": {"leaseUntil": now + timedelta(seconds=STATS_LEASE_SECONDS), "leaseOwner": self._owner}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    async def _load_snapshot(self, state) -> Optional[Dict[str, Any]]:
+        """Loads the persisted aggregates. Returns the snapshot, or None if there is none for this scorer."""
+        snapshot = await state.find_one({"_id": STATS_STATE_ID})
+        if not snapshot or snapshot.get("scorerVersion") != SCORER_VERSION or "services" not in snapshot:
+            # Being rebuilt: queries fall back to aggregations meanwhile
+            self.ready = False
+            return None
+
+        self.stats = LiveStats.from_document(snapshot["services"])
+        self.snapshot_at = snapshot.get("savedAt")
+        self.ready = True
+        self._notify()
+        return snapshot
+
+    async def _save(self, state, force: bool = False) -> bool:
+        """
+        Persists the aggregates with their resume position and renews the lease in one write.
+        Returns False if the lease was lost, in which case this worker stops leading.
+        """
+        if not force and time.monotonic() - self._last_save < STATS_SNAPSHOT_SECONDS:
+            return True
+
+        now = datetime.utcnow()
+        result = await state.update_one(
+            {"_id": STATS_STATE_ID, "leaseOwner": self._owner},
+            {"$set": {
+                "scorerVersion": SCORER_VERSION,
+                "mode": self.mode,
+                "services": self.stats.to_document(),
+                "resumeToken": self.resume_token,
+                "startAt": self.start_at,
+                "markCreatedAt": self.mark[0] if self.mark else None,
+                "markId": self.mark[1] if self.mark else None,
+                "countedUntil": self.counted_until,
+                "savedAt": now,
+                "leaseUntil": now + timedelta(seconds=STATS_LEASE_SECONDS)
+            }}
+        )
+        self._last_save = time.monotonic()
+        self.snapshot_at = now
+        return result.matched_count > 0
+
+    async def _renew_lease(self, state):
+        """Extends the lease in one atomic check-and-set; raises if another worker took it over."""
+        result = await state.update_one(
+            {"_id": STATS_STATE_ID, "leaseOwner": self._owner},
+            {"$set": {"leaseUntil": datetime.utcnow() + timedelta(seconds=STATS_LEASE_SECONDS)}}
+        )
+        if result.matched_count == 0:
+            raise RuntimeError("Live statistics lease lost during bootstrap")
+
+    async def _keep_lease(self, state):
+        while True:
+            await asyncio.sleep(STATS_LEASE_SECONDS / 3)
+            await self._renew_lease(state)
+
+    async def _holding_lease(self, state, work: Awaitable):
+        """
+        Runs work that can outlast the lease, e.g. the bootstrap of a large collection, renewing the
+        lease every third of STATS_LEASE_SECONDS meanwhile. Cancels the work if the lease is lost.
+        """
+        task = asyncio.ensure_future(work)
+        keeper = asyncio.ensure_future(self._keep_lease(state))
+        try:
+            await asyncio.wait({task, keeper}, return_when=asyncio.FIRST_COMPLETED)
+            if not task.done():
+                # The keeper only stops by raising: the lease was lost
+                keeper.result()
+            return task.result()
+        finally:
+            keeper.cancel()
+            task.cancel()
+
+    async def _detect_mode(self, collection) -> str:
+        """Change streams need a replica set or a sharded cluster; standalone servers are polled."""
+        try:
+            hello = await collection.database.command("hello")
+        except OperationFailure:
+            hello = await collection.database.command("isMaster")
+        if hello.get("setName") or hello.get("msg") == "isdbgrid":
+            return MODE_CHANGE_STREAM
+        return MODE_POLLING
+
+    async def _lead(self, collection, state):
+        mode = await self._detect_mode(collection)
+        snapshot = await self._load_snapshot(state)
+
+        if snapshot is not None and snapshot.get("mode") == mode:
+            self.mode = mode
+            self.resume_token = snapshot.get("resumeToken")
+            self.start_at = snapshot.get("startAt")
+            mark_created_at, mark_id = snapshot.get("markCreatedAt"), snapshot.get("markId")
+            self.mark = (mark_created_at, mark_id) if mark_created_at is not None else None
+            self.counted_until = snapshot.get("countedUntil")
+        else:
+            await self._holding_lease(state, self._bootstrap(collection, mode))
+
+        self.leader = True
+        if not await self._save(state, force=True):
+            return
+        logger.info(f"Leading live statistics ({self.mode})")
+
+        try:
+            if self.mode == MODE_CHANGE_STREAM:
+                await self._tail_change_stream(collection, state)
+            else:
+                await self._poll(collection, state)
+        except OperationFailure as e:
+            if e.code not in RESUME_ERROR_CODES:
+                raise
+            # The snapshot can no longer be resumed: drop it so the next lead bootstraps
+            logger.warning(f"Change stream cannot be resumed ({e}), rebuilding live statistics")
+            await state.update_one({"_id": STATS_STATE_ID}, {"$unset": {"services": ""}})
+        finally:
+            self.leader = False
+
+    async def _bootstrap(self, collection, mode: str):
+        """
+        Builds the aggregates with one aggregation. In change stream mode the stream position is
+        taken first, and the cluster time once the aggregation is over: documents the stream delivers
+        again are skipped if they were counted here, see _counted_by_bootstrap.
+        """
+        self.mode = mode
+        self.resume_token = None
+        self.start_at = None
+        self.counted_until = None
+
+        if mode == MODE_CHANGE_STREAM:
+            async with await collection.database.client.start_session() as session:
+                await collection.database.command("ping", session=session)
+                self.start_at = session.operation_time
+            match = {}
+        else:
+            match = {"createdAt": {"$lt": datetime.utcnow() - timedelta(seconds=STATS_POLL_LAG_SECONDS)}}
+
+        latest = await collection.find_one(match, {"_id": 1, "createdAt": 1},
+                                           sort=[("createdAt", DESCENDING), ("_id", DESCENDING)])
+        self.stats = LiveStats()
+        self.mark = None
+        if latest is None or latest.get("createdAt") is None:
+            self.ready = True
+            return
+
+        self.mark = (latest["createdAt"], latest["_id"])
+        match = {"$or": [
+            {"createdAt": {"$lt": latest["createdAt"]}},
+            {"createdAt": latest["createdAt"], "_id": {"$lte": latest["_id"]}}
+        ]}
+        await annotate_missing(collection, match)
+
+        pipeline = [
+            {"$match": match},
+            {
+                "$group": {
+                    "_id": {"service": "$service", "feedbackType": "$feedbackType"},
+                    "count": {"$sum": 1},
+                    "ratingSum": {"$sum": "$rating"},
+                    "sentimentSum": {"$sum": "$sentimentScore"},
+                    "positive": {"$sum": {"$cond": [{"$eq": ["$sentiment", "positive"]}, 1, 0]}},
+                    "neutral": {"$sum": {"$cond": [{"$eq": ["$sentiment", "neutral"]}, 1, 0]}},
+                    "negative": {"$sum": {"$cond": [{"$eq": ["$sentiment", "negative"]}, 1, 0]}}
+                }
+            }
+        ]
+        async for row in collection.aggregate(pipeline):
+            self.stats.add_group(row["_id"].get("service"), row["_id"].get("feedbackType"), row["count"],
+                                 row["ratingSum"], row["sentimentSum"],
+                                 {label: row[label] for label in ("positive", "neutral", "negative")})
+
+        if mode == MODE_CHANGE_STREAM:
+            async with await collection.database.client.start_session() as session:
+                await collection.database.command("ping", session=session)
+                self.counted_until = session.operation_time
+
+        self.ready = True
+        self._notify()
+        logger.info(f"Bootstrapped live statistics from {self.stats.overall()['total_feedback']} documents")
+
+    def _counted_by_bootstrap(self, change: Dict[str, Any]) -> bool:
+        """
+        Whether the bootstrap aggregation already counted an insert the change stream delivers: only one
+        at or before its (createdAt, _id) mark that committed before the aggregation was over. Inserts
+        committed later are new even if older than the mark, e.g. with a createdAt set by a slow writer.
+        """
+        doc = change["fullDocument"]
+        if self.mark is None or self.counted_until is None or doc.get("createdAt") is None:
+            return False
+        cluster_time = change.get("clusterTime")
+        if cluster_time is None or cluster_time > self.counted_until:
+            return False
+        return (doc["createdAt"], doc["_id"]) <= self.mark
+
+    async def _apply(self, collection, documents: List[Dict[str, Any]]):
+        """Scores the documents not annotated yet, persists their annotations and counts every document."""
+        stale = [doc for doc in documents if doc.get("scorerVersion") != SCORER_VERSION]
+        if stale:
+            for doc, annotation in zip(stale, await persist_annotations(collection, stale)):
+                doc.update(annotation)
+
+        for doc in documents:
+            self.stats.add(doc)
+        self.applied += len(documents)
+        if documents:
+            self._notify()
+
+    async def _tail_change_stream(self, collection, state):
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        options = {"resume_after": self.resume_token} if self.resume_token else {"start_at_operation_time": self.start_at}
+
+        async with collection.watch(pipeline, max_await_time_ms=int(STATS_POLL_INTERVAL * 1000), **options) as stream:
+            while True:
+                batch = []
+                while len(batch) < ANALYSIS_BATCH_SIZE:
+                    change = await stream.try_next()
+                    if change is None:
+                        break
+                    if not self._counted_by_bootstrap(change):
+                        batch.append(change["fullDocument"])
+
+                if batch:
+                    await self._apply(collection, batch)
+                if stream.resume_token is not None:
+                    self.resume_token = stream.resume_token
+                if not await self._save(state):
+                    return
+
+    async def _poll(self, collection, state):
+        while True:
+            query: Dict[str, Any] = {
+                "createdAt": {"$lt": datetime.utcnow() - timedelta(seconds=STATS_POLL_LAG_SECONDS)}
+            }
+            if self.mark is not None:
+                query = {"$or": [
+                    {"createdAt": {"$gt": self.mark[0], **query["createdAt"]}},
+                    {"createdAt": self.mark[0], "_id": {"$gt": self.mark[1]}}
+                ]}
+
+            cursor = collection.find(query, STATS_PROJECTION).sort(
+                [("createdAt", ASCENDING), ("_id", ASCENDING)]).limit(ANALYSIS_BATCH_SIZE)
+            documents = await cursor.to_list(length=ANALYSIS_BATCH_SIZE)
+
+            if documents:
+                await self._apply(collection, documents)
+                self.mark = (documents[-1]["createdAt"], documents[-1]["_id"])
+            if not await self._save(state, force=bool(documents)):
+                return
+            if len(documents) < ANALYSIS_BATCH_SIZE:
+                await asyncio.sleep(STATS_POLL_INTERVAL)
+
+    def status(self) -> Dict[str, Any]:
+        """Returns the state of the maintainer of this worker."""
+        return {
+            "ready": self.ready,
+            "leader": self.leader,
+            "mode": self.mode,
+            "applied_docs": self.applied,
+            "services": len(self.stats.services),
+            "snapshot_at": self.snapshot_at.isoformat() if self.snapshot_at else None
+        }
+
+
+# Maintainer of this worker process
+stats_maintainer = StatsMaintainer()
@@ -3,23 +3,55 @@ Main application file for the feedback analysis API.
 Contains FastAPI setup, middleware, and endpoint definitions with performance optimizations.
 """
 
+import time
+
+# Startup timings are measured from here, before the application modules are imported
+_import_started = time.perf_counter()
+
+import asyncio
 import logging
 import os
 import sys
-import time
 from datetime import datetime
+from typing import List, Literal, Optional
 
 import strawberry
-from fastapi import FastAPI, Request
+from fastapi import Body, FastAPI, Request
+from fastapi import Query as QueryParam
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from strawberry.asgi import GraphQL
-from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo import ASCENDING, DESCENDING
 from dotenv import load_dotenv
 import uvicorn
 
-from analysis import init_nlp_resources, precompute_sentiment_data
-from graphql_schema import Query
+import database
+import annotation_snapshot
+import metrics
+from cache import cache_stats
+from shared_cache import shared_cache
+from singleflight import single_flight
+from keyword_index import keyword_index
+from analysis import (
+    PRECOMPUTE_INTERVAL_SECONDS,
+    SCORER_VERSION,
+    init_nlp_resources,
+    nlp_status,
+    precompute_sentiment_data,
+    save_annotation_snapshot,
+    shutdown_scoring_pool,
+    sync_keyword_index,
+    wait_for_precompute
+)
+from database import COLLECTION_NAME, get_db, get_collection, get_rollup_collection, get_state_collection
+from batcher import MAX_SCORE_MESSAGES, scoring_batcher
+from export import FORMAT_NDJSON, MEDIA_TYPES, export_query, iter_export
+from live_stats import stats_maintainer
+from profiling import PROFILING_HEADER, Profile, authorized, request_profiler
+from response_cache import response_cache
+from rollups import ensure_rollup_indexes, sync_rollups
+from subscriptions import stats_broadcaster
+from graphql_schema import Mutation, Query, Subscription, new_annotation_loader
 
 # Load environment variables
 load_dotenv()
@@ -28,38 +60,82 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
-# MongoDB configuration
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/feedback")
-DB_NAME = os.getenv("DB_NAME", "feedback")
-COLLECTION_NAME = os.getenv("COLLECTION_NAME", "feedbacks")
+# Server configuration
 PORT = int(os.getenv("PORT", 8000))
 
+# Startup timings of this worker (seconds), reported by /ready
+startup_timings = {
+    "import_seconds": round(time.perf_counter() - _import_started, 3),
+    "startup_seconds": None,
+    "first_request_seconds": None,
+    "time_to_first_request_seconds": None
+}
+
+# Set once the startup hook has connected the worker
+_started = False
+
+# Background warmup started at startup, and its progress
+_warmup_task: Optional[asyncio.Task] = None
+_warmup = {
+    "stage": "pending",
+    "processed_docs": 0,
+    "total_docs": 0,
+    "started_at": None,
+    "finished_at": None,
+    "error": None
+}
+
+# Live statistics maintainer tailing the feedback collection
+_stats_task: Optional[asyncio.Task] = None
 
-# Get database connection
-def get_db():
-    client = MongoClient(MONGO_URI, maxPoolSize=50)
-    db = client[DB_NAME]
-    return db
+# Set once the annotation stage of the warmup is over, in this worker or the one it waited for
+_annotations_warm = asyncio.Event()
+
+# Background scoring of the feedbacks inserted after the warmup
+_annotate_task: Optional[asyncio.Task] = None
+
+# Periodic rewrite of the on-disk annotation snapshot
+_snapshot_task: Optional[asyncio.Task] = None
+
+# Periodic refresh of the worker gauges, in multiprocess metrics mode
+_metrics_task: Optional[asyncio.Task] = None
 
 
 # Ensure indexes exist for performance
-def ensure_indexes(db):
+async def ensure_indexes(db):
     collection = db[COLLECTION_NAME]
-    existing_indexes = collection.index_information()
+    existing_indexes = await collection.index_information()
 
     # Create indexes if they don't exist
     indexes_to_create = [
         ("service_1", [("service", ASCENDING)]),
         ("feedbackType_1", [("feedbackType", ASCENDING)]),
         ("rating_1", [("rating", ASCENDING)]),
-        ("createdAt_1", [("createdAt", DESCENDING)])
+        ("createdAt_1", [("createdAt", DESCENDING)]),
+        # Latest edit, part of the data version checked by the response cache
+        ("updatedAt_-1", [("updatedAt", DESCENDING)]),
+        ("scorerVersion_1", [("scorerVersion", ASCENDING)]),
+        # Keyset pagination: equality filters first, then the (createdAt, _id) sort,
+        # then rating so rating ranges are filtered inside the index
+        ("createdAt_-1__id_-1", [("createdAt", DESCENDING), ("_id", DESCENDING)]),
+        # Rating-only filters: one sorted run per rating value, merged by the server
+        ("rating_1_createdAt_-1__id_-1", [("rating", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)]),
+        ("service_1_createdAt_-1__id_-1_rating_1",
+         [("service", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING), ("rating", ASCENDING)]),
+        ("feedbackType_1_createdAt_-1__id_-1_rating_1",
+         [("feedbackType", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING), ("rating", ASCENDING)]),
+        ("service_1_feedbackType_1_createdAt_-1__id_-1_rating_1",
+         [("service", ASCENDING), ("feedbackType", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING),
+          ("rating", ASCENDING)])
     ]
 
     for index_name, index_spec in indexes_to_create:
         if index_name not in existing_indexes:
             field_name = index_spec[0][0]
-            collection.create_index(index_spec)
-            logger.info(f"Created index on {field_name} field")
+            await collection.create_index(index_spec)
+            logger.info(f"Created index {index_name} on {field_name} field")
+
+    await ensure_rollup_indexes(get_rollup_collection())
 
 
 def generate_schema_file():
@@ -70,7 +146,7 @@ def generate_schema_file():
     try:
         # Create Strawberry schema
         logger.debug("Creating Strawberry schema")
-        schema = strawberry.Schema(query=Query)
+        schema = strawberry.Schema(query=Query, mutation=Mutation, subscription=Subscription)
 
         # Get the schema as a string
         logger.debug("Converting schema to string")
@@ -118,6 +194,13 @@ async def add_process_time_header(request: Request, call_next):
     # Add processing time to response headers
     response.headers["X-Process-Time"] = f"{process_time:.4f}"
 
+    # Probes and scrapes are not counted as the first request
+    if startup_timings["first_request_seconds"] is None and request.url.path not in ("/health", "/ready", "/metrics"):
+        startup_timings["first_request_seconds"] = round(process_time, 4)
+        startup_timings["time_to_first_request_seconds"] = round(time.perf_counter() - _import_started, 3)
+        logger.info(f"First request served in {process_time:.4f}s, "
+                    f"{startup_timings['time_to_first_request_seconds']:.2f}s after import")
+
     # Log slow requests (over 500ms)
     if process_time > 0.5:
         logger.warning(f"Slow request: {request.url.path} - {process_time:.4f}s")
@@ -125,12 +208,88 @@ async def add_process_time_header(request: Request, call_next):
     return response
 
 
-# Create GraphQL schema
-schema = strawberry.Schema(query=Query)
+async def finish_profile(profile: Profile, status_code: int) -> Optional[str]:
+    """
+    Stops profiling a request and keeps its profile, unless it is a fast sampled one.
+    Returns the id of the profile kept, or None.
+    """
+    metadata = request_profiler.stop(profile, status_code)
+    if metadata is None:
+        return None
+    return await asyncio.to_thread(request_profiler.save, profile, metadata)
+
+
+async def profiled_body(body, profile: Profile, status_code: int):
+    """Sends the body of a profiled response, then stops the profile once it is sent or the client is gone."""
+    try:
+        async for chunk in body:
+            yield chunk
+    except Exception:
+        status_code = 500
+        raise
+    finally:
+        await body.aclose()
+        await finish_profile(profile, status_code)
+
+
+async def buffered_body(chunks: List[bytes]):
+    for chunk in chunks:
+        yield chunk
+
+
+# Middleware profiling the requests that carry the admin profiling header, or are sampled
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    profile = request_profiler.start(request.method, request.url.path, request.headers.get(PROFILING_HEADER))
+    if profile is None:
+        return await call_next(request)
+
+    try:
+        response = await call_next(request)
+    except Exception:
+        await finish_profile(profile, 500)
+        raise
+
+    # Streaming responses such as exports do their work while the body is sent, so the profile
+    # stops with the body. Requests profiled on demand get the id of their profile, which only
+    # exists once saved: their body is read whole before the response starts
+    if profile.trigger == "header":
+        try:
+            chunks = [chunk async for chunk in response.body_iterator]
+        except Exception:
+            await finish_profile(profile, 500)
+            raise
+        profile_id = await finish_profile(profile, response.status_code)
+        if profile_id is not None:
+            response.headers["X-Profile-Id"] = profile_id
+        response.body_iterator = buffered_body(chunks)
+        return response
+
+    response.body_iterator = profiled_body(response.body_iterator, profile, response.status_code)
+    return response
+
+
+class AnalysisGraphQL(GraphQL):
+    """GraphQL ASGI app adding per-request DataLoaders to the context and timing response encoding."""
+
+    async def get_context(self, request, response):
+        return {"request": request, "response": response, "annotation_loader": new_annotation_loader()}
+
+    def encode_json(self, response_data) -> str:
+        start = time.perf_counter()
+        encoded = super().encode_json(response_data)
+        metrics.observe_serialization(time.perf_counter() - start)
+        return encoded
+
 
-# Add GraphQL endpoint
-graphql_app = GraphQL(schema)
+# Create GraphQL schema, with the extension collecting the Prometheus metrics
+schema = strawberry.Schema(query=Query, mutation=Mutation, subscription=Subscription,
+                           extensions=[metrics.MetricsExtension])
+
+# Add GraphQL endpoint; subscriptions are served over WebSocket on the same path
+graphql_app = AnalysisGraphQL(schema)
 app.add_route("/graphql", graphql_app)
+app.add_websocket_route("/graphql", graphql_app)
 
 
 # Health check endpoint
@@ -140,9 +299,9 @@ async def health_check():
     Health check endpoint that verifies database connectivity.
     """
     try:
-        # Verify database connection
+        # Verify database connection on the shared client
         db = get_db()
-        db.command("ping")
+        await db.command("ping")
 
         return {
             "status": "healthy",
@@ -161,21 +320,294 @@ async def health_check():
         )
 
 
+# Readiness endpoint
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness endpoint, separate from the /health liveness check.
+    The worker is ready once startup has connected it and its NLP resources are loaded;
+    the background warmup does not gate readiness, its progress is reported instead.
+    """
+    ready = _started and nlp_status()["loaded"]
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "starting",
+            "timestamp": datetime.now().isoformat(),
+            "nlp": nlp_status(),
+            "warmup": _warmup,
+            "timings": startup_timings
+        }
+    )
+
+
+# Prometheus metrics endpoint
+@app.get("/metrics")
+async def prometheus_metrics():
+    """
+    Prometheus metrics in the text exposition format: operation, resolver and stage latencies,
+    documents scanned, cache hit ratios and worker memory. Reports every worker of the host
+    when PROMETHEUS_MULTIPROC_DIR is set, otherwise the worker serving the scrape.
+    """
+    return Response(content=metrics.render_metrics(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+
+# Batch scoring for the services that ingest feedback
+@app.post("/score")
+async def score_feedback(messages: List[str] = Body(..., embed=True)):
+    """
+    REST counterpart of the scoreFeedback mutation: takes {"messages": [...]} and returns the
+    sentiment, sentiment score and keywords of each message, in order. Nothing is stored.
+    """
+    if len(messages) > MAX_SCORE_MESSAGES:
+        return JSONResponse(
+            status_code=400,
+            content={"error": f"At most {MAX_SCORE_MESSAGES} messages can be scored per request"}
+        )
+
+    annotations = await scoring_batcher.score(messages)
+    return {
+        "scores": [
+            {
+                "sentiment": annotation["sentiment"],
+                "sentimentScore": annotation["sentimentScore"],
+                "keywords": annotation["keywords"]
+            }
+            for annotation in annotations
+        ]
+    }
+
+
+# Streaming export of annotated feedbacks
+@app.get("/export/feedbacks")
+async def export_feedbacks(service: Optional[str] = None, feedback_type: Optional[str] = None,
+                           from_: Optional[datetime] = QueryParam(None, alias="from"),
+                           to: Optional[datetime] = None,
+                           format: Literal["ndjson", "csv"] = FORMAT_NDJSON):
+    """
+    Streams the annotated feedbacks matching the filters, newest first, as NDJSON (one object per line)
+    or CSV with a header row. from/to bound createdAt (from inclusive, to exclusive).
+    Rows are read, scored and sent one batch at a time, so any number of rows takes one request.
+    """
+    query = export_query(service, feedback_type, from_, to)
+    return StreamingResponse(
+        iter_export(get_collection(), query, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="feedbacks.{format}"'}
+    )
+
+
 # Endpoint to manually trigger precomputation of sentiment data
 @app.post("/admin/precompute-sentiment")
-async def admin_precompute_sentiment():
+async def admin_precompute_sentiment(rescore: bool = False, workers: Optional[int] = None,
+                                     chunk_size: Optional[int] = None):
     """
     Admin endpoint to manually trigger sentiment and keyword precomputation.
-    Useful for warming up caches after application restart or data updates.
+    Persists annotations for documents that are missing them or were scored by an older scorer.
+    With rescore=true every document is scored again by the process pool.
+    Rejected with 409 while a run (e.g. the startup warmup) is in progress in any worker.
     """
-    db = get_db()
-    collection = db[COLLECTION_NAME]
+    collection = get_collection()
     start_time = time.time()
-    result = precompute_sentiment_data(collection)
+    result = await precompute_sentiment_data(collection, get_state_collection(), batch_size=chunk_size,
+                                             workers=workers, rescore=rescore)
     elapsed_time = time.time() - start_time
 
     result["time_taken"] = f"{elapsed_time:.2f} seconds"
-    return JSONResponse(content=result)
+    return JSONResponse(status_code=409 if result["status"] == "busy" else 200, content=result)
+
+
+# Endpoint to rebuild the time-bucketed rollups
+@app.post("/admin/rebuild-rollups")
+async def admin_rebuild_rollups():
+    """
+    Admin endpoint dropping the rollup buckets and rolling up every feedback again.
+    Returns at once without rebuilding if another worker is syncing the rollups.
+    """
+    start_time = time.time()
+    rolled_up = await sync_rollups(get_collection(), get_rollup_collection(), rebuild=True)
+    elapsed_time = time.time() - start_time
+
+    return {"rolled_up_docs": rolled_up, "time_taken": f"{elapsed_time:.2f} seconds"}
+
+
+# Endpoint exposing cache counters for monitoring
+@app.get("/admin/cache-stats")
+async def admin_cache_stats():
+    """
+    Admin endpoint returning size, hit, miss and eviction counters of the caches of this worker.
+    """
+    return {
+        "pid": os.getpid(),
+        "caches": cache_stats() + [annotation_snapshot.snapshot_stats(), shared_cache.stats()],
+        "keyword_index": keyword_index.stats(),
+        "response_cache": response_cache.stats(),
+        "scoring_batcher": scoring_batcher.stats(),
+        "single_flight": single_flight.stats(),
+        "live_stats": stats_maintainer.status(),
+        "subscriptions": stats_broadcaster.stats()
+    }
+
+
+# Endpoints listing and downloading the request profiles
+@app.get("/admin/profiles")
+async def admin_profiles(request: Request, limit: int = QueryParam(100, ge=1, le=1000)):
+    """
+    Admin endpoint listing the request profiles kept by the workers of this host, newest first,
+    with the profiler configuration and counters of this worker. Requires the admin profiling header.
+    """
+    if not authorized(request.headers.get(PROFILING_HEADER)):
+        return JSONResponse(status_code=403, content={"error": f"Missing or invalid {PROFILING_HEADER}"})
+
+    profiles = await asyncio.to_thread(request_profiler.list_profiles)
+    return {"pid": os.getpid(), "profiler": request_profiler.stats(), "profiles": profiles[:limit]}
+
+
+@app.get("/admin/profiles/{profile_id}")
+async def admin_profile(request: Request, profile_id: str, format: Literal["raw", "text"] = "raw"):
+    """
+    Admin endpoint downloading a request profile: collapsed stacks (sampler) or a pstats dump (cProfile).
+    With format=text, cProfile dumps are summarized by cumulative time. Requires the admin profiling header.
+    """
+    if not authorized(request.headers.get(PROFILING_HEADER)):
+        return JSONResponse(status_code=403, content={"error": f"Missing or invalid {PROFILING_HEADER}"})
+
+    path = request_profiler.profile_path(profile_id)
+    if path is None:
+        return JSONResponse(status_code=404, content={"error": f"No profile {profile_id}"})
+
+    if format == "text":
+        return PlainTextResponse(await asyncio.to_thread(request_profiler.profile_text, path))
+    return FileResponse(path, filename=os.path.basename(path))
+
+
+# Endpoints to follow and cancel the background warmup
+@app.get("/admin/warmup")
+async def admin_warmup():
+    """Admin endpoint returning the stage and progress of the background warmup of this worker."""
+    return {"pid": os.getpid(), **_warmup}
+
+
+@app.post("/admin/warmup/cancel")
+async def admin_cancel_warmup():
+    """
+    Admin endpoint cancelling the background warmup of this worker.
+    Work left undone is picked up lazily by queries.
+    """
+    if _warmup_task is None or _warmup_task.done():
+        return {"pid": os.getpid(), "cancelled": False, "stage": _warmup["stage"]}
+
+    _warmup_task.cancel()
+    return {"pid": os.getpid(), "cancelled": True, "stage": _warmup["stage"]}
+
+
+def _warmup_progress(processed: int, total: int):
+    _warmup["processed_docs"] = processed
+    _warmup["total_docs"] = total
+
+
+async def warm_up(db):
+    """
+    Warms this worker up in the background, stage by stage: NLP resources, indexes, annotations
+    not yet scored by the current scorer version, keyword index and rollups.
+    One worker at a time runs the batch scoring; the others wait for its run to finish, then
+    read its annotations from MongoDB and its scores from Redis instead of scoring them again.
+    """
+    collection = db[COLLECTION_NAME]
+    _warmup["started_at"] = datetime.now().isoformat()
+
+    try:
+        # Loading may download corpora: keep it off the event loop
+        _warmup["stage"] = "nlp"
+        await asyncio.to_thread(init_nlp_resources)
+
+        _warmup["stage"] = "indexes"
+        await ensure_indexes(db)
+
+        _warmup["stage"] = "annotations"
+        if await shared_cache.claim_warmup(SCORER_VERSION):
+            try:
+                result = await precompute_sentiment_data(collection, get_state_collection(),
+                                                         progress=_warmup_progress)
+                if result["status"] == "busy":
+                    # Another worker is scoring the same documents: wait for its run instead
+                    logger.info("Waiting for the batch scoring run of another worker")
+                    await wait_for_precompute(get_state_collection())
+                elif result["status"] == "success":
+                    await shared_cache.mark_warm(SCORER_VERSION)
+                else:
+                    _warmup["error"] = result.get("error")
+            finally:
+                # Workers waiting for a warmup that did not complete stop waiting at once
+                await shared_cache.release_warmup(SCORER_VERSION)
+        else:
+            logger.info("Waiting for the annotation warmup of another worker")
+            if not await shared_cache.wait_warm(SCORER_VERSION):
+                logger.warning("Annotation warmup of another worker did not complete, scoring what is missing")
+        _annotations_warm.set()
+
+        # The keyword index is per worker; rollups are shared and synced by whichever worker holds the lease
+        _warmup["stage"] = "keyword_index"
+        await sync_keyword_index(collection)
+
+        _warmup["stage"] = "rollups"
+        await sync_rollups(collection, get_rollup_collection())
+
+        _warmup["stage"] = "done"
+    except asyncio.CancelledError:
+        logger.info(f"Warmup cancelled during stage {_warmup['stage']}")
+        _warmup["stage"] = "cancelled"
+        raise
+    except Exception as e:
+        logger.error(f"Warmup failed during stage {_warmup['stage']}: {e}")
+        _warmup["error"] = str(e)
+        _warmup["stage"] = "failed"
+    finally:
+        _annotations_warm.set()
+        _warmup["finished_at"] = datetime.now().isoformat()
+
+
+async def maintain_live_stats(collection):
+    """Runs the live statistics maintainer once the annotations are warm, so its bootstrap scores nothing."""
+    await _annotations_warm.wait()
+    await stats_maintainer.run(collection, get_state_collection())
+
+
+async def maintain_annotations(collection):
+    """
+    Scores the feedbacks inserted since the warmup every PRECOMPUTE_INTERVAL_SECONDS, so queries read
+    persisted annotations and never score. Each round is a batch scoring run: one worker at a time does it.
+    """
+    await _annotations_warm.wait()
+    while True:
+        await asyncio.sleep(PRECOMPUTE_INTERVAL_SECONDS)
+        result = await precompute_sentiment_data(collection, get_state_collection())
+        if result["status"] == "error":
+            logger.error(f"Background scoring failed: {result['error']}")
+
+
+async def maintain_annotation_snapshot():
+    """
+    Merges the scoring caches of this worker into the on-disk annotation snapshot every
+    ANNOTATION_SNAPSHOT_INTERVAL seconds, and maps the snapshot again when another worker rewrote it.
+    """
+    while True:
+        await asyncio.sleep(annotation_snapshot.next_save_delay())
+        try:
+            await asyncio.to_thread(save_annotation_snapshot)
+            await asyncio.to_thread(annotation_snapshot.refresh_snapshot, SCORER_VERSION)
+        except Exception as e:
+            logger.error(f"Failed to write annotation snapshot: {e}")
+
+
+async def maintain_worker_metrics():
+    """Keeps the memory and cache gauges of this worker fresh for scrapes served by other workers."""
+    while True:
+        await asyncio.sleep(metrics.METRICS_REFRESH_SECONDS)
+        try:
+            metrics.refresh_worker_gauges()
+        except Exception as e:
+            logger.error(f"Failed to refresh worker metrics: {e}")
 
 
 # Application startup event handler
@@ -183,39 +615,81 @@ async def admin_precompute_sentiment():
 async def startup_event():
     """
     Runs when the application starts.
-    Initializes resources, ensures indexes, and warms up caches.
+    Connects the worker and returns at once: NLP resources, indexes and annotations are
+    warmed up in the background, so startup time does not grow with the collection.
     """
+    global _warmup_task, _stats_task, _annotate_task, _snapshot_task, _metrics_task, _started
+
     logger.info("Starting application initialization")
+    start_time = time.perf_counter()
 
     try:
-        # Initialize NLP resources (this is just a safety check, as they should be initialized on import)
-        init_nlp_resources()
+        # Map the annotation snapshot: O(1), cached analyses are served from the first request
+        if annotation_snapshot.ANNOTATION_SNAPSHOT_PATH:
+            annotation_snapshot.load_snapshot(SCORER_VERSION)
+            _snapshot_task = asyncio.create_task(maintain_annotation_snapshot())
 
-        # Connect to MongoDB and ensure indexes
+        if metrics.PROMETHEUS_MULTIPROC_DIR:
+            _metrics_task = asyncio.create_task(maintain_worker_metrics())
+
+        # Open the shared MongoDB client for this worker
+        database.connect()
+        shared_cache.connect()
         db = get_db()
 
         # Test MongoDB connection
-        db.command("ping")
+        await db.command("ping")
         logger.info("Successfully connected to MongoDB")
 
-        # Ensure indexes exist
-        ensure_indexes(db)
+        # Warm up in the background so the worker serves traffic meanwhile
+        collection = db[COLLECTION_NAME]
+        _warmup_task = asyncio.create_task(warm_up(db))
 
-        # Generate GraphQL schema file
-        generate_schema_file()
+        # Keep running aggregates up to date as feedback is inserted
+        _stats_task = asyncio.create_task(maintain_live_stats(collection))
 
-        # Precompute sentiment data in background to warm up caches
-        collection = db[COLLECTION_NAME]
-        precompute_sentiment_data(collection)
+        # Score new feedback in the background, off the request path
+        _annotate_task = asyncio.create_task(maintain_annotations(collection))
 
-        logger.info("Application initialization completed successfully")
+        _started = True
+        startup_timings["startup_seconds"] = round(time.perf_counter() - start_time, 3)
+        logger.info(f"Application initialization completed in {startup_timings['startup_seconds']:.3f}s "
+                    f"(imports took {startup_timings['import_seconds']:.3f}s)")
     except Exception as e:
         logger.error(f"Failed to initialize application: {e}", exc_info=True)
         # We don't re-raise the exception to allow the application to start anyway
         # but admins should monitor logs for this error
 
 
+# Application shutdown event handler
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    Runs when the application stops.
+    Stops background scoring and closes the shared MongoDB client of this worker.
+    """
+    for task in (_warmup_task, _stats_task, _annotate_task, _snapshot_task, _metrics_task):
+        if task is not None and not task.done():
+            task.cancel()
+    shutdown_scoring_pool()
+
+    # Persist what this worker scored so the next start is warm
+    if annotation_snapshot.ANNOTATION_SNAPSHOT_PATH:
+        try:
+            await asyncio.to_thread(save_annotation_snapshot)
+        except Exception as e:
+            logger.error(f"Failed to write annotation snapshot: {e}")
+
+    await shared_cache.close()
+    database.close()
+    metrics.worker_exited()
+
+
 if __name__ == "__main__":
+    # Regenerated once per launch rather than by every worker at startup
+    generate_schema_file()
+    metrics.reset_multiprocess_dir()
+
     logger.info(f"Starting Uvicorn server on port {PORT}")
     uvicorn.run(
         "main:app",
@@ -0,0 +1,243 @@
+"""
+Metrics module for the feedback analysis API.
+Prometheus metrics collected by a Strawberry extension: latency of every GraphQL operation and
+resolver, the time of each operation broken down by stage (MongoDB round-trips, NLP scoring,
+serialization), documents scanned per operation, cache hit ratios and worker memory.
+"""
+
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from inspect import isawaitable
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+from graphql import FieldNode, get_operation_ast
+from strawberry.extensions import SchemaExtension
+from strawberry.extensions.tracing.utils import should_skip_tracing
+
+import annotation_snapshot
+from cache import cache_stats
+from shared_cache import shared_cache
+
+# Load environment variables
+load_dotenv()
+
+# Imported once the environment is loaded: prometheus_client picks multiprocess mode on import
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Directory where the workers of a host write their metrics so that /metrics reports all of them
+# (prometheus_client multiprocess mode). Unless set, /metrics reports the worker that serves it.
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR", "")
+
+# Seconds between two refreshes of the worker gauges (memory, caches) in multiprocess mode
+METRICS_REFRESH_SECONDS = float(os.getenv("METRICS_REFRESH_SECONDS", 15))
+
+# Latency buckets (seconds), from cached reads to full collection scans
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Documents scanned by one operation
+DOCUMENT_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# Stages of an operation
+STAGE_MONGO = "mongo"
+STAGE_NLP = "nlp"
+STAGE_SERIALIZATION = "serialization"
+
+operation_seconds = Histogram(
+    "graphql_operation_duration_seconds", "Duration of GraphQL operations, by root fields",
+    ["operation"], buckets=LATENCY_BUCKETS
+)
+operation_errors = Counter(
+    "graphql_operation_errors", "GraphQL operations that returned errors, by root fields", ["operation"]
+)
+resolver_seconds = Histogram(
+    "graphql_resolver_duration_seconds", "Duration of GraphQL resolvers, default resolvers excluded",
+    ["field"], buckets=LATENCY_BUCKETS
+)
+stage_seconds = Histogram(
+    "graphql_stage_duration_seconds", "Time spent by a GraphQL operation in each stage",
+    ["operation", "stage"], buckets=LATENCY_BUCKETS
+)
+documents_scanned = Histogram(
+    "graphql_documents_scanned", "MongoDB documents read or aggregated for a GraphQL operation",
+    ["operation"], buckets=DOCUMENT_BUCKETS
+)
+
+# Worker gauges, one series per worker in multiprocess mode
+worker_rss = Gauge("analysis_worker_rss_bytes", "Resident memory of the worker", multiprocess_mode="liveall")
+cache_hits = Gauge("analysis_cache_hits", "Lookups served by a cache tier", ["cache"], multiprocess_mode="liveall")
+cache_misses = Gauge("analysis_cache_misses", "Lookups missed by a cache tier", ["cache"], multiprocess_mode="liveall")
+cache_hit_ratio = Gauge("analysis_cache_hit_ratio", "Hit ratio of a cache tier", ["cache"], multiprocess_mode="liveall")
+response_lookups = Counter(
+    "analysis_response_cache_lookups", "Response cache lookups, by outcome (fresh, stale or miss)", ["result"]
+)
+single_flight_requests = Counter(
+    "analysis_single_flight_requests",
+    "Analytics computations requested, by outcome (computed, coalesced in the worker or across workers)", ["result"]
+)
+
+
+class OperationMetrics:
+    """Stage times and documents scanned of the GraphQL operation being executed."""
+
+    __slots__ = ("operation", "stages", "documents")
+
+    def __init__(self):
+        self.operation = "unknown"
+        self.stages: Dict[str, float] = {}
+        self.documents = 0
+
+
+# Metrics of the operation of the current request; None outside of GraphQL operations
+_current: ContextVar[Optional[OperationMetrics]] = ContextVar("operation_metrics", default=None)
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Adds the time spent in the block to a stage of the current operation; a no-op outside of one.
+    Resolvers run concurrently, so the stages of an operation may add up to more than its duration.
+    """
+    current = _current.get()
+    if current is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        current.stages[name] = current.stages.get(name, 0.0) + time.perf_counter() - start
+
+
+def add_scanned(count: int):
+    """Counts documents read or aggregated by MongoDB for the current operation."""
+    current = _current.get()
+    if current is not None:
+        current.documents += count
+
+
+def observe_serialization(seconds: float):
+    """Records the encoding of a response, which happens once its operation has finished."""
+    current = _current.get()
+    stage_seconds.labels(current.operation if current is not None else "unknown", STAGE_SERIALIZATION).observe(seconds)
+
+
+def operation_label(execution_context) -> str:
+    """
+    Labels an operation by its root fields, e.g. "feedbackAnalysis" or "feedbacks,serviceAnalysis".
+    Operation names are chosen by clients, so they would make the label set unbounded.
+    """
+    document = execution_context.graphql_document
+    operation = get_operation_ast(document, execution_context.operation_name) if document else None
+    if operation is None:
+        return "unknown"
+
+    fields = sorted({
+        selection.name.value for selection in operation.selection_set.selections
+        if isinstance(selection, FieldNode) and selection.name.value != "__typename"
+    })
+    return ",".join(fields) or "unknown"
+
+
+class MetricsExtension(SchemaExtension):
+    """
+    Strawberry extension recording the metrics of every operation. Only resolvers with code
+    of their own are timed: default attribute resolvers are passed through untouched.
+    """
+
+    def on_operation(self):
+        metrics = OperationMetrics()
+        _current.set(metrics)
+        start = time.perf_counter()
+
+        yield
+
+        operation_seconds.labels(metrics.operation).observe(time.perf_counter() - start)
+        for name, seconds in metrics.stages.items():
+            stage_seconds.labels(metrics.operation, name).observe(seconds)
+        documents_scanned.labels(metrics.operation).observe(metrics.documents)
+        if self.execution_context.errors or (self.execution_context.result and self.execution_context.result.errors):
+            operation_errors.labels(metrics.operation).inc()
+
+    def on_execute(self):
+        current = _current.get()
+        if current is not None:
+            current.operation = operation_label(self.execution_context)
+        yield
+
+    def resolve(self, _next, root, info, *args, **kwargs) -> Any:
+        if should_skip_tracing(_next, info):
+            return _next(root, info, *args, **kwargs)
+
+        field = f"{info.parent_type.name}.{info.field_name}"
+        start = time.perf_counter()
+        result = _next(root, info, *args, **kwargs)
+        if isawaitable(result):
+            return self._observe_async(result, field, start)
+
+        resolver_seconds.labels(field).observe(time.perf_counter() - start)
+        return result
+
+    @staticmethod
+    async def _observe_async(result, field: str, start: float) -> Any:
+        try:
+            return await result
+        finally:
+            resolver_seconds.labels(field).observe(time.perf_counter() - start)
+
+
+def worker_rss_bytes() -> int:
+    """Resident memory of this process: current from /proc on Linux, peak from getrusage elsewhere."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS, in kilobytes elsewhere
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def refresh_worker_gauges():
+    """Copies the memory and cache counters of this worker into its gauges."""
+    worker_rss.set(worker_rss_bytes())
+    for stats in cache_stats() + [annotation_snapshot.snapshot_stats(), shared_cache.stats()]:
+        cache_hits.labels(stats["name"]).set(stats["hits"])
+        cache_misses.labels(stats["name"]).set(stats["misses"])
+        cache_hit_ratio.labels(stats["name"]).set(stats["hit_ratio"])
+
+
+def render_metrics() -> bytes:
+    """Returns the metrics in the Prometheus text format, of every worker in multiprocess mode."""
+    refresh_worker_gauges()
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def reset_multiprocess_dir():
+    """Removes the metric files of a previous run; call it once, before the workers start."""
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+    for name in os.listdir(PROMETHEUS_MULTIPROC_DIR):
+        if name.endswith(".db"):
+            os.remove(os.path.join(PROMETHEUS_MULTIPROC_DIR, name))
+
+
+def worker_exited():
+    """Drops the gauges of this worker from the multiprocess metrics."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,293 @@
+"""
+Profiling module for the feedback analysis API.
+Profiles requests on demand: a request carrying the admin profiling header, or a sampled share of
+the requests, is profiled with a statistical stack sampler or cProfile. Profiles are written to a
+directory kept as a ring buffer of the latest ones, shared by the workers of a host.
+"""
+
+import cProfile
+import hmac
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Profiler: "sampler" (stacks of the event loop and worker threads) or "cprofile" (every call of the event loop)
+PROFILING_MODE = os.getenv("PROFILING_MODE", "sampler")
+MODE_SAMPLER = "sampler"
+MODE_CPROFILE = "cprofile"
+
+# Token the admin profiling header must carry; left unset, the header is ignored
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILING_HEADER = "X-Profile-Token"
+
+# Share of the requests profiled without the header, between 0 and 1
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0))
+
+# Sampled requests faster than this (seconds) are not kept; requests profiled on demand always are
+PROFILING_MIN_SECONDS = float(os.getenv("PROFILING_MIN_SECONDS", 0.5))
+
+# Directory of the profiles, and how many of them are kept (the oldest are removed first)
+PROFILING_DIR = os.getenv("PROFILING_DIR", os.path.join(tempfile.gettempdir(), "analysis-profiles"))
+PROFILING_MAX_PROFILES = int(os.getenv("PROFILING_MAX_PROFILES", 100))
+
+# Milliseconds between two stack samples
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", 5))
+
+# Probes, scrapes and the profiles themselves are never profiled
+UNPROFILED_PATHS = ("/health", "/ready", "/metrics")
+UNPROFILED_PREFIX = "/admin/profiles"
+
+# Profile files by mode: collapsed stacks (flame graph tools, speedscope) or pstats dumps (pstats, snakeviz)
+PROFILE_EXTENSIONS = {MODE_SAMPLER: ".folded", MODE_CPROFILE: ".prof"}
+
+# Profile ids: creation time in nanoseconds and worker pid, so names sort by age
+PROFILE_ID = re.compile(r"^\d{20}-\d+$")
+
+
+def authorized(token: Optional[str]) -> bool:
+    """Whether a request carries the admin profiling token; never when no token is configured."""
+    return bool(token and PROFILING_TOKEN and hmac.compare_digest(token, PROFILING_TOKEN))
+
+
+def frame_name(frame) -> str:
+    code = frame.f_code
+    # co_qualname is new in Python 3.11
+    return f"{frame.f_globals.get('__name__', '?')}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class StackSampler:
+    """
+    Statistical profiler with the interface of cProfile.Profile: a background thread records the
+    stacks of the thread that enabled it (the event loop) and of the default executor threads, where
+    asyncio.to_thread runs the NLP scoring. Work of concurrent requests is recorded too.
+    """
+
+    def __init__(self, interval_seconds: float = PROFILING_INTERVAL_MS / 1000):
+        self.interval_seconds = interval_seconds
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._loop_thread: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def enable(self):
+        self._loop_thread = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="profiling-sampler", daemon=True)
+        self._thread.start()
+
+    def disable(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            threads = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = threads.get(ident, "")
+                if ident != self._loop_thread and not name.startswith("asyncio_"):
+                    continue
+                # Executor threads waiting for work are idle
+                if ident != self._loop_thread and frame.f_code.co_name == "_worker":
+                    continue
+
+                stack = []
+                while frame is not None:
+                    stack.append(frame_name(frame))
+                    frame = frame.f_back
+                stack.append("event-loop" if ident == self._loop_thread else name)
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def dump_stats(self, path: str):
+        """Writes the samples in collapsed stack format: one stack per line with its sample count."""
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class Profile:
+    """A request being profiled, with the id its profile is kept under."""
+
+    def __init__(self, mode: str, trigger: str, method: str, path: str):
+        self.id = f"{time.time_ns():020d}-{os.getpid()}"
+        self.mode = mode
+        self.trigger = trigger
+        self.method = method
+        self.path = path
+        self.created_at = datetime.now(timezone.utc)
+        self.profiler = StackSampler() if mode == MODE_SAMPLER else cProfile.Profile()
+        self.profiler.enable()
+        self._started = time.perf_counter()
+
+    def stop(self) -> float:
+        """Stops profiling and returns the seconds profiled."""
+        self.profiler.disable()
+        return time.perf_counter() - self._started
+
+
+class RequestProfiler:
+    """
+    Decides which requests are profiled, one at a time per worker (profilers of concurrent
+    requests would record each other), and keeps their profiles in a directory ring buffer.
+    """
+
+    def __init__(self, mode: str = PROFILING_MODE, directory: str = PROFILING_DIR,
+                 max_profiles: int = PROFILING_MAX_PROFILES):
+        self.mode = mode if mode in PROFILE_EXTENSIONS else MODE_SAMPLER
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self._active: Optional[Profile] = None
+        self.profiled = 0
+        self.kept = 0
+        self.busy = 0
+        self.write_errors = 0
+
+    def start(self, method: str, path: str, token: Optional[str] = None) -> Optional[Profile]:
+        """Starts profiling a request if it asks for it with the admin token or is sampled; None otherwise."""
+        if path in UNPROFILED_PATHS or path.startswith(UNPROFILED_PREFIX):
+            return None
+
+        if authorized(token):
+            trigger = "header"
+        elif PROFILING_SAMPLE_RATE > 0 and random.random() < PROFILING_SAMPLE_RATE:
+            trigger = "sample"
+        else:
+            return None
+
+        if self._active is not None:
+            self.busy += 1
+            return None
+
+        self.profiled += 1
+        self._active = Profile(self.mode, trigger, method, path)
+        return self._active
+
+    def stop(self, profile: Profile, status_code: int) -> Optional[Dict[str, Any]]:
+        """
+        Stops profiling a request. Returns the metadata of the profile to keep, without its id,
+        or None for a sampled request faster than PROFILING_MIN_SECONDS.
+        """
+        seconds = profile.stop()
+        self._active = None
+        if profile.trigger == "sample" and seconds < PROFILING_MIN_SECONDS:
+            return None
+
+        return {
+            "mode": profile.mode,
+            "trigger": profile.trigger,
+            "method": profile.method,
+            "path": profile.path,
+            "status_code": status_code,
+            "seconds": round(seconds, 4),
+            "created_at": profile.created_at.isoformat(),
+            "pid": os.getpid()
+        }
+
+    def save(self, profile: Profile, metadata: Dict[str, Any]) -> Optional[str]:
+        """Writes a profile and its metadata, then drops the oldest profiles. Returns its id, or None on failure."""
+        profile_id = profile.id
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            profile.profiler.dump_stats(os.path.join(self.directory, profile_id + PROFILE_EXTENSIONS[profile.mode]))
+            # The metadata file lists the profile: written aside then renamed, once the profile is complete
+            with tempfile.NamedTemporaryFile("w", dir=self.directory, suffix=".tmp", delete=False) as f:
+                json.dump({"id": profile_id, **metadata}, f)
+            os.replace(f.name, os.path.join(self.directory, profile_id + ".json"))
+            self.kept += 1
+            self._remove_oldest()
+        except Exception as e:
+            self.write_errors += 1
+            logger.error(f"Error in save of profile {profile_id}: {e}")
+            return None
+
+        logger.info(f"Profiled {metadata['method']} {metadata['path']} ({metadata['trigger']}, "
+                    f"{metadata['seconds']:.4f}s) as {profile_id}")
+        return profile_id
+
+    def _remove_oldest(self):
+        """Removes the profiles beyond the newest max_profiles, of every worker of the host."""
+        ids = sorted(name[:-len(".json")] for name in os.listdir(self.directory) if name.endswith(".json"))
+        for profile_id in ids[:max(len(ids) - self.max_profiles, 0)]:
+            for extension in (".json", *PROFILE_EXTENSIONS.values()):
+                try:
+                    os.remove(os.path.join(self.directory, profile_id + extension))
+                except FileNotFoundError:
+                    pass
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        """Metadata of the kept profiles, newest first."""
+        if not os.path.isdir(self.directory):
+            return []
+
+        profiles = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    profiles.append(json.load(f))
+            except (FileNotFoundError, ValueError):
+                # Removed by another worker meanwhile
+                pass
+        return profiles
+
+    def profile_path(self, profile_id: str) -> Optional[str]:
+        """Path of the profile file of an id, or None if there is no such profile."""
+        if not PROFILE_ID.match(profile_id):
+            return None
+        for extension in PROFILE_EXTENSIONS.values():
+            path = os.path.join(self.directory, profile_id + extension)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def profile_text(self, path: str, limit: int = 50) -> str:
+        """Readable summary of a profile: the functions with the most cumulative time, or the collapsed stacks."""
+        if not path.endswith(PROFILE_EXTENSIONS[MODE_CPROFILE]):
+            with open(path) as f:
+                return f.read()
+
+        output = io.StringIO()
+        pstats.Stats(path, stream=output).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+        return output.getvalue()
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the configuration and counters of the profiler of this worker."""
+        return {
+            "mode": self.mode,
+            "header_enabled": bool(PROFILING_TOKEN),
+            "sample_rate": PROFILING_SAMPLE_RATE,
+            "min_seconds": PROFILING_MIN_SECONDS,
+            "directory": self.directory,
+            "max_profiles": self.max_profiles,
+            "active": self._active is not None,
+            "profiled": self.profiled,
+            "kept": self.kept,
+            "busy": self.busy,
+            "write_errors": self.write_errors
+        }
+
+
+# Request profiler of this worker process
+request_profiler = RequestProfiler()
@@ -0,0 +1,170 @@
+"""
+Response cache module for the feedback analysis API.
+Caches the results of the analytics queries in each worker, keyed by their arguments and checked
+against a version of the data, so repeated dashboard reads are a lookup and a result is recomputed
+at most once per data change. An outdated result may still be served for a configurable time while
+it is recomputed in the background (stale-while-revalidate). Computations go through single-flight,
+so concurrent requests for the same result share one, in the worker and optionally across workers.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from dotenv import load_dotenv
+
+import metrics
+from cache import BoundedCache
+from rollups import ROLLUP_STATE_ID
+from singleflight import single_flight
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Memory budget of the cached responses of a worker; 0 disables the cache
+RESPONSE_CACHE_BYTES = int(os.getenv("RESPONSE_CACHE_BYTES", 8 * 1024 * 1024))
+
+# Seconds the data version is reused before it is read again, i.e. how long a write may go unnoticed
+RESPONSE_CACHE_VERSION_SECONDS = float(os.getenv("RESPONSE_CACHE_VERSION_SECONDS", 1))
+
+# Seconds an outdated response may still be served while it is recomputed in the background;
+# 0 recomputes before answering
+RESPONSE_CACHE_STALE_SECONDS = float(os.getenv("RESPONSE_CACHE_STALE_SECONDS", 30))
+
+# Seconds after which a response is recomputed even though the version did not change,
+# since windowed results come from rollups that catch up with the writes later
+RESPONSE_CACHE_MAX_AGE = float(os.getenv("RESPONSE_CACHE_MAX_AGE", 300))
+
+# Version of the data the analytics are computed from
+DataVersion = Tuple[Any, ...]
+
+
+async def data_version(collection, rollups) -> DataVersion:
+    """
+    Returns the version of the feedbacks and rollups: latest _id (inserts), latest updatedAt (edits),
+    estimated count (deletions) and rollup high-water mark. Four index or metadata reads.
+    """
+    latest_id, latest_update, count, rollup_state = await asyncio.gather(
+        collection.find_one({}, {"_id": 1}, sort=[("_id", -1)]),
+        collection.find_one({}, {"updatedAt": 1}, sort=[("updatedAt", -1)]),
+        collection.estimated_document_count(),
+        rollups.find_one({"_id": ROLLUP_STATE_ID}, {"createdAt": 1, "lastId": 1, "scorerVersion": 1})
+    )
+    return (
+        latest_id["_id"] if latest_id else None,
+        latest_update.get("updatedAt") if latest_update else None,
+        count,
+        tuple(rollup_state.get(field) for field in ("scorerVersion", "createdAt", "lastId")) if rollup_state else None
+    )
+
+
+class ResponseCache:
+    """
+    Query results keyed by arguments. Each entry holds the data version it was computed from;
+    concurrent requests for a missing or outdated result share one computation.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.entries = BoundedCache("responses", max_bytes)
+        self._version: Optional[DataVersion] = None
+        self._previous_version: Optional[DataVersion] = None
+        self._version_read_at = 0.0
+        self._version_changed_at = 0.0
+        self._version_lock = asyncio.Lock()
+        self.fresh_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.entries.max_bytes > 0
+
+    async def version(self, collection, rollups) -> DataVersion:
+        """Returns the data version, read again once it is RESPONSE_CACHE_VERSION_SECONDS old."""
+        async with self._version_lock:
+            now = time.monotonic()
+            if self._version is None or now - self._version_read_at >= RESPONSE_CACHE_VERSION_SECONDS:
+                version = await data_version(collection, rollups)
+                if version != self._version:
+                    self._previous_version = self._version
+                    self._version = version
+                    self._version_changed_at = now
+                self._version_read_at = now
+            return self._version
+
+    def staleness(self, version: DataVersion, computed_at: float, now: float) -> float:
+        """Seconds since a result computed from `version` at `computed_at` stopped being current; 0 if it is."""
+        staleness = max(0.0, now - computed_at - RESPONSE_CACHE_MAX_AGE)
+        if version != self._version:
+            # Outdated since the last version change, or, if the version changed more than
+            # once since, at most since the result was computed
+            since = self._version_changed_at if version == self._previous_version else computed_at
+            staleness = max(staleness, now - since)
+        return staleness
+
+    async def get_or_compute(self, key: Hashable, collection, rollups, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Returns the cached result for the key if current or stale enough, else computes it once for every caller."""
+        if not self.enabled:
+            return await single_flight.do(key, compute)
+
+        version = await self.version(collection, rollups)
+        entry = self.entries.get(key)
+        if entry is not None:
+            entry_version, computed_at, result = entry
+            staleness = self.staleness(entry_version, computed_at, time.monotonic())
+            if staleness == 0:
+                self.fresh_hits += 1
+                metrics.response_lookups.labels("fresh").inc()
+                return result
+            if staleness < RESPONSE_CACHE_STALE_SECONDS:
+                self.stale_hits += 1
+                metrics.response_lookups.labels("stale").inc()
+                self._start(key, version, compute)
+                return result
+
+        self.misses += 1
+        metrics.response_lookups.labels("miss").inc()
+        # Shielded so a client going away does not cancel the computation shared with other requests
+        return await asyncio.shield(self._start(key, version, compute))
+
+    def _start(self, key: Hashable, version: DataVersion, compute: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Starts computing the result of the key, unless it is already being computed."""
+        return single_flight.start(key, lambda: self._compute(key, version, compute))
+
+    async def _compute(self, key: Hashable, version: DataVersion, compute: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            # Stamped with the version read before computing: a write during the computation
+            # leaves the result outdated rather than wrongly current
+            computed_at = time.monotonic()
+            result = await single_flight.across_workers(key, compute)
+            self.entries.set(key, (version, computed_at, result))
+            return result
+        except Exception as e:
+            logger.error(f"Error computing response for {key}: {e}")
+            raise
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns size and fresh/stale/miss counters of the response cache."""
+        lookups = self.fresh_hits + self.stale_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self.entries),
+            "fresh_hits": self.fresh_hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "computing": single_flight.in_flight(),
+            "hit_ratio": round((self.fresh_hits + self.stale_hits) / lookups, 4) if lookups else 0.0
+        }
+
+
+# Response cache of this worker process
+response_cache = ResponseCache(RESPONSE_CACHE_BYTES)
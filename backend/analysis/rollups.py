@@ -0,0 +1,411 @@
+"""
+Rollup module for the feedback analysis API.
+Maintains time-bucketed aggregates of the feedbacks (per service, feedback type and hour or day)
+in a separate collection, so time-windowed analytics read bucket documents instead of feedbacks.
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from dotenv import load_dotenv
+
+import metrics
+from analysis import ANALYSIS_BATCH_SIZE, ROLLUP_LAG_SECONDS, SCORER_VERSION, TOP_KEYWORDS, annotate_missing
+from keyword_index import RANKING_TFIDF, keyword_index
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Bucket sizes maintained for every (service, feedbackType)
+GRANULARITY_HOUR = "hour"
+GRANULARITY_DAY = "day"
+GRANULARITIES = (GRANULARITY_HOUR, GRANULARITY_DAY)
+
+# Seconds a worker holds the rollup lease; renewed after every batch annotated and before every batch written
+ROLLUP_LEASE_SECONDS = int(os.getenv("ROLLUP_LEASE_SECONDS", 300))
+
+# Minimum seconds between two rollup syncs started by queries
+ROLLUP_SYNC_INTERVAL = int(os.getenv("ROLLUP_SYNC_INTERVAL", 30))
+
+# _id of the document holding the high-water mark and the lease, stored with the buckets
+ROLLUP_STATE_ID = "_state"
+
+# Keywords kept per bucket, the most frequent ones, so bucket documents stay bounded;
+# windowed top keywords are then exact for the terms frequent in at least one bucket
+ROLLUP_BUCKET_KEYWORDS = int(os.getenv("ROLLUP_BUCKET_KEYWORDS", 100))
+
+# Fields of a feedback document that feed the rollups
+ROLLUP_PROJECTION = {
+    "_id": 1, "createdAt": 1, "service": 1, "feedbackType": 1, "rating": 1,
+    "sentiment": 1, "sentimentScore": 1, "keywords": 1, "scorerVersion": 1
+}
+
+# Bucket fields read before a batch is applied: its key, its keywords and the position of its last feedback
+BUCKET_MARK_PROJECTION = {
+    "_id": 0, "granularity": 1, "service": 1, "bucket": 1, "feedbackType": 1,
+    "throughCreatedAt": 1, "throughId": 1, "keywords": 1
+}
+
+# Bucket fields read by the queries, keywords excluded
+BUCKET_PROJECTION = {
+    "_id": 0, "bucket": 1, "service": 1, "feedbackType": 1, "count": 1, "ratingSum": 1,
+    "sentimentCount": 1, "sentimentSum": 1, "sentiment": 1
+}
+
+# Identifies this worker as the lease owner
+_lease_owner = uuid.uuid4().hex
+
+# Background sync started by queries, and when it was started
+_sync_task: Optional[asyncio.Task] = None
+_last_sync_start = 0.0
+
+
+def bucket_start(created_at: datetime, granularity: str) -> datetime:
+    """Truncates a timestamp to the start of its hour or day bucket."""
+    if granularity == GRANULARITY_DAY:
+        return created_at.replace(hour=0, minute=0, second=0, microsecond=0)
+    return created_at.replace(minute=0, second=0, microsecond=0)
+
+
+def to_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Converts an aware datetime to the naive UTC datetimes stored by MongoDB."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+async def ensure_rollup_indexes(rollups):
+    """Creates the unique bucket key and the time-range index of the rollup collection."""
+    await rollups.create_index(
+        [("granularity", ASCENDING), ("service", ASCENDING), ("bucket", ASCENDING), ("feedbackType", ASCENDING)],
+        unique=True
+    )
+    await rollups.create_index([("granularity", ASCENDING), ("bucket", ASCENDING)])
+
+
+def bucket_key(doc: Dict[str, Any], granularity: str) -> Tuple:
+    """(granularity, service, feedbackType, bucket start) of the bucket of a feedback."""
+    return granularity, doc.get("service"), doc.get("feedbackType"), bucket_start(doc["createdAt"], granularity)
+
+
+def bucket_filter(key: Tuple) -> Dict[str, Any]:
+    granularity, service, feedback_type, start = key
+    return {"granularity": granularity, "service": service, "bucket": start, "feedbackType": feedback_type}
+
+
+def bucket_increments(documents: List[Dict[str, Any]],
+                      marks: Optional[Dict[Tuple, Tuple[datetime, Any]]] = None) -> Dict[Tuple, Counter]:
+    """
+    Folds a batch of annotated feedbacks, in (createdAt, _id) order, into the $inc of every bucket they touch.
+    Keywords are counted once per document, like the document frequency of the keyword index.
+    Feedbacks at or before the (createdAt, _id) mark of a bucket are already counted in it and skipped.
+    """
+    marks = marks or {}
+    increments: Dict[Tuple, Counter] = {}
+
+    for doc in documents:
+        for granularity in GRANULARITIES:
+            key = bucket_key(doc, granularity)
+            mark = marks.get(key)
+            if mark is not None and (doc["createdAt"], doc["_id"]) <= mark:
+                continue
+            inc = increments.get(key)
+            if inc is None:
+                inc = increments[key] = Counter()
+
+            inc["count"] += 1
+            rating = doc.get("rating")
+            if isinstance(rating, (int, float)):
+                inc["ratingSum"] += rating
+            # Empty messages have no sentiment and are left out of the sentiment figures
+            if doc.get("sentiment") is not None:
+                inc["sentimentCount"] += 1
+                inc["sentimentSum"] += doc.get("sentimentScore") or 0.0
+                inc[f"sentiment.{doc['sentiment']}"] += 1
+            # Keywords are \w tokens, so they are safe field names
+            for keyword in doc.get("keywords") or []:
+                inc[f"keywords.{keyword['word']}"] += 1
+
+    return increments
+
+
+async def _acquire_lease(rollups) -> bool:
+    """Takes the rollup lease unless another worker holds an unexpired one."""
+    now = datetime.utcnow()
+    try:
+        await rollups.find_one_and_update(
+            {"_id": ROLLUP_STATE_ID, "$or": [{"leaseUntil": {"$exists": False}}, {"leaseUntil": {"$lt": now}}]},
+            {"$set": {"leaseUntil": now + timedelta(seconds=ROLLUP_LEASE_SECONDS), "leaseOwner": _lease_owner}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        # The state document exists and its lease is held
+        return False
+
+
+async def _renew_lease(rollups):
+    """Extends the lease in one atomic check-and-set; raises if another worker took it over."""
+    result = await rollups.update_one(
+        {"_id": ROLLUP_STATE_ID, "leaseOwner": _lease_owner},
+        {"$set": {"leaseUntil": datetime.utcnow() + timedelta(seconds=ROLLUP_LEASE_SECONDS)}}
+    )
+    if result.matched_count == 0:
+        raise RuntimeError("Rollup lease lost during sync")
+
+
+async def _release_lease(rollups):
+    await rollups.update_one({"_id": ROLLUP_STATE_ID, "leaseOwner": _lease_owner},
+                             {"$unset": {"leaseUntil": "", "leaseOwner": ""}})
+
+
+async def sync_rollups(collection, rollups, rebuild: bool = False, batch_size: Optional[int] = None) -> int:
+    """
+    Folds the feedbacks past the (createdAt, _id) high-water mark into the rollup buckets.
+    One worker at a time holds the lease; the others return at once. The buckets are rebuilt
+    from scratch when asked to or when the scorer version changed. Returns the documents rolled up.
+    """
+    if not await _acquire_lease(rollups):
+        return 0
+
+    try:
+        state = await rollups.find_one({"_id": ROLLUP_STATE_ID})
+        if rebuild or state.get("scorerVersion") != SCORER_VERSION:
+            await rollups.delete_many({"granularity": {"$exists": True}})
+            state = {"scorerVersion": SCORER_VERSION}
+            await rollups.update_one({"_id": ROLLUP_STATE_ID},
+                                     {"$set": state, "$unset": {"createdAt": "", "lastId": ""}})
+            logger.info(f"Rebuilding rollups for scorer {SCORER_VERSION}")
+
+        bound = datetime.utcnow() - timedelta(seconds=ROLLUP_LAG_SECONDS)
+        query: Dict[str, Any] = {"createdAt": {"$lt": bound}}
+        if state.get("createdAt") is not None:
+            query = {"$or": [
+                {"createdAt": {"$gt": state["createdAt"], "$lt": bound}},
+                {"createdAt": state["createdAt"], "_id": {"$gt": state["lastId"]}}
+            ]}
+
+        # Annotating a backlog can outlast the lease: keep it while scoring
+        await annotate_missing(collection, query, after_batch=lambda: _renew_lease(rollups))
+
+        batch_size = batch_size or ANALYSIS_BATCH_SIZE
+        cursor = collection.find(query, ROLLUP_PROJECTION, batch_size=batch_size).sort(
+            [("createdAt", ASCENDING), ("_id", ASCENDING)])
+
+        rolled_up = 0
+        batch = []
+        async for doc in cursor:
+            # Stop at a document that arrived after annotate_missing ran; the next sync resumes there
+            if doc.get("scorerVersion") != SCORER_VERSION:
+                break
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                await _apply_batch(rollups, batch)
+                rolled_up += len(batch)
+                batch = []
+
+        if batch:
+            await _apply_batch(rollups, batch)
+            rolled_up += len(batch)
+
+        if rolled_up:
+            logger.info(f"Rolled up {rolled_up} documents")
+        return rolled_up
+    except Exception as e:
+        logger.error(f"Error in sync_rollups: {e}")
+        raise
+    finally:
+        await _release_lease(rollups)
+
+
+def merge_keywords(current: Optional[Dict[str, int]], inc: Counter) -> Dict[str, int]:
+    """Moves the keyword counts of an increment into those of a bucket, keeping the ROLLUP_BUCKET_KEYWORDS best."""
+    keywords = Counter(current or {})
+    for field in [field for field in inc if field.startswith("keywords.")]:
+        keywords[field[len("keywords."):]] += inc.pop(field)
+    # Most frequent first, ties broken alphabetically so every sync trims the same terms
+    return dict(sorted(keywords.items(), key=lambda item: (-item[1], item[0]))[:ROLLUP_BUCKET_KEYWORDS])
+
+
+async def _apply_batch(rollups, batch: List[Dict[str, Any]]):
+    """
+    Increments the buckets of a batch, then advances the high-water mark and renews the lease.
+    Every bucket records the (createdAt, _id) of the last feedback counted in it, and a write only
+    applies if that mark is still the one read: a batch applied again, after a crash before the
+    high-water mark moved or by a worker that lost the lease, counts nothing twice.
+    The lease is checked and extended right before the increments, so a worker that lost it never applies them.
+    """
+    keys = {bucket_key(doc, granularity) for doc in batch for granularity in GRANULARITIES}
+    buckets: Dict[Tuple, Dict[str, Any]] = {}
+    with metrics.stage(metrics.STAGE_MONGO):
+        async for bucket in rollups.find({"$or": [bucket_filter(key) for key in keys]}, BUCKET_MARK_PROJECTION):
+            key = (bucket["granularity"], bucket.get("service"), bucket.get("feedbackType"), bucket["bucket"])
+            buckets[key] = bucket
+    marks = {
+        key: (bucket["throughCreatedAt"], bucket["throughId"])
+        for key, bucket in buckets.items() if bucket.get("throughCreatedAt") is not None
+    }
+
+    # Position of the last feedback of the batch in each bucket
+    through = {bucket_key(doc, granularity): doc for doc in batch for granularity in GRANULARITIES}
+
+    operations = []
+    for key, inc in bucket_increments(batch, marks).items():
+        bucket = buckets.get(key, {})
+        keywords = merge_keywords(bucket.get("keywords"), inc)
+        last = through[key]
+        operations.append(UpdateOne(
+            # No match once another write moved the mark: the upsert then fails on the unique bucket key
+            {**bucket_filter(key), "throughCreatedAt": bucket.get("throughCreatedAt"),
+             "throughId": bucket.get("throughId")},
+            {
+                "$set": {"keywords": keywords, "throughCreatedAt": last["createdAt"], "throughId": last["_id"]},
+                "$inc": dict(inc)
+            },
+            upsert=True
+        ))
+
+    await _renew_lease(rollups)
+    if operations:
+        await rollups.bulk_write(operations, ordered=False)
+
+    last = batch[-1]
+    result = await rollups.update_one(
+        {"_id": ROLLUP_STATE_ID, "leaseOwner": _lease_owner},
+        {"$set": {
+            "createdAt": last["createdAt"],
+            "lastId": last["_id"],
+            "leaseUntil": datetime.utcnow() + timedelta(seconds=ROLLUP_LEASE_SECONDS)
+        }}
+    )
+    if result.matched_count == 0:
+        raise RuntimeError("Rollup lease lost during sync")
+
+
+async def rollups_ready(rollups) -> bool:
+    """Whether the buckets cover the collection up to a high-water mark for the current scorer version."""
+    state = await rollups.find_one({"_id": ROLLUP_STATE_ID}, {"createdAt": 1, "scorerVersion": 1})
+    return state is not None and state.get("scorerVersion") == SCORER_VERSION and state.get("createdAt") is not None
+
+
+def schedule_rollup_sync(collection, rollups):
+    """Starts a background sync if none is running and the last one started over ROLLUP_SYNC_INTERVAL ago."""
+    global _sync_task, _last_sync_start
+
+    if _sync_task is not None and not _sync_task.done():
+        return
+    if time.monotonic() - _last_sync_start < ROLLUP_SYNC_INTERVAL:
+        return
+
+    _last_sync_start = time.monotonic()
+    _sync_task = asyncio.create_task(sync_rollups(collection, rollups))
+    # sync_rollups logs its errors; retrieve them so they are not reported again as unhandled
+    _sync_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+
+async def read_buckets(rollups, granularity: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                       service: Optional[str] = None, with_keywords: bool = False,
+                       services: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Returns the buckets of a granularity whose start lies in [start, end), oldest first,
+    of one service, of a list of services, or of every service.
+    Bounds are not aligned: a bucket is included whole if it starts inside the window,
+    and the bucket a bound falls in is left out if it starts before the window.
+    """
+    query: Dict[str, Any] = {"granularity": granularity}
+    if service is not None:
+        query["service"] = service
+    elif services is not None:
+        query["service"] = {"$in": services}
+
+    start, end = to_utc(start), to_utc(end)
+    if start is not None or end is not None:
+        query["bucket"] = {}
+        if start is not None:
+            query["bucket"]["$gte"] = start
+        if end is not None:
+            query["bucket"]["$lt"] = end
+
+    projection = dict(BUCKET_PROJECTION)
+    if with_keywords:
+        projection["keywords"] = 1
+
+    with metrics.stage(metrics.STAGE_MONGO):
+        buckets = await rollups.find(query, projection).sort("bucket", ASCENDING).to_list(length=None)
+    metrics.add_scanned(len(buckets))
+    return buckets
+
+
+def summarize_buckets(buckets: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Adds up buckets into the totals reported by analyze_feedback and analyze_service_feedback."""
+    total_feedback = 0
+    total_rating = 0
+    sentiment_count = 0
+    sentiment_sum = 0.0
+    feedback_type_counts: Counter = Counter()
+    sentiment_counts = {"positive": 0, "neutral": 0, "negative": 0}
+
+    for bucket in buckets:
+        total_feedback += bucket.get("count", 0)
+        total_rating += bucket.get("ratingSum", 0)
+        sentiment_count += bucket.get("sentimentCount", 0)
+        sentiment_sum += bucket.get("sentimentSum", 0.0)
+        if bucket.get("feedbackType") is not None:
+            feedback_type_counts[bucket["feedbackType"]] += bucket.get("count", 0)
+        for label, count in (bucket.get("sentiment") or {}).items():
+            sentiment_counts[label] = sentiment_counts.get(label, 0) + count
+
+    return {
+        "total_feedback": total_feedback,
+        "average_rating": round(total_rating / total_feedback, 2) if total_feedback > 0 else 0.0,
+        "average_sentiment": round(sentiment_sum / sentiment_count, 2) if sentiment_count > 0 else 0.0,
+        "feedback_type_counts": dict(feedback_type_counts),
+        "sentiment_counts": sentiment_counts
+    }
+
+
+def bucket_series(buckets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Merges the buckets of every service and feedback type into one point per bucket start."""
+    by_start: Dict[datetime, List[Dict[str, Any]]] = {}
+    for bucket in buckets:
+        by_start.setdefault(bucket["bucket"], []).append(bucket)
+
+    return [
+        {"start": start, **summarize_buckets(group)}
+        for start, group in sorted(by_start.items())
+    ]
+
+
+def top_bucket_keywords(buckets: List[Dict[str, Any]], k: int = TOP_KEYWORDS,
+                        ranking: Optional[str] = None) -> List[str]:
+    """
+    Returns the k best keywords of the buckets, by document frequency in the window or
+    weighted by the inverse service frequency of the keyword index for TF-IDF.
+    Buckets keep their ROLLUP_BUCKET_KEYWORDS most frequent keywords only.
+    """
+    counts: Counter = Counter()
+    for bucket in buckets:
+        counts.update(bucket.get("keywords") or {})
+    if not counts:
+        return []
+
+    words = list(counts)
+    scores = np.fromiter((counts[word] for word in words), dtype=np.float64, count=len(words))
+    if ranking == RANKING_TFIDF:
+        scores = scores * keyword_index.idf(words)
+
+    # Highest score first, ties broken alphabetically for stable results
+    return [word for _, word in sorted(zip(-scores, words))[:k]]
@@ -0,0 +1,158 @@
+"""
+Sentiment backends for the feedback analysis API.
+Every backend scores a batch of messages into an array of polarities between -1 and 1.
+The active backend is chosen with the SENTIMENT_BACKEND environment variable.
+"""
+
+import logging
+import os
+import re
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Selected backend: "textblob" (default) or "lexicon"
+SENTIMENT_BACKEND = os.getenv("SENTIMENT_BACKEND", "textblob")
+
+# VADER normalization constant: compound = sum / sqrt(sum^2 + alpha)
+VADER_ALPHA = 15.0
+
+# VADER scaling applied to a valence preceded by a negation word
+NEGATION_SCALAR = -0.74
+
+# Number of preceding tokens searched for a negation word
+NEGATION_WINDOW = 3
+
+# VADER weighting of the valences before and after the first "but" of a message
+BUT_BEFORE_SCALAR = 0.5
+BUT_AFTER_SCALAR = 1.5
+
+# Lexicon tokens: words, with inner apostrophes kept so "don't" matches the negation list
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+class SentimentBackend:
+    """Interface of a sentiment backend."""
+
+    name = "base"
+
+    def score_batch(self, messages: Sequence[str]) -> np.ndarray:
+        """Returns the polarity of every message as a float64 array, in input order."""
+        raise NotImplementedError
+
+    def score(self, message: str) -> float:
+        """Returns the polarity of a single message."""
+        return float(self.score_batch([message])[0])
+
+
+class TextBlobBackend(SentimentBackend):
+    """TextBlob pattern-based polarity, scored one message at a time."""
+
+    name = "textblob"
+
+    def score_batch(self, messages: Sequence[str]) -> np.ndarray:
+        from textblob import TextBlob
+
+        return np.fromiter(
+            (TextBlob(message).sentiment.polarity for message in messages),
+            dtype=np.float64,
+            count=len(messages)
+        )
+
+
+class LexiconBackend(SentimentBackend):
+    """
+    High-throughput VADER-lexicon backend.
+    A batch is tokenized once into a flat array of vocabulary ids; valences are gathered with one
+    NumPy lookup, negations and "but" clauses are applied with masks and per-message sums come from
+    a single weighted bincount. Unlike full VADER it ignores boosters, capitalization and punctuation emphasis.
+    """
+
+    name = "lexicon"
+
+    def __init__(self, lexicon: Optional[Dict[str, float]] = None, negations: Optional[Sequence[str]] = None):
+        if lexicon is None or negations is None:
+            from vaderSentiment.vaderSentiment import NEGATE, SentimentIntensityAnalyzer
+
+            lexicon = lexicon if lexicon is not None else SentimentIntensityAnalyzer().lexicon
+            negations = negations if negations is not None else NEGATE
+
+        # Id 0 is reserved for tokens outside the vocabulary
+        words = sorted(set(lexicon) | set(negations) | {"but"})
+        self._vocabulary = {word: index for index, word in enumerate(words, start=1)}
+        self._valences = np.zeros(len(words) + 1, dtype=np.float64)
+        self._negators = np.zeros(len(words) + 1, dtype=bool)
+        for word, valence in lexicon.items():
+            self._valences[self._vocabulary[word]] = valence
+        for word in negations:
+            self._negators[self._vocabulary[word]] = True
+        self._but = self._vocabulary["but"]
+
+    def score_batch(self, messages: Sequence[str]) -> np.ndarray:
+        vocabulary = self._vocabulary
+        ids: List[int] = []
+        lengths = np.zeros(len(messages), dtype=np.int64)
+
+        for position, message in enumerate(messages):
+            if not message or not isinstance(message, str):
+                continue
+            tokens = _TOKEN_RE.findall(message.lower())
+            ids.extend(vocabulary.get(token, 0) for token in tokens)
+            lengths[position] = len(tokens)
+
+        if not ids:
+            return np.zeros(len(messages), dtype=np.float64)
+
+        token_ids = np.fromiter(ids, dtype=np.int64, count=len(ids))
+        owners = np.repeat(np.arange(len(messages)), lengths)
+        valences = self._valences[token_ids]
+
+        # Flip and dampen valences that follow a negation word in the same message
+        negators = self._negators[token_ids]
+        for distance in range(1, NEGATION_WINDOW + 1):
+            negated = np.zeros(len(token_ids), dtype=bool)
+            negated[distance:] = negators[:-distance] & (owners[distance:] == owners[:-distance])
+            valences = np.where(negated, valences * NEGATION_SCALAR, valences)
+
+        # Valences before the first "but" of a message are dampened, those after it emphasized
+        buts = np.flatnonzero(token_ids == self._but)
+        if len(buts):
+            first_but = np.full(len(messages), -1, dtype=np.int64)
+            with_but, first = np.unique(owners[buts], return_index=True)
+            first_but[with_but] = buts[first]
+            token_but = first_but[owners]
+            positions = np.arange(len(token_ids))
+            valences = np.where((token_but >= 0) & (positions < token_but), valences * BUT_BEFORE_SCALAR, valences)
+            valences = np.where((token_but >= 0) & (positions > token_but), valences * BUT_AFTER_SCALAR, valences)
+
+        sums = np.bincount(owners, weights=valences, minlength=len(messages))
+        return sums / np.sqrt(sums * sums + VADER_ALPHA)
+
+
+BACKENDS = {
+    TextBlobBackend.name: TextBlobBackend,
+    LexiconBackend.name: LexiconBackend,
+}
+
+# Backend instance of this process
+_backend: Optional[SentimentBackend] = None
+
+
+def get_backend() -> SentimentBackend:
+    """Returns the backend selected by SENTIMENT_BACKEND, creating it on first use."""
+    global _backend
+
+    if _backend is None:
+        if SENTIMENT_BACKEND not in BACKENDS:
+            raise ValueError(f"Unknown SENTIMENT_BACKEND '{SENTIMENT_BACKEND}', expected one of {sorted(BACKENDS)}")
+        _backend = BACKENDS[SENTIMENT_BACKEND]()
+        logger.info(f"Using sentiment backend '{SENTIMENT_BACKEND}'")
+    return _backend
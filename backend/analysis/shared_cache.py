@@ -0,0 +1,220 @@
+"""
+Shared cache module for the feedback analysis API.
+Optional Redis tier (L2) under the in-process caches (L1), shared by every uvicorn worker.
+Disabled unless REDIS_URL is set.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from dotenv import load_dotenv
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis is optional: without it the L2 tier stays disabled
+    aioredis = None
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Redis configuration
+REDIS_URL = os.getenv("REDIS_URL", "")
+REDIS_CACHE_TTL = int(os.getenv("REDIS_CACHE_TTL", 7 * 24 * 3600))
+REDIS_KEY_PREFIX = os.getenv("REDIS_KEY_PREFIX", "analysis")
+
+# Seconds a worker may hold the warmup claim before another worker can take over
+WARMUP_CLAIM_TTL = int(os.getenv("WARMUP_CLAIM_TTL", 3600))
+
+# Seconds between two checks of the warm marker by the workers waiting for the warmup
+WARMUP_POLL_SECONDS = float(os.getenv("WARMUP_POLL_SECONDS", 2))
+
+# (sentiment score, ranked keywords) as held by the L1 caches
+CachedScores = Tuple[float, Tuple[Tuple[str, int], ...]]
+
+
+class SharedAnnotationCache:
+    """
+    Redis-backed cache of sentiment scores and ranked keywords, keyed by scorer version and
+    content hash. Batch lookups and writes are a single pipelined round-trip.
+    Any client implementing the redis.asyncio interface can be passed in, e.g. an in-memory stand-in.
+    """
+
+    def __init__(self, url: str = REDIS_URL, ttl: int = REDIS_CACHE_TTL, client=None):
+        self.url = url
+        self.ttl = ttl
+        self._client = client
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._client is not None
+
+    @property
+    def client(self):
+        """Redis client of the shared tier, also used for cross-worker locks; None while disabled."""
+        return self._client
+
+    def connect(self):
+        """Creates the Redis client if a URL is configured. Connections are opened lazily by the pool."""
+        if self._client is not None or not self.url:
+            return
+        if aioredis is None:
+            logger.warning("REDIS_URL is set but the redis package is not installed; shared cache disabled")
+            return
+        self._client = aioredis.from_url(self.url)
+        logger.info("Shared Redis annotation cache enabled")
+
+    async def close(self):
+        """Closes the Redis client."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @staticmethod
+    def _key(version: str, key: int) -> str:
+        return f"{REDIS_KEY_PREFIX}:{version}:a:{key:016x}"
+
+    @staticmethod
+    def _warm_key(version: str) -> str:
+        # Per scorer version: a deploy bumping the scorer finds no marker and warms up again
+        return f"{REDIS_KEY_PREFIX}:{version}:warm"
+
+    @staticmethod
+    def _claim_key(version: str) -> str:
+        return f"{REDIS_KEY_PREFIX}:{version}:warmup"
+
+    async def get_many(self, version: str, keys: Iterable[int]) -> Dict[int, CachedScores]:
+        """Looks up many content hashes with one MGET. Returns only the entries found."""
+        keys = list(keys)
+        if not self.enabled or not keys:
+            return {}
+
+        try:
+            values = await self._client.mget([self._key(version, key) for key in keys])
+        except Exception as e:
+            # The shared tier is an optimization: fall back to scoring locally
+            self.errors += 1
+            logger.warning(f"Shared cache lookup failed: {e}")
+            return {}
+
+        found = {}
+        for key, value in zip(keys, values):
+            if value is None:
+                continue
+            try:
+                score, ranked = json.loads(value)
+                found[key] = (float(score), tuple((str(word), int(freq)) for word, freq in ranked))
+            except (ValueError, TypeError) as e:
+                # A corrupt or foreign value is a miss: the message is scored locally and the entry rewritten
+                self.errors += 1
+                logger.warning(f"Shared cache entry {self._key(version, key)} unreadable: {e}")
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    async def set_many(self, version: str, entries: Dict[int, CachedScores]):
+        """Stores many entries in one pipelined MSET, followed by their expiry in the same round-trip."""
+        if not self.enabled or not entries:
+            return
+
+        mapping = {
+            self._key(version, key): json.dumps([score, ranked])
+            for key, (score, ranked) in entries.items()
+        }
+        try:
+            async with self._client.pipeline(transaction=False) as pipe:
+                pipe.mset(mapping)
+                for redis_key in mapping:
+                    pipe.expire(redis_key, self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Shared cache write failed: {e}")
+
+    async def claim_warmup(self, version: str) -> bool:
+        """
+        Returns True if this worker should run the warmup for the scorer version:
+        the cache is not marked warm yet and no other worker holds the claim.
+        """
+        if not self.enabled:
+            return True
+
+        try:
+            if await self._client.exists(self._warm_key(version)):
+                return False
+            claimed = await self._client.set(self._claim_key(version), os.getpid(), nx=True, ex=WARMUP_CLAIM_TTL)
+            return bool(claimed)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Shared cache warmup claim failed: {e}")
+            return True
+
+    async def mark_warm(self, version: str):
+        """Records that the warmup for the scorer version has completed."""
+        if not self.enabled:
+            return
+
+        try:
+            await self._client.set(self._warm_key(version), 1, ex=self.ttl)
+            await self._client.delete(self._claim_key(version))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Shared cache warm marker failed: {e}")
+
+    async def release_warmup(self, version: str):
+        """Gives the warmup claim up, so the workers waiting for it stop at once instead of at its expiry."""
+        if not self.enabled:
+            return
+
+        try:
+            await self._client.delete(self._claim_key(version))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Shared cache warmup release failed: {e}")
+
+    async def wait_warm(self, version: str, poll_seconds: float = WARMUP_POLL_SECONDS) -> bool:
+        """
+        Waits while another worker holds the warmup claim. Returns True once the cache is marked warm,
+        False if the claim was released or expired without it (the warmup failed or its worker died).
+        """
+        if not self.enabled:
+            return False
+
+        while True:
+            try:
+                # Warm marker first: mark_warm sets it before dropping the claim
+                if await self._client.exists(self._warm_key(version)):
+                    return True
+                if not await self._client.exists(self._claim_key(version)):
+                    return False
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Shared cache warm check failed: {e}")
+                return False
+            await asyncio.sleep(poll_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit/miss/error counters of the shared tier."""
+        lookups = self.hits + self.misses
+        return {
+            "name": "redis",
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+# Shared tier of this worker process
+shared_cache = SharedAnnotationCache()
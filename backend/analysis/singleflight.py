@@ -0,0 +1,372 @@
+"""
+Single-flight module for the feedback analysis API.
+Coalesces concurrent identical computations: the first request for a key computes it and concurrent
+requests for the same key await its result. Optionally across workers, through a lock in Redis
+(every host) or on the local filesystem (workers of a host): one worker computes while the others
+wait for the result it publishes.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+import metrics
+from shared_cache import REDIS_KEY_PREFIX, shared_cache
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows: file mode then falls back to coalescing per worker
+    fcntl = None
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Cross-worker coalescing: "redis" (through REDIS_URL), "file" (workers of a host) or unset (per worker)
+SINGLE_FLIGHT_MODE = os.getenv("SINGLE_FLIGHT_MODE", "")
+MODE_REDIS = "redis"
+MODE_FILE = "file"
+
+# Directory of the lock and result files in file mode
+SINGLE_FLIGHT_DIR = os.getenv("SINGLE_FLIGHT_DIR", os.path.join(tempfile.gettempdir(), "analysis-single-flight"))
+
+# Seconds a worker waits for another one to finish before computing itself
+SINGLE_FLIGHT_LOCK_SECONDS = float(os.getenv("SINGLE_FLIGHT_LOCK_SECONDS", 60))
+
+# Seconds a published result is kept for the workers waiting for it
+SINGLE_FLIGHT_RESULT_SECONDS = float(os.getenv("SINGLE_FLIGHT_RESULT_SECONDS", 10))
+
+# Seconds between two attempts to take a lock held by another worker
+SINGLE_FLIGHT_POLL_SECONDS = float(os.getenv("SINGLE_FLIGHT_POLL_SECONDS", 0.02))
+
+
+def key_digest(key: Hashable) -> str:
+    """Name of a key shared by every worker; keys are tuples of plain values, whose repr is stable."""
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+
+def _to_json(value: Any) -> Any:
+    """Tags the values of an analysis result JSON has no type for: datetimes and dicts with keys other than strings."""
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value):
+            return {key: _to_json(item) for key, item in value.items()}
+        return {"__items__": [[_to_json(key), _to_json(item)] for key, item in value.items()]}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _hashable(key: Any) -> Hashable:
+    """Tuple keys come back from JSON as lists: turns them back into tuples."""
+    if isinstance(key, list):
+        return tuple(_hashable(item) for item in key)
+    return key
+
+
+def _from_json(value: Dict[str, Any]) -> Any:
+    if "__datetime__" in value:
+        return datetime.fromisoformat(value["__datetime__"])
+    if "__items__" in value:
+        return {_hashable(key): item for key, item in value["__items__"]}
+    return value
+
+
+def encode_result(result: Any) -> str:
+    """Serializes a published result as JSON, so reading it back never runs code."""
+    return json.dumps(_to_json(result))
+
+
+def decode_result(value) -> Any:
+    return json.loads(value, object_hook=_from_json)
+
+
+class RedisFlightLock:
+    """
+    Lock and result of a key in Redis. Results are stored as JSON along with the value of a
+    publication counter, which tells waiters whether a result is newer.
+    """
+
+    # Deletes the lock only if it still holds our token, so an expired lock taken over is left alone
+    RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def __init__(self):
+        self._tokens: Dict[str, str] = {}
+
+    @staticmethod
+    def _key(digest: str, kind: str) -> str:
+        return f"{REDIS_KEY_PREFIX}:flight:{digest}:{kind}"
+
+    async def acquire(self, digest: str) -> bool:
+        token = uuid.uuid4().hex
+        acquired = await shared_cache.client.set(self._key(digest, "lock"), token, nx=True,
+                                                 px=int(SINGLE_FLIGHT_LOCK_SECONDS * 1000))
+        if acquired:
+            self._tokens[digest] = token
+        return bool(acquired)
+
+    async def release(self, digest: str):
+        token = self._tokens.pop(digest, None)
+        if token is not None:
+            await shared_cache.client.eval(self.RELEASE_SCRIPT, 1, self._key(digest, "lock"), token)
+
+    async def generation(self, digest: str) -> int:
+        return int(await shared_cache.client.get(self._key(digest, "generation")) or 0)
+
+    async def publish(self, digest: str, result: Any):
+        generation = await shared_cache.client.incr(self._key(digest, "generation"))
+        expiry = int(SINGLE_FLIGHT_RESULT_SECONDS * 1000)
+        async with shared_cache.client.pipeline(transaction=False) as pipe:
+            pipe.pexpire(self._key(digest, "generation"), expiry)
+            pipe.set(self._key(digest, "result"), encode_result([generation, result]), px=expiry)
+            await pipe.execute()
+
+    async def published(self, digest: str) -> Optional[Tuple[int, Any]]:
+        value = await shared_cache.client.get(self._key(digest, "result"))
+        if value is None:
+            return None
+        generation, result = decode_result(value)
+        return generation, result
+
+
+class FileFlightLock:
+    """
+    Lock and result of a key in files of SINGLE_FLIGHT_DIR. Locks are flock()s, released by the
+    kernel if their worker dies; the modification time of a result file is its generation.
+    Lock files are removed on release, so the directory holds only the keys being computed.
+    File operations run in the default executor, off the event loop.
+    """
+
+    def __init__(self, directory: str = SINGLE_FLIGHT_DIR):
+        self.directory = directory
+        self._locks: Dict[str, int] = {}
+
+    def _path(self, digest: str, kind: str) -> str:
+        return os.path.join(self.directory, f"{digest}.{kind}")
+
+    async def acquire(self, digest: str) -> bool:
+        descriptor = await asyncio.to_thread(self._lock_file, self._path(digest, "lock"))
+        if descriptor is None:
+            return False
+        self._locks[digest] = descriptor
+        return True
+
+    async def release(self, digest: str):
+        descriptor = self._locks.pop(digest, None)
+        if descriptor is not None:
+            await asyncio.to_thread(self._unlock_file, self._path(digest, "lock"), descriptor)
+
+    async def generation(self, digest: str) -> int:
+        return await asyncio.to_thread(self._generation, digest)
+
+    async def publish(self, digest: str, result: Any):
+        await asyncio.to_thread(self._publish, digest, result)
+
+    async def published(self, digest: str) -> Optional[Tuple[int, Any]]:
+        return await asyncio.to_thread(self._published, digest)
+
+    def _lock_file(self, path: str) -> Optional[int]:
+        """Locks a lock file, returning its descriptor, or None if another worker holds it."""
+        os.makedirs(self.directory, exist_ok=True)
+        descriptor = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(descriptor, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            # The holder may have removed the file between our open and flock: that lock no longer counts
+            if os.fstat(descriptor).st_ino == os.stat(path).st_ino:
+                return descriptor
+        except (BlockingIOError, FileNotFoundError):
+            pass
+        os.close(descriptor)
+        return None
+
+    @staticmethod
+    def _unlock_file(path: str, descriptor: int):
+        """Removes a lock file while still holding it, then releases it."""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        finally:
+            os.close(descriptor)
+
+    def _generation(self, digest: str) -> int:
+        try:
+            return os.stat(self._path(digest, "result")).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def _publish(self, digest: str, result: Any):
+        path = self._path(digest, "result")
+        # Written aside then renamed, so readers never see a partial file
+        with tempfile.NamedTemporaryFile("w", dir=self.directory, delete=False) as f:
+            f.write(encode_result(result))
+        os.replace(f.name, path)
+        self._remove_expired()
+
+    def _published(self, digest: str) -> Optional[Tuple[int, Any]]:
+        path = self._path(digest, "result")
+        try:
+            with open(path) as f:
+                return os.fstat(f.fileno()).st_mtime_ns, decode_result(f.read())
+        except FileNotFoundError:
+            return None
+
+    def _remove_expired(self):
+        """Removes the results nobody can be waiting for anymore, and the lock files left by dead workers."""
+        expired_before = time.time() - max(SINGLE_FLIGHT_RESULT_SECONDS, SINGLE_FLIGHT_LOCK_SECONDS)
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.stat(path).st_mtime >= expired_before:
+                    continue
+                if name.endswith(".result"):
+                    os.remove(path)
+                elif name.endswith(".lock"):
+                    # Only a lock file nobody holds is removed, under its lock
+                    descriptor = self._lock_file(path)
+                    if descriptor is not None:
+                        self._unlock_file(path, descriptor)
+            except FileNotFoundError:
+                pass
+
+
+class SingleFlight:
+    """
+    In-flight computations by key. start() coalesces within the worker; across_workers()
+    coalesces across workers when a lock mode is configured.
+    """
+
+    def __init__(self, mode: str = SINGLE_FLIGHT_MODE):
+        if mode == MODE_FILE and fcntl is None:
+            logger.warning("Single-flight file mode needs flock(), not available here: coalescing per worker")
+            mode = ""
+        self.mode = mode
+        self._flights: Dict[Hashable, asyncio.Task] = {}
+        self._lock = None
+        self.computed = 0
+        self.coalesced = 0
+        self.coalesced_remote = 0
+        self.lock_errors = 0
+
+    def _cross_worker_lock(self):
+        """Lock of the configured mode, created on first use once the Redis client is connected."""
+        if self._lock is None:
+            if self.mode == MODE_REDIS and shared_cache.enabled:
+                self._lock = RedisFlightLock()
+            elif self.mode == MODE_FILE:
+                self._lock = FileFlightLock()
+        return self._lock
+
+    def start(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Returns the task computing the key in this worker, starting it unless one is already running."""
+        task = self._flights.get(key)
+        if task is not None:
+            self.coalesced += 1
+            metrics.single_flight_requests.labels("coalesced").inc()
+            return task
+
+        task = self._flights[key] = asyncio.create_task(compute())
+
+        def done(finished: asyncio.Task):
+            self._flights.pop(key, None)
+            # Errors reach the requests awaiting the task; retrieve them for tasks nobody awaits
+            finished.cancelled() or finished.exception()
+
+        task.add_done_callback(done)
+        return task
+
+    async def do(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Computes the key once for every concurrent caller, in this worker and across workers."""
+        # Shielded so a client going away does not cancel the computation shared with other requests
+        return await asyncio.shield(self.start(key, lambda: self.across_workers(key, compute)))
+
+    async def across_workers(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Computes the key, unless another worker is computing it: then waits for its lock and takes the
+        result it published meanwhile. Lock failures fall back to computing in this worker.
+        """
+        lock = self._cross_worker_lock()
+        if lock is None:
+            return await self._compute(compute)
+
+        digest = key_digest(key)
+        acquired = False
+        try:
+            acquired = await lock.acquire(digest)
+            if not acquired:
+                waiting_since = await lock.generation(digest)
+                deadline = time.monotonic() + SINGLE_FLIGHT_LOCK_SECONDS
+                while not acquired and time.monotonic() < deadline:
+                    await asyncio.sleep(SINGLE_FLIGHT_POLL_SECONDS)
+                    acquired = await lock.acquire(digest)
+
+                published = await lock.published(digest)
+                if published is not None and published[0] > waiting_since:
+                    if acquired:
+                        await lock.release(digest)
+                        acquired = False
+                    self.coalesced_remote += 1
+                    metrics.single_flight_requests.labels("coalesced_remote").inc()
+                    return published[1]
+        except Exception as e:
+            self.lock_errors += 1
+            logger.warning(f"Single-flight lock failed for {key}: {e}")
+
+        try:
+            result = await self._compute(compute)
+            if acquired:
+                try:
+                    await lock.publish(digest, result)
+                except Exception as e:
+                    self.lock_errors += 1
+                    logger.warning(f"Single-flight publication failed for {key}: {e}")
+            return result
+        finally:
+            # A failed computation publishes nothing: the waiting workers then compute themselves
+            if acquired:
+                try:
+                    await lock.release(digest)
+                except Exception as e:
+                    self.lock_errors += 1
+                    logger.warning(f"Single-flight lock release failed for {key}: {e}")
+
+    async def _compute(self, compute: Callable[[], Awaitable[Any]]) -> Any:
+        self.computed += 1
+        metrics.single_flight_requests.labels("computed").inc()
+        return await compute()
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns how many requests computed and how many were coalesced, in this worker and across workers."""
+        requests = self.computed + self.coalesced + self.coalesced_remote
+        return {
+            "mode": self.mode or "worker",
+            "in_flight": len(self._flights),
+            "computed": self.computed,
+            "coalesced": self.coalesced,
+            "coalesced_remote": self.coalesced_remote,
+            "lock_errors": self.lock_errors,
+            "coalesced_ratio": round((self.coalesced + self.coalesced_remote) / requests, 4) if requests else 0.0
+        }
+
+
+# Single-flight computations of this worker process
+single_flight = SingleFlight()
@@ -0,0 +1,150 @@
+"""
+Subscriptions module for the feedback analysis API.
+Broadcasts the changes of the live statistics to GraphQL subscribers: whenever the aggregates
+change, the delta of each subscribed view (overall or one service) is computed once and handed
+to every subscriber of that view. Idle subscribers cost no work until something changes.
+"""
+
+import asyncio
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Set
+
+from live_stats import LiveStats, StatsMaintainer, stats_maintainer
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Fields of a view that are counters by key; only the keys whose count changed are sent
+COUNTER_FIELDS = ("sentiment_counts", "feedback_type_counts")
+
+
+def stats_view(stats: LiveStats, service: Optional[str]) -> Dict[str, Any]:
+    """Statistics pushed to the subscribers of a service, or of every service if None."""
+    if service is None:
+        view = stats.overall()
+        scored = sum(totals["sentimentCount"] for totals in stats.services.values())
+        sentiment_sum = sum(totals["sentimentSum"] for totals in stats.services.values())
+        view["average_sentiment"] = round(sentiment_sum / scored, 2) if scored > 0 else 0.0
+        return view
+
+    analysis = stats.service(service)
+    return {
+        "total_feedback": analysis["total_feedback"],
+        "average_rating": analysis["average_rating"],
+        "average_sentiment": analysis["average_sentiment"],
+        "sentiment_counts": analysis["sentiment_breakdown"],
+        "feedback_type_counts": analysis["feedback_type_counts"]
+    }
+
+
+def view_delta(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """Fields of the current view that differ from the previous one; for counters, only the changed keys."""
+    delta = {}
+    for field, value in current.items():
+        if field in COUNTER_FIELDS:
+            changed = {key: count for key, count in value.items() if previous[field].get(key) != count}
+            if changed:
+                delta[field] = changed
+        elif previous.get(field) != value:
+            delta[field] = value
+    return delta
+
+
+class Subscriber:
+    """
+    Updates waiting for one subscriber. Deltas a slow subscriber has not read yet are merged,
+    so its memory stays bounded and it catches up with the latest values.
+    """
+
+    def __init__(self, service: Optional[str], initial: Optional[Dict[str, Any]]):
+        self.service = service
+        self._pending: Optional[Dict[str, Any]] = None
+        self._changed = asyncio.Event()
+        if initial is not None:
+            self.push(initial)
+
+    def push(self, delta: Dict[str, Any]):
+        if self._pending is None:
+            self._pending = {field: dict(value) if field in COUNTER_FIELDS else value for field, value in delta.items()}
+        else:
+            for field, value in delta.items():
+                if field in COUNTER_FIELDS:
+                    self._pending.setdefault(field, {}).update(value)
+                else:
+                    self._pending[field] = value
+        self._changed.set()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        await self._changed.wait()
+        self._changed.clear()
+        update, self._pending = self._pending, None
+        return update
+
+
+class StatsBroadcaster:
+    """Subscribers by view, and the last view each was sent, fed by the live statistics maintainer."""
+
+    def __init__(self, maintainer: StatsMaintainer):
+        self.maintainer = maintainer
+        self._subscribers: Dict[Optional[str], Set[Subscriber]] = {}
+        self._views: Dict[Optional[str], Dict[str, Any]] = {}
+        self.broadcasts = 0
+        self.deltas = 0
+        maintainer.on_change(self.publish)
+
+    @contextmanager
+    def subscribe(self, service: Optional[str] = None) -> Iterator[Subscriber]:
+        """
+        Registers a subscriber for the block. Its first update is the whole view, once the live
+        statistics are ready; the next ones only hold what changed.
+        """
+        if service not in self._views and self.maintainer.ready:
+            self._views[service] = stats_view(self.maintainer.stats, service)
+        subscriber = Subscriber(service, self._views.get(service))
+
+        self._subscribers.setdefault(service, set()).add(subscriber)
+        try:
+            yield subscriber
+        finally:
+            subscribers = self._subscribers[service]
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[service]
+                self._views.pop(service, None)
+
+    def publish(self, stats: LiveStats):
+        """Computes the delta of every subscribed view once, and hands it to each of its subscribers."""
+        for service, subscribers in self._subscribers.items():
+            current = stats_view(stats, service)
+            previous = self._views.get(service)
+            self._views[service] = current
+            if previous is None:
+                # First statistics since these subscribers joined: send the whole view
+                delta = current
+            else:
+                delta = view_delta(previous, current)
+                if not delta:
+                    continue
+
+            self.deltas += 1
+            for subscriber in subscribers:
+                subscriber.push(delta)
+            self.broadcasts += len(subscribers)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns subscriber and broadcast counters of this worker."""
+        return {
+            "subscribers": sum(len(subscribers) for subscribers in self._subscribers.values()),
+            "views": len(self._subscribers),
+            "deltas": self.deltas,
+            "broadcasts": self.broadcasts
+        }
+
+
+# Broadcaster of this worker process
+stats_broadcaster = StatsBroadcaster(stats_maintainer)
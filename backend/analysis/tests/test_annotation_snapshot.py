@@ -0,0 +1,141 @@
+"""
+Tests of the memory-mapped annotation snapshot: file round-trips, rejected files, bounded size and rewrites.
+"""
+
+import pytest
+
+import annotation_snapshot
+from annotation_snapshot import HEADER_SIZE, AnnotationSnapshot, load_snapshot, save_snapshot, write_snapshot
+
+VERSION = "textblob-3"
+
+ENTRIES = {
+    3: (0.5, (("great", 2), ("service", 1))),
+    1: (-0.25, (("slow", 1),)),
+    2 ** 63 + 7: (0.0, ()),
+    42: (0.05, (("café", 3),)),
+}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "annotations.snap")
+
+
+@pytest.fixture(autouse=True)
+def unmapped(monkeypatch):
+    """Every test starts without a mapped snapshot and with fresh counters."""
+    monkeypatch.setattr(annotation_snapshot, "_snapshot", None)
+    monkeypatch.setattr(annotation_snapshot, "_hits", 0)
+    monkeypatch.setattr(annotation_snapshot, "_misses", 0)
+
+
+def test_write_then_load_round_trips_entries(path):
+    assert write_snapshot(path, VERSION, ENTRIES) == 4
+
+    snapshot = AnnotationSnapshot(path)
+    assert snapshot.scorer_version == VERSION
+    assert snapshot.count == 4
+    assert list(snapshot.hashes) == sorted(ENTRIES)
+    assert snapshot.get_many([*ENTRIES, 5]) == ENTRIES
+    assert list(snapshot.records["label"]) == [2, 0, 1, 1]
+
+
+def test_lookups_go_through_the_mapped_snapshot(path):
+    write_snapshot(path, VERSION, ENTRIES)
+
+    assert load_snapshot(VERSION, path) is True
+    assert annotation_snapshot.lookup(3) == ENTRIES[3]
+    assert annotation_snapshot.lookup_many([1, 5]) == {1: ENTRIES[1]}
+    stats = annotation_snapshot.snapshot_stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (4, 2, 1)
+
+
+def test_empty_snapshot_finds_nothing(path):
+    write_snapshot(path, VERSION, {})
+
+    assert AnnotationSnapshot(path).get_many([1, 2]) == {}
+
+
+def test_bad_magic_is_rejected(path):
+    write_snapshot(path, VERSION, ENTRIES)
+    with open(path, "r+b") as f:
+        f.write(b"ANNSNAP1")
+
+    with pytest.raises(ValueError):
+        AnnotationSnapshot(path)
+    assert load_snapshot(VERSION, path) is False
+
+
+@pytest.mark.parametrize("size", [0, 10, HEADER_SIZE, HEADER_SIZE + 20, -3])
+def test_truncated_file_is_rejected(path, size):
+    write_snapshot(path, VERSION, ENTRIES)
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data[:size])
+
+    with pytest.raises(ValueError):
+        AnnotationSnapshot(path)
+    assert load_snapshot(VERSION, path) is False
+    assert annotation_snapshot.lookup(3) is None
+
+
+def test_snapshot_of_another_scorer_version_is_not_mapped(path):
+    write_snapshot(path, "textblob-2", ENTRIES)
+
+    assert load_snapshot(VERSION, path) is False
+    assert annotation_snapshot.lookup(3) is None
+
+
+def test_entries_of_another_scorer_version_are_not_merged(path):
+    write_snapshot(path, "textblob-2", ENTRIES)
+
+    write_snapshot(path, VERSION, {9: (0.1, ())}, base=AnnotationSnapshot(path))
+    assert AnnotationSnapshot(path).get_many([*ENTRIES, 9]) == {9: (0.1, ())}
+
+
+def test_rewrite_merges_new_entries_over_the_base(path):
+    write_snapshot(path, VERSION, ENTRIES)
+
+    total = write_snapshot(path, VERSION, {1: (0.75, (("fast", 1),)), 8: (0.2, ())}, base=AnnotationSnapshot(path))
+    assert total == 5
+    assert AnnotationSnapshot(path).get_many([1, 3, 8]) == {1: (0.75, (("fast", 1),)), 3: ENTRIES[3], 8: (0.2, ())}
+
+
+def test_size_is_bounded_by_evicting_the_oldest_entries(path, monkeypatch):
+    monkeypatch.setattr(annotation_snapshot.time, "time", lambda: 1_000)
+    write_snapshot(path, VERSION, {key: (0.1, ()) for key in range(10)})
+    monkeypatch.setattr(annotation_snapshot.time, "time", lambda: 2_000)
+
+    total = write_snapshot(path, VERSION, {key: (0.2, ()) for key in range(100, 106)},
+                           base=AnnotationSnapshot(path), max_entries=8)
+
+    snapshot = AnnotationSnapshot(path)
+    assert total == snapshot.count == 8
+    # The six new entries are kept, and two of the older ones
+    assert set(range(100, 106)) <= set(int(key) for key in snapshot.hashes)
+    assert sorted(set(snapshot.records["stamp"])) == [1_000, 2_000]
+
+
+def test_save_skips_rewrites_for_small_changes(path, monkeypatch):
+    monkeypatch.setattr(annotation_snapshot, "ANNOTATION_SNAPSHOT_MIN_CHANGE", 0.5)
+
+    assert save_snapshot(VERSION, ENTRIES, path) == 4
+    # One new entry out of four is under half of the snapshot: not worth a rewrite
+    assert save_snapshot(VERSION, {**ENTRIES, 10: (0.3, ())}, path) == 0
+    assert AnnotationSnapshot(path).count == 4
+    # Nothing new at all
+    assert save_snapshot(VERSION, ENTRIES, path) == 0
+
+    assert save_snapshot(VERSION, {10: (0.3, ()), 11: (0.3, ())}, path) == 2
+    assert AnnotationSnapshot(path).count == 6
+    assert annotation_snapshot.lookup(11) == (0.3, ())
+
+
+def test_save_replaces_a_snapshot_of_another_scorer_version(path):
+    write_snapshot(path, "textblob-2", ENTRIES)
+
+    assert save_snapshot(VERSION, {9: (0.1, ())}, path) == 1
+    snapshot = AnnotationSnapshot(path)
+    assert (snapshot.scorer_version, snapshot.count) == (VERSION, 1)
@@ -0,0 +1,87 @@
+"""
+Tests of the approximate services analysis against an in-memory stand-in of the Motor collection:
+top keywords come from the keyword index once it is built, from the sampled feedbacks until then.
+"""
+
+import asyncio
+from datetime import datetime
+
+import pytest
+
+import approximate
+from analysis import SCORER_VERSION
+from approximate import approximate_services_analysis
+from keyword_index import RANKING_TFIDF, KeywordIndex
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    async def to_list(self, length=None):
+        return self.documents
+
+
+class FakeCollection:
+    """The subset of a Motor collection used to draw a sample; the sample is the whole collection."""
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    async def estimated_document_count(self):
+        return len(self.documents)
+
+    def aggregate(self, pipeline):
+        return FakeCursor(list(self.documents))
+
+
+def feedback(service, *words):
+    return {
+        "service": service, "feedbackType": "complaint", "rating": 2, "message": " ".join(words),
+        "sentiment": "negative", "sentimentScore": -0.5, "scorerVersion": SCORER_VERSION,
+        "keywords": [{"word": word, "frequency": 1} for word in words]
+    }
+
+
+SAMPLE = [
+    feedback("billing", "invoice", "app"),
+    feedback("billing", "invoice", "app"),
+    feedback("billing", "refund", "app"),
+    feedback("search", "results", "app"),
+    feedback("login", "password", "app"),
+]
+
+
+@pytest.fixture
+def index(monkeypatch):
+    index = KeywordIndex()
+    monkeypatch.setattr(approximate, "keyword_index", index)
+
+    async def synced(collection):
+        return 0
+
+    monkeypatch.setattr(approximate, "sync_keyword_index", synced)
+    return index
+
+
+def test_keyword_tops_come_from_the_sample_until_the_index_is_built(index):
+    analyses = asyncio.run(approximate_services_analysis(FakeCollection(SAMPLE)))
+
+    assert analyses["billing"]["top_keywords"] == ["app", "invoice", "refund"]
+    assert analyses["billing"]["total_feedback"] == 3
+    # "app" occurs in every sampled service, so TF-IDF ranks it after the distinctive terms
+    tfidf = asyncio.run(approximate_services_analysis(FakeCollection(SAMPLE), keyword_ranking=RANKING_TFIDF))
+    assert tfidf["billing"]["top_keywords"][0] == "invoice"
+    assert not index.ready
+
+
+def test_keyword_tops_and_populations_come_from_the_built_index(index):
+    index.add_counts("billing", "outage", 900, 900)
+    index.add_document_count("billing", 1000)
+    index.mark = (datetime(2024, 5, 1), 1)
+
+    analyses = asyncio.run(approximate_services_analysis(FakeCollection(SAMPLE), services=["billing"]))
+
+    assert analyses["billing"]["top_keywords"] == ["outage"]
+    assert analyses["billing"]["total_feedback"] == 1000
+    assert analyses["billing"]["approximation"]["population"] == 1000
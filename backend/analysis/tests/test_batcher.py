@@ -0,0 +1,86 @@
+"""
+Tests of the scoring micro-batcher with a stand-in scorer: batches flush when full or when their
+window ends, and a failed batch fails every request waiting on it.
+"""
+
+import asyncio
+
+import pytest
+
+import batcher
+from batcher import MicroBatcher
+
+
+@pytest.fixture
+def scored(monkeypatch):
+    """Batches passed to the scorer; a message "boom" makes its batch fail."""
+    batches = []
+
+    async def annotate_messages(messages):
+        batches.append(list(messages))
+        await asyncio.sleep(0)
+        if "boom" in messages:
+            raise RuntimeError("scoring failed")
+
+    monkeypatch.setattr(batcher, "annotate_messages", annotate_messages)
+    monkeypatch.setattr(batcher, "document_annotation", lambda document: {"scored": document["message"]})
+    return batches
+
+
+def test_a_full_batch_is_scored_without_waiting_for_the_window(scored):
+    scoring = MicroBatcher(window_seconds=60, max_batch=3)
+
+    async def scenario():
+        return await asyncio.wait_for(scoring.score(["a", "b", "c"]), timeout=1)
+
+    assert asyncio.run(scenario()) == [{"scored": "a"}, {"scored": "b"}, {"scored": "c"}]
+    assert scored == [["a", "b", "c"]]
+
+
+def test_requests_within_the_window_share_one_batch(scored):
+    scoring = MicroBatcher(window_seconds=0.01, max_batch=100)
+
+    async def scenario():
+        return await asyncio.gather(scoring.score(["a", "b"]), scoring.score(["c"]))
+
+    assert asyncio.run(scenario()) == [[{"scored": "a"}, {"scored": "b"}], [{"scored": "c"}]]
+    assert scored == [["a", "b", "c"]]
+    assert scoring.stats()["batches"] == 1
+    assert scoring.stats()["largest_batch"] == 3
+
+
+def test_messages_past_a_full_batch_wait_for_the_window(scored):
+    scoring = MicroBatcher(window_seconds=0.01, max_batch=2)
+
+    results = asyncio.run(scoring.score(["a", "b", "c"]))
+
+    assert [result["scored"] for result in results] == ["a", "b", "c"]
+    assert scored == [["a", "b"], ["c"]]
+
+
+def test_a_failed_batch_fails_every_request_waiting_on_it(scored):
+    scoring = MicroBatcher(window_seconds=0.01, max_batch=100)
+
+    async def scenario():
+        results = await asyncio.gather(scoring.score(["a"]), scoring.score(["boom"]), return_exceptions=True)
+        # The batcher keeps working after a failed batch
+        return results, await scoring.score(["d"])
+
+    (first, second), after = asyncio.run(scenario())
+    assert isinstance(first, RuntimeError) and isinstance(second, RuntimeError)
+    assert after == [{"scored": "d"}]
+    assert scoring.stats()["pending"] == scoring.stats()["scoring"] == 0
+
+
+def test_a_cancelled_request_does_not_fail_its_batch(scored):
+    scoring = MicroBatcher(window_seconds=0.01, max_batch=100)
+
+    async def scenario():
+        cancelled = asyncio.create_task(scoring.score(["a"]))
+        kept = asyncio.create_task(scoring.score(["b"]))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        return await kept
+
+    assert asyncio.run(scenario()) == [{"scored": "b"}]
+    assert scored == [["a", "b"]]
@@ -0,0 +1,27 @@
+"""
+Smoke test of the GraphQL throughput benchmark: every query it sends is valid against the API schema,
+so a renamed field fails here instead of every request of a benchmark run.
+"""
+
+import json
+
+import pytest
+import strawberry
+from graphql import parse, validate
+
+from benchmarks.graphql_throughput import QUERIES
+from graphql_schema import Mutation, Query, Subscription
+
+PARAMETERS = {"service": json.dumps("billing"), "id": "0" * 24}
+
+
+@pytest.fixture(scope="module")
+def schema():
+    return strawberry.Schema(query=Query, mutation=Mutation, subscription=Subscription)
+
+
+@pytest.mark.parametrize("name", sorted(QUERIES))
+def test_benchmark_query_is_valid_against_the_schema(schema, name):
+    document = parse(QUERIES[name] % PARAMETERS)
+
+    assert [error.message for error in validate(schema._schema, document)] == []
@@ -0,0 +1,140 @@
+"""
+Tests of the keyset pagination of feedbacksConnection against an in-memory stand-in of the Motor collection.
+"""
+
+import asyncio
+import base64
+from datetime import datetime, timedelta
+
+import pytest
+import strawberry
+from bson import ObjectId
+
+import graphql_schema
+from graphql_schema import Mutation, Query, Subscription, decode_cursor, encode_cursor
+
+schema = strawberry.Schema(query=Query, mutation=Mutation, subscription=Subscription)
+
+PAGE_QUERY = """
+query Page($first: Int!, $after: String, $filter: FeedbackFilter) {
+  feedbacksConnection(first: $first, after: $after, filter: $filter) {
+    edges { cursor node { id } }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+"""
+
+
+def _matches(document, query):
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(_matches(document, alternative) for alternative in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = document.get(field)
+            for operator, operand in condition.items():
+                if operator == "$lt" and not (value is not None and value < operand):
+                    return False
+                if operator == "$in" and value not in operand:
+                    return False
+        elif document.get(field) != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, keys):
+        for field, direction in reversed(keys):
+            self.documents.sort(key=lambda document: document[field], reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        self.documents = self.documents[:count]
+        return self
+
+    async def to_list(self, length=None):
+        return self.documents[:length]
+
+
+class FakeCollection:
+    """The subset of a Motor collection read by feedbacksConnection."""
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    def find(self, query, projection=None):
+        return FakeCursor([dict(document) for document in self.documents if _matches(document, query)])
+
+
+def _documents():
+    """Eleven feedbacks whose createdAt values tie in groups, so pages break inside ties."""
+    start = datetime(2024, 5, 1, 12, 0, 0)
+    documents = []
+    for index, group in enumerate([0, 0, 0, 1, 1, 2, 2, 2, 2, 3, 4]):
+        documents.append({
+            "_id": ObjectId(f"{index + 1:024x}"),
+            "createdAt": start + timedelta(minutes=group),
+            "service": "billing" if index % 2 else "search",
+            "rating": index % 5 + 1
+        })
+    return documents
+
+
+@pytest.fixture
+def collection(monkeypatch):
+    collection = FakeCollection(_documents())
+    monkeypatch.setattr(graphql_schema, "get_collection", lambda: collection)
+    return collection
+
+
+def _walk(first, filter=None):
+    """Follows endCursor from the first page to the last one and returns the ids in page order."""
+    ids, after = [], None
+    while True:
+        result = asyncio.run(schema.execute(PAGE_QUERY, variable_values={"first": first, "after": after,
+                                                                         "filter": filter}))
+        assert result.errors is None
+        page = result.data["feedbacksConnection"]
+        ids.extend(edge["node"]["id"] for edge in page["edges"])
+        if not page["pageInfo"]["hasNextPage"]:
+            return ids
+        after = page["pageInfo"]["endCursor"]
+
+
+def _expected(collection, query=None):
+    documents = [document for document in collection.documents if _matches(document, query or {})]
+    documents.sort(key=lambda document: (document["createdAt"], document["_id"]), reverse=True)
+    return [str(document["_id"]) for document in documents]
+
+
+@pytest.mark.parametrize("first", [1, 2, 3, 4, 20])
+def test_pages_neither_overlap_nor_skip_across_tied_timestamps(collection, first):
+    assert _walk(first) == _expected(collection)
+
+
+def test_pages_of_a_filter_cover_exactly_its_documents(collection):
+    filter = {"service": "billing", "minRating": 2}
+
+    assert _walk(2, filter) == _expected(collection, {"service": "billing", "rating": {"$in": [2, 3, 4, 5]}})
+
+
+def test_cursor_round_trips_the_keyset_position():
+    document = {"_id": ObjectId(), "createdAt": datetime(2024, 5, 1, 12, 30, 15, 250000)}
+
+    assert decode_cursor(encode_cursor(document)) == (document["createdAt"], document["_id"])
+
+
+@pytest.mark.parametrize("after", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"no separator").decode("ascii"),
+    base64.urlsafe_b64encode(b"yesterday|0123").decode("ascii"),
+    base64.urlsafe_b64encode(b"2024-05-01T12:00:00|not-an-object-id").decode("ascii"),
+])
+def test_malformed_cursor_is_a_graphql_error(collection, after):
+    result = asyncio.run(schema.execute(PAGE_QUERY, variable_values={"first": 2, "after": after}))
+
+    assert result.data is None
+    assert [error.message for error in result.errors] == ["Invalid cursor"]
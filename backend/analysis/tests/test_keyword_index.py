@@ -0,0 +1,128 @@
+"""
+Tests of the in-memory keyword index: top-term selection, TF-IDF weighting and growth of the arrays.
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import keyword_index as keyword_index_module
+from keyword_index import RANKING_FREQUENCY, RANKING_TFIDF, KeywordIndex
+
+
+def keywords(*words, frequency=1):
+    return [{"word": word, "frequency": frequency} for word in words]
+
+
+@pytest.fixture
+def index():
+    return KeywordIndex()
+
+
+def test_unknown_service_and_empty_k_have_no_terms(index):
+    index.add_document("billing", keywords("invoice"))
+
+    assert index.top_terms("search") == []
+    assert index.top_terms("billing", k=0) == []
+
+
+def test_k_larger_than_the_vocabulary_returns_every_term(index):
+    index.add_document("billing", keywords("invoice", "refund"))
+    index.add_document("billing", keywords("invoice"))
+
+    assert index.top_terms("billing", k=10) == ["invoice", "refund"]
+
+
+def test_ties_at_the_k_boundary_are_broken_alphabetically(index):
+    index.add_document("billing", keywords("zeta", "invoice"))
+    index.add_document("billing", keywords("invoice", "delta", "alpha", "omega"))
+
+    # invoice leads; four terms tie for the second place, the first ones alphabetically win
+    assert index.top_terms("billing", k=3) == ["invoice", "alpha", "delta"]
+    assert index.top_terms("billing", k=3) == index.top_terms("billing", k=3)
+
+
+def test_ties_do_not_depend_on_insertion_order():
+    first, second = KeywordIndex(), KeywordIndex()
+    for word in ["delta", "alpha", "omega", "beta"]:
+        first.add_document("billing", keywords(word))
+    for word in ["beta", "omega", "alpha", "delta"]:
+        second.add_document("billing", keywords(word))
+
+    assert first.top_terms("billing", k=2) == second.top_terms("billing", k=2) == ["alpha", "beta"]
+
+
+def test_tfidf_demotes_terms_shared_by_every_service(index):
+    # "app" is the most frequent term of billing but occurs in every service
+    for _ in range(3):
+        index.add_document("billing", keywords("app", "invoice"))
+    index.add_document("billing", keywords("app"))
+    index.add_document("search", keywords("app", "results"))
+    index.add_document("login", keywords("app", "password"))
+
+    assert index.top_terms("billing", k=2, ranking=RANKING_FREQUENCY) == ["app", "invoice"]
+    assert index.top_terms("billing", k=2, ranking=RANKING_TFIDF) == ["invoice", "app"]
+
+
+def test_tfidf_weighs_term_frequency_within_a_service(index):
+    index.add_document("billing", keywords("refund", frequency=5))
+    index.add_document("billing", keywords("invoice"))
+    index.add_document("billing", keywords("invoice"))
+
+    assert index.top_terms("billing", k=1, ranking=RANKING_FREQUENCY) == ["invoice"]
+    assert index.top_terms("billing", k=1, ranking=RANKING_TFIDF) == ["refund"]
+
+
+def test_idf_counts_services_and_gives_unknown_terms_the_highest_weight(index):
+    index.add_document("billing", keywords("app", "invoice"))
+    index.add_document("search", keywords("app"))
+
+    app, invoice, unknown = index.idf(["app", "invoice", "unknown"])
+    assert app == pytest.approx(np.log(3 / 3) + 1.0)
+    assert invoice == pytest.approx(np.log(3 / 2) + 1.0)
+    assert unknown == pytest.approx(np.log(3 / 1) + 1.0)
+
+
+def test_aggregated_counts_match_documents_added_one_by_one(index):
+    index.add_counts("billing", "invoice", 2, 3)
+    index.add_document_count("billing", 2)
+    one_by_one = KeywordIndex()
+    one_by_one.add_document("billing", keywords("invoice", frequency=1))
+    one_by_one.add_document("billing", keywords("invoice", frequency=2))
+
+    for ranking in (RANKING_FREQUENCY, RANKING_TFIDF):
+        assert index.top_terms("billing", ranking=ranking) == one_by_one.top_terms("billing", ranking=ranking)
+    assert index.stats()["documents"] == one_by_one.stats()["documents"] == 2
+
+
+def test_arrays_grow_across_services(monkeypatch):
+    monkeypatch.setattr(keyword_index_module, "INITIAL_CAPACITY", 4)
+    index = KeywordIndex()
+
+    # The search service is created while the vocabulary is small, then outgrown by billing's terms
+    index.add_document("search", keywords("results"))
+    words = [f"term{number:02d}" for number in range(20)]
+    for count, word in enumerate(words):
+        for _ in range(count + 1):
+            index.add_document("billing", keywords(word))
+    index.add_document("search", keywords("term19", "results"))
+
+    assert index.top_terms("billing", k=3) == ["term19", "term18", "term17"]
+    assert index.top_terms("search", k=5) == ["results", "term19"]
+    assert index.top_terms("search", k=5, ranking=RANKING_TFIDF)[0] == "results"
+    assert index.stats()["terms"] == 21
+
+
+def test_clear_drops_every_statistic_and_the_mark(index):
+    index.add_document("billing", keywords("invoice"))
+    index.mark = (datetime(2024, 5, 1), 1)
+
+    index.clear()
+
+    assert not index.ready
+    assert index.top_terms("billing") == []
+    assert index.stats() == {"terms": 0, "services": 0, "documents": 0, "mark": None}
+    # The index is usable again after a clear
+    index.add_document("search", keywords("results"))
+    assert index.top_terms("search", ranking=RANKING_TFIDF) == ["results"]
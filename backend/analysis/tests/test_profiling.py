@@ -0,0 +1,115 @@
+"""
+Tests of the request profiling: the admin token check of the profiling header and endpoints,
+and the X-Profile-Id header, sent only for a profile that was saved.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+import main
+import profiling
+from profiling import PROFILING_HEADER, RequestProfiler, authorized
+
+TOKEN = "s3cret"
+
+
+async def call(path, headers=None, query=""):
+    """Sends one GET request through the whole ASGI app; returns status, headers and body."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": query.encode(),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+        "client": ("127.0.0.1", 50000), "server": ("testserver", 80)
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await main.app(scope, receive, send)
+    start = messages[0]
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    return start["status"], {name.decode(): value.decode() for name, value in start["headers"]}, body
+
+
+@pytest.fixture
+def profiler(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_TOKEN", TOKEN)
+    monkeypatch.setattr(profiling, "PROFILING_SAMPLE_RATE", 0)
+    profiler = RequestProfiler(directory=str(tmp_path))
+    monkeypatch.setattr(main, "request_profiler", profiler)
+    return profiler
+
+
+@pytest.mark.parametrize("configured, token, expected", [
+    ("", None, False),
+    ("", "", False),
+    (TOKEN, None, False),
+    (TOKEN, "", False),
+    (TOKEN, "wrong", False),
+    (TOKEN, TOKEN, True),
+])
+def test_token_check(monkeypatch, configured, token, expected):
+    monkeypatch.setattr(profiling, "PROFILING_TOKEN", configured)
+
+    assert authorized(token) is expected
+
+
+@pytest.mark.parametrize("path", ["/admin/profiles", "/admin/profiles/00000000000000000001-1"])
+@pytest.mark.parametrize("headers", [{}, {PROFILING_HEADER: "wrong"}])
+def test_profile_endpoints_require_the_token(profiler, path, headers):
+    status, _, body = asyncio.run(call(path, headers))
+
+    assert status == 403
+    assert json.loads(body) == {"error": f"Missing or invalid {PROFILING_HEADER}"}
+
+
+def test_profile_endpoints_with_the_token(profiler):
+    status, _, body = asyncio.run(call("/admin/profiles", {PROFILING_HEADER: TOKEN}))
+    assert status == 200
+    assert json.loads(body)["profiles"] == []
+
+    status, _, _ = asyncio.run(call("/admin/profiles/00000000000000000001-1", {PROFILING_HEADER: TOKEN}))
+    assert status == 404
+
+
+@pytest.mark.parametrize("limit", ["0", "-1", "1001"])
+def test_profile_listing_limit_is_bounded(profiler, limit):
+    status, _, _ = asyncio.run(call("/admin/profiles", {PROFILING_HEADER: TOKEN}, f"limit={limit}"))
+
+    assert status == 422
+
+
+def test_profile_id_is_sent_for_a_saved_profile(profiler):
+    status, headers, _ = asyncio.run(call("/admin/cache-stats", {PROFILING_HEADER: TOKEN}))
+
+    assert status == 200
+    [saved] = profiler.list_profiles()
+    assert headers["x-profile-id"] == saved["id"]
+    assert profiler.profile_path(saved["id"]) is not None
+
+
+def test_no_profile_id_when_the_profile_is_not_saved(profiler, monkeypatch):
+    def dump_stats(self, path):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(profiling.StackSampler, "dump_stats", dump_stats)
+
+    status, headers, _ = asyncio.run(call("/admin/cache-stats", {PROFILING_HEADER: TOKEN}))
+
+    assert status == 200
+    assert "x-profile-id" not in headers
+    assert profiler.write_errors == 1
+
+
+def test_requests_without_the_token_are_not_profiled(profiler):
+    status, headers, _ = asyncio.run(call("/admin/cache-stats", {PROFILING_HEADER: "wrong"}))
+
+    assert status == 200
+    assert "x-profile-id" not in headers
+    assert profiler.stats()["profiled"] == 0
@@ -0,0 +1,204 @@
+"""
+Tests of the rollup buckets against an in-memory stand-in of the Motor rollup collection:
+batches applied again count nothing twice, bucket keywords stay bounded and windows read whole buckets.
+"""
+
+import asyncio
+import copy
+from collections import Counter
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+import rollups
+from rollups import (
+    GRANULARITY_DAY,
+    GRANULARITY_HOUR,
+    ROLLUP_STATE_ID,
+    _apply_batch,
+    read_buckets,
+    summarize_buckets
+)
+
+BUCKET_KEY = ("granularity", "service", "bucket", "feedbackType")
+
+
+def _matches(document, query):
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(_matches(document, alternative) for alternative in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = document.get(field)
+            for operator, operand in condition.items():
+                if operator == "$gte" and not (value is not None and value >= operand):
+                    return False
+                if operator == "$lt" and not (value is not None and value < operand):
+                    return False
+                if operator == "$in" and value not in operand:
+                    return False
+        elif document.get(field) != condition:
+            return False
+    return True
+
+
+def _update(document, update):
+    for field, value in update.get("$set", {}).items():
+        document[field] = value
+    for field, value in update.get("$inc", {}).items():
+        *parents, name = field.split(".")
+        target = document
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[name] = target.get(name, 0) + value
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, field, direction):
+        self.documents.sort(key=lambda document: document[field], reverse=direction < 0)
+        return self
+
+    async def to_list(self, length=None):
+        return self.documents
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self.documents:
+            yield document
+
+
+class FakeRollups:
+    """The subset of a Motor collection used by the rollups, with the unique bucket key of ensure_rollup_indexes."""
+
+    def __init__(self):
+        self.buckets = []
+        self.state = {"_id": ROLLUP_STATE_ID, "leaseOwner": rollups._lease_owner}
+        # Called before every bulk write, e.g. to let another worker write meanwhile
+        self.before_write = None
+
+    def find(self, query, projection=None):
+        return FakeCursor([copy.deepcopy(bucket) for bucket in self.buckets if _matches(bucket, query)])
+
+    async def update_one(self, query, update, upsert=False):
+        if not _matches(self.state, query):
+            return SimpleNamespace(matched_count=0)
+        _update(self.state, update)
+        return SimpleNamespace(matched_count=1)
+
+    async def bulk_write(self, operations, ordered=True):
+        if self.before_write is not None:
+            self.before_write()
+        for operation in operations:
+            query, update = operation._filter, operation._doc
+            bucket = next((bucket for bucket in self.buckets if _matches(bucket, query)), None)
+            if bucket is None:
+                key = {field: query[field] for field in BUCKET_KEY}
+                if any(_matches(existing, key) for existing in self.buckets):
+                    raise DuplicateKeyError("duplicate bucket key")
+                bucket = {field: value for field, value in query.items()}
+                self.buckets.append(bucket)
+            _update(bucket, update)
+
+
+def feedbacks(count, start=datetime(2024, 5, 1, 9, 0), step=timedelta(minutes=20), words=("slow",)):
+    return [
+        {
+            "_id": ObjectId(f"{index + 1:024x}"), "createdAt": start + index * step, "service": "billing",
+            "feedbackType": "complaint", "rating": 2, "sentiment": "negative", "sentimentScore": -0.5,
+            "keywords": [{"word": word, "frequency": 1} for word in words], "scorerVersion": "test"
+        }
+        for index in range(count)
+    ]
+
+
+def day_totals(fake):
+    return summarize_buckets([bucket for bucket in fake.buckets if bucket["granularity"] == GRANULARITY_DAY])
+
+
+def test_a_batch_applied_twice_counts_once():
+    fake = FakeRollups()
+    batch = feedbacks(6)
+
+    asyncio.run(_apply_batch(fake, batch))
+    once = copy.deepcopy(fake.buckets)
+    # Crash after the bucket writes, before the high-water mark moved: the next sync applies it again
+    asyncio.run(_apply_batch(fake, batch))
+
+    assert fake.buckets == once
+    assert day_totals(fake)["total_feedback"] == 6
+
+
+def test_batches_applied_again_with_other_boundaries_count_each_feedback_once():
+    fake = FakeRollups()
+    documents = feedbacks(10)
+
+    asyncio.run(_apply_batch(fake, documents[:4]))
+    asyncio.run(_apply_batch(fake, documents[2:7]))
+    asyncio.run(_apply_batch(fake, documents[5:]))
+
+    totals = day_totals(fake)
+    assert totals["total_feedback"] == 10
+    assert totals["sentiment_counts"]["negative"] == 10
+    hours = [bucket for bucket in fake.buckets if bucket["granularity"] == GRANULARITY_HOUR]
+    assert sum(bucket["count"] for bucket in hours) == 10
+    assert sum(bucket["keywords"]["slow"] for bucket in hours) == 10
+
+
+def test_a_write_racing_another_worker_fails_instead_of_counting_twice():
+    fake = FakeRollups()
+    documents = feedbacks(3, step=timedelta(minutes=1))
+    asyncio.run(_apply_batch(fake, documents[:2]))
+
+    def other_worker_applies_first():
+        # Another worker counted the third feedback between our read of the buckets and our write
+        for bucket in fake.buckets:
+            bucket["count"] += 1
+            bucket["throughCreatedAt"], bucket["throughId"] = documents[2]["createdAt"], documents[2]["_id"]
+
+    fake.before_write = other_worker_applies_first
+    with pytest.raises(DuplicateKeyError):
+        asyncio.run(_apply_batch(fake, documents))
+    assert day_totals(fake)["total_feedback"] == 3
+
+
+def test_lost_lease_applies_nothing():
+    fake = FakeRollups()
+    fake.state["leaseOwner"] = "another worker"
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(_apply_batch(fake, feedbacks(3)))
+    assert fake.buckets == []
+
+
+def test_bucket_keywords_keep_the_most_frequent(monkeypatch):
+    monkeypatch.setattr(rollups, "ROLLUP_BUCKET_KEYWORDS", 3)
+    fake = FakeRollups()
+    documents = feedbacks(4, step=timedelta(minutes=1), words=("slow", "refund"))
+    documents += feedbacks(1, start=datetime(2024, 5, 1, 9, 10), words=("invoice", "zeta", "alpha"))
+    documents[-1]["_id"] = ObjectId()
+
+    asyncio.run(_apply_batch(fake, documents[:2]))
+    asyncio.run(_apply_batch(fake, documents[2:]))
+
+    for bucket in fake.buckets:
+        assert bucket["keywords"] == {"refund": 4, "slow": 4, "alpha": 1}
+
+
+def test_windows_read_the_buckets_starting_inside_them():
+    fake = FakeRollups()
+    asyncio.run(_apply_batch(fake, feedbacks(12, step=timedelta(minutes=30))))
+
+    # From 10:30 to 12:30: the 10:00 bucket starts before the window, the 12:00 one inside it
+    buckets = asyncio.run(read_buckets(fake, GRANULARITY_HOUR, datetime(2024, 5, 1, 10, 30),
+                                       datetime(2024, 5, 1, 12, 30)))
+
+    assert [bucket["bucket"].hour for bucket in buckets] == [11, 12]
+    assert Counter(bucket["count"] for bucket in buckets) == Counter({2: 2})
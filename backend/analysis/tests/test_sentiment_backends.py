@@ -0,0 +1,72 @@
+"""
+Tests of the vectorized lexicon backend against the reference VADER scorer.
+"""
+
+import numpy as np
+import pytest
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+from sentiment_backends import LexiconBackend
+
+# Messages without boosters, capitalization or punctuation emphasis, which the backend ignores:
+# plain, negated and contrasted ("but") statements, as found in service feedback
+CORPUS = [
+    "The service was great",
+    "Terrible experience with the billing team",
+    "Delivery was on time",
+    "I love the new dashboard",
+    "The app keeps crashing and support is useless",
+    "The service was not great",
+    "I don't like the new layout",
+    "Not bad at all",
+    "The checkout never works",
+    "The staff wasn't helpful and the room isn't clean",
+    "Nothing special",
+    "Good food but terrible service",
+    "It was good, but the wait was awful",
+    "The price is high but the quality is excellent",
+    "Not good but not bad either",
+    "The app is fine but it crashes a lot, but support helped",
+    "but",
+    "",
+]
+
+# Maximum difference with VADER's compound score on the corpus
+TOLERANCE = 1e-6
+
+
+@pytest.fixture(scope="module")
+def backend():
+    return LexiconBackend()
+
+
+@pytest.fixture(scope="module")
+def vader():
+    return SentimentIntensityAnalyzer()
+
+
+def test_batch_matches_vader_on_negations_and_but_clauses(backend, vader):
+    expected = np.array([vader.polarity_scores(message)["compound"] for message in CORPUS])
+
+    # VADER rounds compound scores to 4 decimals
+    assert np.allclose(np.round(backend.score_batch(CORPUS), 4), expected, atol=TOLERANCE)
+
+
+@pytest.mark.parametrize("message", CORPUS)
+def test_single_message_matches_its_batch_score(backend, message):
+    assert backend.score(message) == pytest.approx(backend.score_batch(CORPUS)[CORPUS.index(message)])
+
+
+def test_negation_flips_and_dampens_the_valence(backend):
+    positive, negated = backend.score_batch(["the service was good", "the service was not good"])
+
+    assert positive > 0 > negated
+    assert abs(negated) < positive
+
+
+def test_only_the_first_but_of_a_message_splits_it(backend):
+    # "good" before the first "but" is halved, "bad" after it weighed by 1.5, in the same message only
+    contrasted, plain = backend.score_batch(["good but bad", "good bad"])
+
+    assert contrasted < plain
+    assert backend.score("good but bad but") == pytest.approx(contrasted)
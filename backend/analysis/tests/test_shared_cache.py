@@ -0,0 +1,223 @@
+"""
+Tests of the shared Redis tier against an in-memory stand-in of the redis.asyncio client.
+"""
+
+import asyncio
+
+import pytest
+
+from shared_cache import WARMUP_CLAIM_TTL, SharedAnnotationCache
+
+VERSION = "textblob-2"
+
+
+class FakeRedis:
+    """The subset of redis.asyncio used by the shared tier, with expiries on a clock moved by the tests."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.values = {}
+        self.expiries = {}
+        self.commands = []
+
+    def _live(self, key):
+        expiry = self.expiries.get(key)
+        if expiry is not None and expiry <= self.now:
+            self.values.pop(key, None)
+            self.expiries.pop(key, None)
+        return key in self.values
+
+    async def mget(self, keys):
+        self.commands.append("mget")
+        return [self.values[key] if self._live(key) else None for key in keys]
+
+    async def exists(self, key):
+        return int(self._live(key))
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and self._live(key):
+            return None
+        self.values[key] = str(value).encode("utf-8")
+        self.expiries.pop(key, None)
+        if ex is not None:
+            self.expiries[key] = self.now + ex
+        return True
+
+    async def delete(self, key):
+        return int(self.values.pop(key, None) is not None)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Queues commands and runs them on execute(), in one round-trip."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.queued = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def mset(self, mapping):
+        self.queued.append(("mset", mapping))
+
+    def expire(self, key, seconds):
+        self.queued.append(("expire", key, seconds))
+
+    async def execute(self):
+        self.redis.commands.append("pipeline")
+        for command in self.queued:
+            if command[0] == "mset":
+                for key, value in command[1].items():
+                    self.redis.values[key] = value.encode("utf-8")
+            else:
+                _, key, seconds = command
+                self.redis.expiries[key] = self.redis.now + seconds
+        return [True] * len(self.queued)
+
+
+class FailingRedis:
+    """A client whose every command fails, like an unreachable server."""
+
+    def __getattr__(self, name):
+        raise ConnectionError("Redis unavailable")
+
+
+@pytest.fixture
+def redis():
+    return FakeRedis()
+
+
+@pytest.fixture
+def cache(redis):
+    return SharedAnnotationCache(ttl=60, client=redis)
+
+
+ENTRIES = {
+    1: (0.5, (("great", 2), ("service", 1))),
+    2: (-0.25, (("slow", 1),)),
+    3: (0.0, ())
+}
+
+
+def test_set_many_then_get_many_round_trips_entries(cache, redis):
+    asyncio.run(cache.set_many(VERSION, ENTRIES))
+
+    assert asyncio.run(cache.get_many(VERSION, [1, 2, 3, 4])) == ENTRIES
+    # One pipelined write, one MGET
+    assert redis.commands == ["pipeline", "mget"]
+    assert cache.stats()["hits"] == 3
+    assert cache.stats()["misses"] == 1
+
+
+def test_entries_are_keyed_by_scorer_version(cache):
+    asyncio.run(cache.set_many(VERSION, ENTRIES))
+
+    assert asyncio.run(cache.get_many("lexicon-2", [1, 2, 3])) == {}
+
+
+def test_entries_expire_after_the_ttl(cache, redis):
+    asyncio.run(cache.set_many(VERSION, ENTRIES))
+
+    redis.now = 59
+    assert len(asyncio.run(cache.get_many(VERSION, ENTRIES))) == 3
+    redis.now = 60
+    assert asyncio.run(cache.get_many(VERSION, ENTRIES)) == {}
+
+
+def test_unreadable_entries_are_misses(cache, redis):
+    asyncio.run(cache.set_many(VERSION, ENTRIES))
+    redis.values[cache._key(VERSION, 1)] = b"not json"
+    redis.values[cache._key(VERSION, 2)] = b'{"score": 0.5}'
+
+    assert asyncio.run(cache.get_many(VERSION, [1, 2, 3])) == {3: ENTRIES[3]}
+    assert cache.stats()["errors"] == 2
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_disabled_cache_does_nothing():
+    cache = SharedAnnotationCache(url="")
+
+    asyncio.run(cache.set_many(VERSION, ENTRIES))
+    assert asyncio.run(cache.get_many(VERSION, [1])) == {}
+    # Without Redis every worker runs its own warmup
+    assert asyncio.run(cache.claim_warmup(VERSION)) is True
+    assert asyncio.run(cache.wait_warm(VERSION)) is False
+
+
+def test_failures_fall_back_to_local_scoring():
+    cache = SharedAnnotationCache(client=FailingRedis())
+
+    assert asyncio.run(cache.get_many(VERSION, [1])) == {}
+    asyncio.run(cache.set_many(VERSION, ENTRIES))
+    assert cache.stats()["errors"] == 2
+
+
+def test_one_worker_claims_the_warmup(redis):
+    first = SharedAnnotationCache(client=redis)
+    second = SharedAnnotationCache(client=redis)
+
+    assert asyncio.run(first.claim_warmup(VERSION)) is True
+    assert asyncio.run(second.claim_warmup(VERSION)) is False
+
+
+def test_warmup_claim_expires(cache, redis):
+    assert asyncio.run(cache.claim_warmup(VERSION)) is True
+
+    redis.now = WARMUP_CLAIM_TTL
+    assert asyncio.run(cache.claim_warmup(VERSION)) is True
+
+
+def test_nobody_claims_a_warm_cache(cache):
+    assert asyncio.run(cache.claim_warmup(VERSION)) is True
+    asyncio.run(cache.mark_warm(VERSION))
+
+    assert asyncio.run(cache.claim_warmup(VERSION)) is False
+    assert asyncio.run(cache.wait_warm(VERSION)) is True
+
+
+def test_warm_marker_is_keyed_by_scorer_version(cache):
+    asyncio.run(cache.mark_warm(VERSION))
+
+    # A new scorer version is warmed up again
+    assert asyncio.run(cache.claim_warmup("textblob-3")) is True
+    assert asyncio.run(cache.claim_warmup(VERSION)) is False
+
+
+def test_waiting_workers_resume_when_the_cache_is_marked_warm(redis):
+    claimer = SharedAnnotationCache(client=redis)
+    waiter = SharedAnnotationCache(client=redis)
+
+    async def run():
+        assert await claimer.claim_warmup(VERSION)
+        waiting = asyncio.create_task(waiter.wait_warm(VERSION, poll_seconds=0.01))
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+
+        await claimer.mark_warm(VERSION)
+        return await asyncio.wait_for(waiting, 1)
+
+    assert asyncio.run(run()) is True
+
+
+def test_waiting_workers_stop_when_the_claim_is_released(redis):
+    claimer = SharedAnnotationCache(client=redis)
+    waiter = SharedAnnotationCache(client=redis)
+
+    async def run():
+        assert await claimer.claim_warmup(VERSION)
+        waiting = asyncio.create_task(waiter.wait_warm(VERSION, poll_seconds=0.01))
+        await asyncio.sleep(0.05)
+
+        # The warmup failed: released without the warm marker
+        await claimer.release_warmup(VERSION)
+        return await asyncio.wait_for(waiting, 1)
+
+    assert asyncio.run(run()) is False
+    assert asyncio.run(claimer.claim_warmup(VERSION)) is True
@@ -0,0 +1,92 @@
+"""
+Tests of the single-flight coalescing: results published to other workers read back unchanged,
+file locks exclude each other, and file mode degrades to per-worker coalescing without flock().
+"""
+
+import asyncio
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import singleflight
+from singleflight import MODE_FILE, FileFlightLock, SingleFlight, decode_result, encode_result
+
+
+def test_published_results_read_back_unchanged():
+    result = {
+        "total": np.int64(3),
+        "average": np.float64(0.25),
+        "since": datetime(2024, 5, 1, 9, 30),
+        "by_rating": {1: 2, 5: 1},
+        "by_service_type": {("billing", "complaint"): 2, (("nested", 1), 2): 1},
+        "series": [{"start": datetime(2024, 5, 1), "keys": [1, 2]}],
+    }
+
+    decoded = decode_result(encode_result(result))
+
+    assert decoded == result
+    assert isinstance(decoded["total"], int)
+    assert list(decoded["by_service_type"]) == [("billing", "complaint"), (("nested", 1), 2)]
+
+
+def test_file_locks_exclude_each_other_until_released(tmp_path):
+    first, second = FileFlightLock(str(tmp_path)), FileFlightLock(str(tmp_path))
+
+    async def scenario():
+        assert await first.acquire("digest")
+        assert not await second.acquire("digest")
+        assert await second.published("digest") is None
+        await first.publish("digest", {("billing", 1): 0.5})
+        await first.release("digest")
+        generation, result = await second.published("digest")
+        assert generation == await second.generation("digest") > 0
+        assert result == {("billing", 1): 0.5}
+        assert await second.acquire("digest")
+        await second.release("digest")
+
+    asyncio.run(scenario())
+    assert not any(path.name.endswith(".lock") for path in tmp_path.iterdir())
+
+
+def test_file_mode_without_flock_coalesces_per_worker(monkeypatch):
+    monkeypatch.setattr(singleflight, "fcntl", None)
+    flight = SingleFlight(MODE_FILE)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0)
+        return 42
+
+    async def scenario():
+        return await asyncio.gather(flight.do("key", compute), flight.do("key", compute))
+
+    assert asyncio.run(scenario()) == [42, 42]
+    assert len(calls) == 1
+    assert flight.stats()["mode"] == "worker"
+    assert flight.lock_errors == 0
+
+
+@pytest.mark.skipif(singleflight.fcntl is None, reason="flock() is not available")
+def test_waiting_worker_takes_the_published_result(tmp_path, monkeypatch):
+    monkeypatch.setattr(singleflight, "SINGLE_FLIGHT_POLL_SECONDS", 0.001)
+    holder, waiter = SingleFlight(MODE_FILE), SingleFlight(MODE_FILE)
+    holder._lock, waiter._lock = FileFlightLock(str(tmp_path)), FileFlightLock(str(tmp_path))
+    started = asyncio.Event()
+
+    async def slow():
+        started.set()
+        await asyncio.sleep(0.05)
+        return {("billing", "complaint"): 2}
+
+    async def never():
+        raise AssertionError("the waiting worker computed the key itself")
+
+    async def scenario():
+        computing = asyncio.create_task(holder.across_workers("key", slow))
+        await started.wait()
+        return await asyncio.gather(computing, waiter.across_workers("key", never))
+
+    assert asyncio.run(scenario()) == [{("billing", "complaint"): 2}] * 2
+    assert (holder.computed, waiter.coalesced_remote) == (1, 1)
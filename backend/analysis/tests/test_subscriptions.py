@@ -0,0 +1,104 @@
+"""
+Tests of the live statistics broadcaster: subscribers get the whole view then only what changed,
+slow subscribers catch up with merged deltas, and disconnected subscribers are removed.
+"""
+
+import asyncio
+
+import pytest
+import strawberry
+
+import graphql_schema
+from graphql_schema import Mutation, Query, Subscription
+from live_stats import StatsMaintainer
+from subscriptions import StatsBroadcaster
+
+
+def feedback(service, sentiment="positive", rating=5):
+    return {"service": service, "feedbackType": "praise", "rating": rating,
+            "sentiment": sentiment, "sentimentScore": 0.5 if sentiment == "positive" else -0.5}
+
+
+@pytest.fixture
+def maintainer():
+    maintainer = StatsMaintainer()
+    maintainer.stats.add(feedback("billing"))
+    maintainer.ready = True
+    return maintainer
+
+
+@pytest.fixture
+def broadcaster(maintainer):
+    return StatsBroadcaster(maintainer)
+
+
+def add(maintainer, doc):
+    maintainer.stats.add(doc)
+    maintainer._notify()
+
+
+def test_subscribers_get_the_whole_view_then_what_changed(maintainer, broadcaster):
+    async def scenario():
+        with broadcaster.subscribe("billing") as subscriber:
+            first = await subscriber.__anext__()
+            add(maintainer, feedback("billing", "negative", 1))
+            # A feedback of another service changes nothing of this view
+            add(maintainer, feedback("search"))
+            return first, await subscriber.__anext__(), broadcaster.stats()
+
+    first, second, stats = asyncio.run(scenario())
+    assert first["total_feedback"] == 1
+    assert second["total_feedback"] == 2
+    assert second["sentiment_counts"] == {"negative": 1}
+    assert second["feedback_type_counts"] == {"praise": 2}
+    assert (stats["subscribers"], stats["deltas"]) == (1, 1)
+
+
+def test_a_slow_subscriber_catches_up_with_merged_deltas(maintainer, broadcaster):
+    async def scenario():
+        with broadcaster.subscribe() as subscriber:
+            await subscriber.__anext__()
+            add(maintainer, feedback("billing", "negative", 1))
+            add(maintainer, feedback("search", "neutral", 3))
+            return await subscriber.__anext__()
+
+    update = asyncio.run(scenario())
+    assert update["total_feedback"] == 3
+    assert update["sentiment_counts"] == {"negative": 1, "neutral": 1}
+
+
+def test_subscribers_are_removed_when_they_leave(maintainer, broadcaster):
+    with broadcaster.subscribe("billing"), broadcaster.subscribe("billing"):
+        with broadcaster.subscribe("search"):
+            assert broadcaster.stats()["subscribers"] == 3
+        assert broadcaster.stats()["views"] == 1
+    assert broadcaster.stats() == {"subscribers": 0, "views": 0, "deltas": 0, "broadcasts": 0}
+
+    # Nobody left to compute a view for
+    add(maintainer, feedback("billing"))
+    assert broadcaster.stats()["deltas"] == 0
+
+
+def test_a_disconnected_client_is_unsubscribed(maintainer, broadcaster, monkeypatch):
+    monkeypatch.setattr(graphql_schema, "stats_broadcaster", broadcaster)
+    schema = strawberry.Schema(query=Query, mutation=Mutation, subscription=Subscription)
+
+    async def scenario():
+        updates = await schema.subscribe('subscription { feedbackStatsUpdated(service: "billing") { totalFeedback } }')
+        first = await updates.__anext__()
+        subscribed = broadcaster.stats()["subscribers"]
+        # The client goes away while waiting for the next update
+        waiting = asyncio.create_task(updates.__anext__())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        await updates.aclose()
+        return first, subscribed
+
+    first, subscribed = asyncio.run(scenario())
+    assert first.errors is None
+    assert first.data == {"feedbackStatsUpdated": {"totalFeedback": 1}}
+    assert subscribed == 1
+    assert broadcaster.stats()["subscribers"] == 0
+    assert broadcaster.stats()["views"] == 0